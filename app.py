@@ -1,24 +1,107 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify # Add jsonify
+from flask import Flask, Blueprint, current_app, render_template, request, redirect, url_for, flash, session, jsonify, Response, stream_with_context, make_response, has_request_context, abort # Add jsonify
+from flask.cli import FlaskGroup
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 import os
-from datetime import datetime, date, time, timedelta # Import date, time
-from sqlalchemy import Text, Date, cast, func, desc # Add desc
+import io
+import csv
+import json
+import base64
+import zlib
+import click
+import atexit
+import multiprocessing
+from datetime import datetime, date, time, timedelta, timezone # Import date, time
+from sqlalchemy import Text, Date, cast, func, desc, inspect, event, text, and_, or_, bindparam # Add desc
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError, IntegrityError
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.pool import Pool, QueuePool
+from sqlalchemy.schema import CreateIndex
 from functools import wraps # Import wraps
-from collections import defaultdict # Import defaultdict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from collections import defaultdict, Counter, OrderedDict, deque # Import defaultdict
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import islice
+import heapq
+import queue
+import re
+import socket
+import sqlite3
+import threading
+import weakref
+from time import monotonic, perf_counter, sleep
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 db_path = os.path.join(basedir, 'smartfit.db') # Define db path explicitly
 
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'fallback-secret-key-for-dev') # Use environment variable in production
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + db_path # Use the explicit path
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-db = SQLAlchemy(app)
-login_manager = LoginManager(app)
-login_manager.login_view = 'login' # Redirect to login page if user tries to access protected page
+# --- Database Configuration ---
+# DATABASE_URL picks the backend: a sqlite:/// URL (the default is smartfit.db next to this
+# file) or a postgresql:// URL. Each backend has a tuned profile whose knobs can be
+# overridden from the environment.
+
+def env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+def database_url():
+    url = os.environ.get('DATABASE_URL') or 'sqlite:///' + db_path
+    if url.startswith('postgres://'): # Scheme still used by some hosting providers
+        url = 'postgresql://' + url[len('postgres://'):]
+    return url
+
+# Applied to every new SQLite connection (see _configure_sqlite_connection)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL', # Readers no longer block on a writer
+    'synchronous': 'NORMAL', # Safe with WAL; only fsyncs at checkpoints
+    'busy_timeout': env_int('SQLITE_BUSY_TIMEOUT_MS', 5000), # Wait for a lock instead of failing at once
+    'mmap_size': env_int('SQLITE_MMAP_SIZE', 256 * 1024 * 1024),
+    'cache_size': -env_int('SQLITE_CACHE_SIZE_KB', 64 * 1024), # Negative means KiB rather than pages
+}
+
+def database_engine_options(url):
+    """SQLAlchemy engine options for the backend named by url."""
+    if url.startswith('sqlite'):
+        return {} # Tuned by the PRAGMAs each connection runs on connect
+    if url.startswith('postgresql'):
+        statement_timeout = env_int('DB_STATEMENT_TIMEOUT_MS', 15000)
+        lock_timeout = env_int('DB_LOCK_TIMEOUT_MS', 5000)
+        return {
+            'pool_size': env_int('DB_POOL_SIZE', 10),
+            'max_overflow': env_int('DB_MAX_OVERFLOW', 5),
+            'pool_timeout': env_int('DB_POOL_TIMEOUT', 10), # Seconds to wait for a free connection
+            'pool_recycle': env_int('DB_POOL_RECYCLE', 1800),
+            'pool_pre_ping': True, # Replace connections the server or a proxy has dropped
+            'connect_args': {
+                'connect_timeout': env_int('DB_CONNECT_TIMEOUT', 5),
+                'application_name': 'smartfit',
+                'options': f'-c statement_timeout={statement_timeout} -c lock_timeout={lock_timeout}',
+            },
+        }
+    raise RuntimeError(f'Unsupported DATABASE_URL {url!r}: use a sqlite:/// or postgresql:// URL.')
+
+@event.listens_for(Engine, 'connect')
+def _configure_sqlite_connection(dbapi_connection, connection_record):
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    for pragma, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f'PRAGMA {pragma} = {value}')
+    cursor.close()
+
+# Routes, request hooks and CLI commands are registered on this blueprint; create_app() (at the
+# end of this file) builds an application around it
+main = Blueprint('main', __name__, cli_group=None) # Commands stay top-level: `flask migrate`
+apps = weakref.WeakSet() # The apps create_app() has built in this process (one, outside tests)
+
+db = SQLAlchemy()
+login_manager = LoginManager()
+login_manager.login_view = 'main.login' # Redirect to login page if user tries to access protected page
 login_manager.login_message_category = 'info' # Flash message category
 
 # --- Database Models ---
@@ -33,21 +116,30 @@ class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(80), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
+    password_hash = db.Column(db.String(256)) # scrypt hashes are ~160 chars; only SQLite ignores the length
     role = db.Column(db.String(20), nullable=False, default='user') # Added role field
     # Add cascade delete for related objects
     profile = db.relationship('Profile', backref='user', uselist=False, cascade="all, delete-orphan") # One-to-one relationship
     workout_logs = db.relationship('WorkoutLog', backref='logger', lazy='dynamic', cascade="all, delete-orphan")
     meal_logs = db.relationship('MealLog', backref='logger', lazy='dynamic', cascade="all, delete-orphan")
+    workout_sets = db.relationship('WorkoutSet', lazy='dynamic', cascade="all, delete-orphan")
+    daily_nutrition = db.relationship('DailyNutrition', lazy='dynamic', cascade="all, delete-orphan")
+    data_version = db.relationship('UserDataVersion', uselist=False, cascade="all, delete-orphan")
     # Many-to-Many relationship with Workout - Association table handles deletes automatically
     saved_workouts = db.relationship('Workout', secondary=user_saved_workouts, lazy='dynamic',
                                      backref=db.backref('saved_by_users', lazy='dynamic'))
 
+    # Case-insensitive prefix search in the admin user list
+    __table_args__ = (
+        db.Index('ix_user_username_lower', func.lower(username)),
+        db.Index('ix_user_email_lower', func.lower(email)),
+    )
+
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
 
     def __repr__(self):
         return f'<User {self.username}>'
@@ -106,16 +198,50 @@ class Meal(db.Model):
 
 class WorkoutLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    workout_name = db.Column(db.String(100), nullable=False)
+    workout_id = db.Column(db.Integer, db.ForeignKey('workout.id'), nullable=True, index=True) # NULL for names not in the catalog
+    workout_name = db.Column(db.String(100), nullable=False) # Name when logged, kept for display
     intensity_level = db.Column(db.String(50), nullable=True) # e.g., 'High', 'Medium', 'Low', '7/10'
     repetitions = db.Column(db.String(100), nullable=True) # e.g., '3x10', '5x5 @ 100kg', '15 reps'
     notes = db.Column(db.Text, nullable=True)
     log_time = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    calories_burned = db.Column(db.Integer, nullable=True) # Estimated when logged (see Calorie Burn Estimates)
+    set_count = db.Column(db.Integer, nullable=True) # Sets parsed from repetitions; NULL until parsed (see Set/Rep Parsing)
+
+    # Composite indexes so per-user time-range and per-workout history queries are served without a table scan
+    __table_args__ = (
+        db.Index('ix_workout_log_user_id_log_time', 'user_id', 'log_time'),
+        db.Index('ix_workout_log_user_id_workout_id_log_time', 'user_id', 'workout_id', 'log_time'),
+    )
 
     def __repr__(self):
         return f'<WorkoutLog {self.workout_name} by {self.user_id}>'
 
+# One row per set parsed from a WorkoutLog's repetitions text, written together with the log
+class WorkoutSet(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    log_id = db.Column(db.Integer, db.ForeignKey('workout_log.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    # workout_id and workout_name are copied from the log so progression queries skip the join
+    workout_id = db.Column(db.Integer, db.ForeignKey('workout.id'), nullable=True)
+    workout_name = db.Column(db.String(100), nullable=False)
+    log_time = db.Column(db.DateTime, nullable=False)
+    set_number = db.Column(db.Integer, nullable=False) # 1-based, in the order written
+    reps = db.Column(db.Integer, nullable=False)
+    load = db.Column(db.Float, nullable=True) # As written; NULL for unloaded (bodyweight) sets
+    unit = db.Column(db.String(10), nullable=True) # 'kg', 'lb', or NULL when none was written
+    load_kg = db.Column(db.Float, nullable=True)
+    est_1rm = db.Column(db.Float, nullable=True) # Epley estimate in kg, for sets of up to MAX_1RM_REPS reps
+
+    # Per-user, per-exercise history in time order, grouped by log (progression charts)
+    __table_args__ = (
+        db.Index('ix_workout_set_user_workout_id_time', 'user_id', 'workout_id', 'log_time', 'log_id'),
+        db.Index('ix_workout_set_log_id', 'log_id'),
+    )
+
+    def __repr__(self):
+        return f'<WorkoutSet {self.reps} x {self.load_kg}kg of {self.workout_name} by {self.user_id}>'
+
 class MealLog(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     meal_name = db.Column(db.String(100), nullable=False) # Could link to Meal.id later
@@ -131,6 +257,8 @@ class MealLog(db.Model):
     log_time = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
+    __table_args__ = (db.Index('ix_meal_log_user_id_log_time', 'user_id', 'log_time'),)
+
     def __repr__(self):
         return f'<MealLog {self.meal_name} by {self.user_id}>'
 
@@ -141,26 +269,2442 @@ class WeightLog(db.Model):
     log_time = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
 
+    __table_args__ = (db.Index('ix_weight_log_user_id_log_time', 'user_id', 'log_time'),)
+
     def __repr__(self):
         return f'<WeightLog {self.weight}kg on {self.log_time.strftime("%Y-%m-%d")} by {self.user_id}>'
 
+# Rollup of MealLog totals per user per day, maintained whenever a MealLog is written
+class DailyNutrition(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    calories = db.Column(db.Integer, nullable=False, default=0)
+    protein = db.Column(db.Float, nullable=False, default=0)
+    carbs = db.Column(db.Float, nullable=False, default=0)
+    fat = db.Column(db.Float, nullable=False, default=0)
+    fiber = db.Column(db.Float, nullable=False, default=0)
+    sugar = db.Column(db.Float, nullable=False, default=0)
+    meal_count = db.Column(db.Integer, nullable=False, default=0)
 
-@login_manager.user_loader
-def load_user(user_id):
-    # Use the recommended db.session.get() method
-    return db.session.get(User, int(user_id))
+    def __repr__(self):
+        return f'<DailyNutrition {self.day} for {self.user_id}: {self.calories} kcal>'
+
+# Bumped on every write to a user's logs or profile; dashboard widgets derive their validators from it
+class UserDataVersion(db.Model):
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<UserDataVersion {self.version} for {self.user_id}>'
+
+# Single row bumped by every flush that touches the Workout/Meal catalogs; tags the in-memory read model
+class CatalogVersion(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<CatalogVersion {self.version}>'
+
+# One row per schema migration started on this database (see Schema Migrations)
+class SchemaMigration(db.Model):
+    version = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(200), nullable=False)
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    applied_at = db.Column(db.DateTime, nullable=True) # NULL until the migration has finished
+    cursor = db.Column(db.Text, nullable=True) # Where an interrupted backfill resumes
+    rows_done = db.Column(db.Integer, nullable=False, default=0)
+    owner = db.Column(db.String(200), nullable=True) # host:pid of the runner holding the lease
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<SchemaMigration {self.version} {"applied" if self.applied_at else "pending"}>'
+
+
+# --- Password Hashing ---
+# Hashing is deliberately slow, so during requests it runs in a small pool of worker processes
+# rather than in the request thread: the GIL stays free for other requests, and at most
+# PASSWORD_HASH_WORKERS hashes per server process compete with page traffic for CPU. Up to
+# PASSWORD_HASH_QUEUE_LIMIT more may wait; beyond that sign-ins get a 503 until the backlog
+# drains. Stored hashes made with other parameters are upgraded at the next successful login.
+# Outside requests (CLI commands, seeding) hashing runs inline.
+
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1') # Werkzeug method string; see `flask calibrate-password-hash`
+PASSWORD_HASH_WORKERS = env_int('PASSWORD_HASH_WORKERS', 1) # Per server process; 0 hashes in the request thread
+PASSWORD_HASH_QUEUE_LIMIT = env_int('PASSWORD_HASH_QUEUE_LIMIT', 32)
+PASSWORD_HASH_TIMEOUT = 10 # Seconds a request waits for its hash
+PASSWORD_HASH_NICE = 10 # Scheduling priority decrease for hash worker processes (POSIX)
+
+class PasswordHashBusy(Exception):
+    """Too many hashes are already queued (or the queue did not drain in time)."""
+
+class PasswordHasher:
+    """Runs Werkzeug hashing in a bounded process pool while handling requests."""
+
+    def __init__(self, method, workers, queue_limit):
+        self.method = method
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.target_prefix = None # Method as Werkzeug records it ("scrypt" -> "scrypt:32768:8:1")
+        self.reset()
+
+    def reset(self):
+        """Forgets the pool (used in forked worker processes, where the parent's pool is unusable)."""
+        self.pool = None
+        self.slots = threading.BoundedSemaphore(self.workers + self.queue_limit)
+        self.lock = threading.Lock()
+
+    def _run(self, operation, function, *args):
+        started = perf_counter()
+        try:
+            if self.workers <= 0 or not has_request_context():
+                return function(*args)
+            return self._run_in_pool(function, *args)
+        finally:
+            metrics.observe('smartfit_password_hash_seconds', perf_counter() - started, (('operation', operation),))
+
+    def _run_in_pool(self, function, *args):
+        if not self.slots.acquire(blocking=False):
+            metrics.inc('smartfit_password_hash_rejected_total')
+            raise PasswordHashBusy()
+        try:
+            with self.lock:
+                if self.pool is None:
+                    # spawn: forking a threaded server process is unsafe, and hash workers need no app state.
+                    # They run at a lower priority so page traffic gets the CPU first.
+                    self.pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'),
+                                                    **({'initializer': os.nice, 'initargs': (PASSWORD_HASH_NICE,)} if hasattr(os, 'nice') else {}))
+                pool = self.pool
+            future = pool.submit(function, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        try:
+            return future.result(PASSWORD_HASH_TIMEOUT)
+        except FutureTimeoutError:
+            metrics.inc('smartfit_password_hash_rejected_total')
+            raise PasswordHashBusy()
+        except BrokenProcessPool: # A hash worker died; start a fresh pool next time
+            with self.lock:
+                if self.pool is pool:
+                    self.pool = None
+            return function(*args)
+
+    def hash(self, password):
+        return self._run('generate', generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run('verify', check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        if self.target_prefix is None:
+            self.target_prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return password_hash.split('$', 1)[0] != self.target_prefix
+
+password_hasher = PasswordHasher(PASSWORD_HASH_METHOD, PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT)
+
+def password_hash_busy_response(template, **context):
+    """Re-renders a sign-in form with a 503 while the hash queue is full."""
+    flash('The server is busy signing other people in. Please try again in a moment.', 'warning')
+    response = make_response(render_template(template, **context), 503)
+    response.headers['Retry-After'] = '5'
+    return response
 
 # --- Decorators ---
 
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        if not current_user.is_authenticated or current_user.role != 'admin':
+        # The role is re-read rather than taken from the cached user, so demotions apply immediately
+        if not current_user.is_authenticated or \
+                db.session.query(User.role).filter(User.id == current_user.id).scalar() != 'admin':
             flash('You do not have permission to access this page.', 'danger')
-            return redirect(url_for('index'))
+            return redirect(url_for('main.index'))
         return f(*args, **kwargs)
     return decorated_function
 
+# --- Food Database (placeholder data until a real food composition source is loaded) ---
+
+FOOD_DATABASE = [
+    # Fruits
+    {
+        "id": "1", "name": "Apple, raw, with skin", "serving_description": "1 medium (182g)",
+        "calories": 95, "protein": 0.5, "carbs": 25.1, "fat": 0.3, "fiber": 4.4, "sugar": 18.9
+    },
+    {
+        "id": "2", "name": "Banana, raw", "serving_description": "1 medium (118g)",
+        "calories": 105, "protein": 1.3, "carbs": 27, "fat": 0.4, "fiber": 3.1, "sugar": 14.4
+    },
+    {
+        "id": "7", "name": "Orange, raw", "serving_description": "1 medium (154g)",
+        "calories": 73, "protein": 1.3, "carbs": 18.1, "fat": 0.2, "fiber": 3.4, "sugar": 14.0
+    },
+    {
+        "id": "8", "name": "Strawberries, raw", "serving_description": "1 cup, whole (144g)",
+        "calories": 46, "protein": 1.0, "carbs": 11.1, "fat": 0.4, "fiber": 2.9, "sugar": 7.0
+    },
+    {
+        "id": "9", "name": "Blueberries, raw", "serving_description": "1 cup (148g)",
+        "calories": 84, "protein": 1.1, "carbs": 21.4, "fat": 0.5, "fiber": 3.6, "sugar": 14.7
+    },
+    # Vegetables
+    {
+        "id": "10", "name": "Broccoli, raw", "serving_description": "1 cup, chopped (91g)",
+        "calories": 31, "protein": 2.5, "carbs": 6.0, "fat": 0.3, "fiber": 2.4, "sugar": 1.5
+    },
+    {
+        "id": "11", "name": "Spinach, raw", "serving_description": "1 cup (30g)",
+        "calories": 7, "protein": 0.9, "carbs": 1.1, "fat": 0.1, "fiber": 0.7, "sugar": 0.1
+    },
+    {
+        "id": "12", "name": "Carrot, raw", "serving_description": "1 medium (61g)",
+        "calories": 25, "protein": 0.6, "carbs": 5.8, "fat": 0.1, "fiber": 1.7, "sugar": 2.9
+    },
+    {
+        "id": "13", "name": "Bell Pepper, red, raw", "serving_description": "1 medium (119g)",
+        "calories": 30, "protein": 1.2, "carbs": 6.3, "fat": 0.3, "fiber": 2.1, "sugar": 4.2
+    },
+    # Grains & Breads
+    {
+        "id": "5", "name": "Oatmeal, cooked with water", "serving_description": "1 cup cooked (234g)",
+        "calories": 158, "protein": 5.9, "carbs": 27.3, "fat": 3.2, "fiber": 4.0, "sugar": 1.1
+    },
+    {
+        "id": "14", "name": "Brown Rice, cooked", "serving_description": "1 cup (195g)",
+        "calories": 216, "protein": 5.0, "carbs": 44.8, "fat": 1.8, "fiber": 3.5, "sugar": 0.4
+    },
+    {
+        "id": "15", "name": "White Rice, cooked", "serving_description": "1 cup (158g)",
+        "calories": 205, "protein": 4.3, "carbs": 44.5, "fat": 0.4, "fiber": 0.6, "sugar": 0.1
+    },
+    {
+        "id": "16", "name": "Whole Wheat Bread", "serving_description": "1 slice (32g)",
+        "calories": 81, "protein": 3.9, "carbs": 13.8, "fat": 1.1, "fiber": 1.9, "sugar": 1.4
+    },
+    {
+        "id": "17", "name": "White Bread", "serving_description": "1 slice (25g)",
+        "calories": 66, "protein": 1.9, "carbs": 12.7, "fat": 0.8, "fiber": 0.6, "sugar": 1.1
+    },
+    # Proteins
+    {
+        "id": "3", "name": "Chicken Breast, grilled", "serving_description": "3 oz (85g)",
+        "calories": 140, "protein": 26, "carbs": 0, "fat": 3, "fiber": 0, "sugar": 0
+    },
+    {
+        "id": "18", "name": "Salmon, Atlantic, cooked", "serving_description": "3 oz (85g)",
+        "calories": 175, "protein": 22.1, "carbs": 0, "fat": 8.9, "fiber": 0, "sugar": 0
+    },
+    {
+        "id": "19", "name": "Egg, large, boiled", "serving_description": "1 large (50g)",
+        "calories": 78, "protein": 6.3, "carbs": 0.6, "fat": 5.3, "fiber": 0, "sugar": 0.6
+    },
+    {
+        "id": "20", "name": "Tofu, firm", "serving_description": "1/2 cup (126g)",
+        "calories": 181, "protein": 21.8, "carbs": 3.5, "fat": 11.0, "fiber": 2.9, "sugar": 0.9
+    },
+    {
+        "id": "21", "name": "Lentils, cooked", "serving_description": "1 cup (198g)",
+        "calories": 230, "protein": 17.9, "carbs": 39.9, "fat": 0.8, "fiber": 15.6, "sugar": 1.8
+    },
+    {
+        "id": "22", "name": "Ground Beef, 90% lean, cooked", "serving_description": "3 oz (85g)",
+        "calories": 184, "protein": 24.2, "carbs": 0, "fat": 8.8, "fiber": 0, "sugar": 0
+    },
+    # Dairy & Alternatives
+    {
+        "id": "23", "name": "Milk, 2% fat", "serving_description": "1 cup (244g)",
+        "calories": 122, "protein": 8.1, "carbs": 11.7, "fat": 4.8, "fiber": 0, "sugar": 12.3
+    },
+    {
+        "id": "24", "name": "Yogurt, Greek, plain, nonfat", "serving_description": "1 container (170g)",
+        "calories": 97, "protein": 17.3, "carbs": 6.1, "fat": 0.4, "fiber": 0, "sugar": 6.1
+    },
+    {
+        "id": "25", "name": "Cheddar Cheese", "serving_description": "1 oz (28g)",
+        "calories": 114, "protein": 6.7, "carbs": 0.9, "fat": 9.4, "fiber": 0, "sugar": 0.1
+    },
+    {
+        "id": "26", "name": "Almond Milk, unsweetened", "serving_description": "1 cup (240ml)",
+        "calories": 30, "protein": 1.0, "carbs": 1.0, "fat": 2.5, "fiber": 1.0, "sugar": 0
+    },
+    # Fats & Oils
+    {
+        "id": "27", "name": "Olive Oil", "serving_description": "1 tbsp (14g)",
+        "calories": 119, "protein": 0, "carbs": 0, "fat": 13.5, "fiber": 0, "sugar": 0
+    },
+    {
+        "id": "28", "name": "Avocado, raw", "serving_description": "1/2 medium (100g)",
+        "calories": 160, "protein": 2.0, "carbs": 8.5, "fat": 14.7, "fiber": 6.7, "sugar": 0.7
+    },
+    {
+        "id": "29", "name": "Almonds", "serving_description": "1 oz (approx 23 nuts, 28g)",
+        "calories": 164, "protein": 6.0, "carbs": 6.1, "fat": 14.2, "fiber": 3.5, "sugar": 1.2
+    },
+    # Beverages
+    {
+        "id": "6", "name": "Apple Juice, unsweetened", "serving_description": "1 cup (248g)",
+        "calories": 114, "protein": 0.2, "carbs": 28, "fat": 0.3, "fiber": 0.5, "sugar": 24
+    },
+    {
+        "id": "30", "name": "Coffee, black, brewed", "serving_description": "1 cup (8 fl oz)",
+        "calories": 2, "protein": 0.3, "carbs": 0, "fat": 0, "fiber": 0, "sugar": 0
+    },
+    # Prepared/Mixed Foods (Examples - highly variable)
+    {
+        "id": "4", "name": "Chicken Salad Sandwich", "serving_description": "1 sandwich",
+        "calories": 450, "protein": 20, "carbs": 40, "fat": 22, "fiber": 3, "sugar": 5 # Example estimate
+    },
+    {
+        "id": "31", "name": "Pizza, Cheese, regular crust", "serving_description": "1 slice (1/8 of 14\" pizza)",
+        "calories": 285, "protein": 12.2, "carbs": 35.7, "fat": 10.4, "fiber": 2.5, "sugar": 3.8 # Example estimate
+    },
+    {
+        "id": "32", "name": "Caesar Salad with Grilled Chicken", "serving_description": "1 large serving",
+        "calories": 550, "protein": 40, "carbs": 15, "fat": 35, "fiber": 5, "sugar": 3 # Example estimate
+    },
+]
+
+# --- Catalog Change Notifications ---
+# In-memory structures built from the Workout/Meal catalogs register a callback here and are
+# told, after each commit, which catalog models changed in that transaction. The flush that
+# changes a catalog also bumps CatalogVersion, so other processes can notice the change too.
+
+CATALOG_MODELS = (Workout, Meal)
+catalog_change_callbacks = []
+
+def on_catalog_change(callback):
+    """Decorator: call callback(changed_model_names) after a commit that touched the catalogs."""
+    catalog_change_callbacks.append(callback)
+    return callback
+
+def catalog_columns_changed(obj):
+    """
+    True if a flushed catalog row's own columns changed. Saving a workout to a user's list
+    only changes the saved_by_users collection, which marks the Workout dirty too.
+    """
+    state = inspect(obj)
+    return any(state.attrs[attr.key].history.has_changes() for attr in state.mapper.column_attrs)
+
+@event.listens_for(Session, 'after_flush')
+def _track_catalog_changes(session, flush_context):
+    changed = {type(obj).__name__ for obj in (*session.new, *session.deleted) if isinstance(obj, CATALOG_MODELS)}
+    changed.update(type(obj).__name__ for obj in session.dirty
+                   if isinstance(obj, CATALOG_MODELS) and catalog_columns_changed(obj))
+    if changed:
+        session.info.setdefault('changed_catalogs', set()).update(changed)
+        table = CatalogVersion.__table__
+        connection = session.connection()
+        if connection.execute(table.update().values(version=table.c.version + 1)).rowcount == 0:
+            connection.execute(table.insert().values(id=1, version=1))
+
+@event.listens_for(Session, 'after_commit')
+def _notify_catalog_changes(session):
+    changed = session.info.pop('changed_catalogs', None)
+    if changed:
+        for callback in catalog_change_callbacks:
+            callback(changed)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_catalog_changes(session):
+    session.info.pop('changed_catalogs', None)
+
+# --- Catalog Read Model ---
+# Catalog browsing is served from an immutable snapshot of compact records (no Text columns)
+# with precomputed category grouping and filter indexes. This process rebuilds it right after
+# its own catalog commits; other processes pick up a new CatalogVersion within
+# CATALOG_VERSION_CHECK_SECONDS. Large text is loaded per workout on detail views.
+
+CATALOG_VERSION_CHECK_SECONDS = 5
+WORKOUT_CATEGORY_ORDER = ['Push', 'Pull', 'Legs', 'Full Body', 'Cardio', 'Yoga/Flexibility']
+WORKOUT_DURATION_BUCKETS = ('1', '2', '3') # < 15 min, 15-30 min, > 30 min (the filter's values)
+
+def duration_bucket(minutes):
+    if minutes is None:
+        return None
+    if minutes < 15:
+        return '1'
+    return '2' if minutes <= 30 else '3'
+
+class WorkoutRecord:
+    """Read-only Workout fields needed to list and filter the catalog."""
+    __slots__ = ('id', 'name', 'category', 'intensity', 'duration_est', 'equipment', 'reps_sets', 'video_url', 'search_name')
+    COLUMNS = (Workout.id, Workout.name, Workout.category, Workout.intensity, Workout.duration_est,
+               Workout.equipment, Workout.reps_sets, Workout.video_url)
+
+    def __init__(self, row):
+        (self.id, self.name, self.category, self.intensity, self.duration_est,
+         self.equipment, self.reps_sets, self.video_url) = row
+        self.search_name = self.name.lower()
+
+class MealRecord:
+    """Read-only Meal fields (everything except the description)."""
+    __slots__ = ('id', 'name', 'meal_type', 'diet_type', 'calories_est', 'protein_est', 'carbs_est',
+                 'fat_est', 'fiber_est', 'sugar_est', 'recipe_link')
+    COLUMNS = (Meal.id, Meal.name, Meal.meal_type, Meal.diet_type, Meal.calories_est, Meal.protein_est,
+               Meal.carbs_est, Meal.fat_est, Meal.fiber_est, Meal.sugar_est, Meal.recipe_link)
+
+    def __init__(self, row):
+        (self.id, self.name, self.meal_type, self.diet_type, self.calories_est, self.protein_est,
+         self.carbs_est, self.fat_est, self.fiber_est, self.sugar_est, self.recipe_link) = row
+
+class CatalogSnapshot:
+    """The Workout and Meal catalogs at one CatalogVersion. Never mutated after construction."""
+    __slots__ = ('version', 'workouts', 'workouts_by_id', 'workouts_by_name', 'workout_categories', 'workouts_grouped',
+                 'workout_filters', 'meals', 'meals_by_id')
+
+    def __init__(self, version, workouts, meals):
+        self.version = version
+        self.workouts = tuple(sorted(workouts, key=lambda w: (w.name, w.id))) # Listing order
+        self.workouts_by_id = {w.id: w for w in self.workouts}
+        self.workouts_by_name = {w.name: w for w in sorted(self.workouts, key=lambda w: w.id, reverse=True)} # Oldest wins
+        self.workout_categories = tuple(sorted({w.category for w in self.workouts}))
+        self.workouts_grouped = self.group_by_category(self.workouts)
+        # filter name -> value -> ids of the workouts with that value
+        filters = {'category': defaultdict(set), 'intensity': defaultdict(set), 'duration': defaultdict(set)}
+        for w in self.workouts:
+            filters['category'][w.category].add(w.id)
+            filters['intensity'][w.intensity].add(w.id)
+            filters['duration'][duration_bucket(w.duration_est)].add(w.id)
+        self.workout_filters = {name: {value: frozenset(ids) for value, ids in index.items()}
+                                for name, index in filters.items()}
+        self.meals = tuple(sorted(meals, key=lambda m: m.id))
+        self.meals_by_id = {m.id: m for m in self.meals}
+
+    @staticmethod
+    def group_by_category(workouts):
+        """(category, workouts) pairs in WORKOUT_CATEGORY_ORDER, then any other categories."""
+        grouped = defaultdict(list)
+        for w in workouts:
+            grouped[w.category].append(w)
+        ordered = [(category, tuple(grouped.pop(category))) for category in WORKOUT_CATEGORY_ORDER if category in grouped]
+        return tuple(ordered + [(category, tuple(items)) for category, items in grouped.items()])
+
+    def find_workouts(self, search=None, intensity=None, duration=None, category=None):
+        """Workouts matching the catalog page filters, grouped like workouts_grouped."""
+        if duration not in WORKOUT_DURATION_BUCKETS:
+            duration = None # Unknown bucket values don't filter (as before)
+        if not (search or intensity or duration or category):
+            return self.workouts_grouped
+        ids = None
+        for name, value in (('intensity', intensity), ('duration', duration), ('category', category)):
+            if value:
+                matching = self.workout_filters[name].get(value, frozenset())
+                ids = matching if ids is None else ids & matching
+        workouts = self.workouts if ids is None else [w for w in self.workouts if w.id in ids]
+        if search:
+            needle = search.lower()
+            workouts = [w for w in workouts if needle in w.search_name]
+        return self.group_by_category(workouts)
+
+_catalog = {'snapshot': None, 'checked_at': float('-inf')}
+_catalog_lock = threading.Lock()
+
+def read_catalog_version():
+    return db.session.query(CatalogVersion.version).filter_by(id=1).scalar() or 0
+
+def build_catalog_snapshot(version):
+    workouts = [WorkoutRecord(row) for row in db.session.query(*WorkoutRecord.COLUMNS)]
+    meals = [MealRecord(row) for row in db.session.query(*MealRecord.COLUMNS)]
+    return CatalogSnapshot(version, workouts, meals)
+
+def get_catalog():
+    """Returns the current CatalogSnapshot, rebuilding it when the catalog version has moved on."""
+    now = monotonic()
+    snapshot = _catalog['snapshot']
+    if snapshot is not None and now - _catalog['checked_at'] < CATALOG_VERSION_CHECK_SECONDS:
+        record_cache_lookup('catalog', True)
+        return snapshot
+    rebuilt = False
+    with _catalog_lock:
+        snapshot = _catalog['snapshot']
+        if snapshot is None or now - _catalog['checked_at'] >= CATALOG_VERSION_CHECK_SECONDS:
+            version = read_catalog_version()
+            if snapshot is None or snapshot.version != version:
+                snapshot = build_catalog_snapshot(version)
+                _catalog['snapshot'] = snapshot
+                rebuilt = True
+            _catalog['checked_at'] = now
+    record_cache_lookup('catalog', not rebuilt)
+    return snapshot
+
+@on_catalog_change
+def invalidate_catalog(changed_models):
+    _catalog['checked_at'] = float('-inf') # Re-read the version (and rebuild) on next use
+
+# --- User Data Versions ---
+# Any flush that writes a user's logs or profile bumps that user's UserDataVersion row in
+# the same transaction. Writes that bypass the ORM (bulk imports, rollup rebuilds) call
+# touch_user_data() themselves.
+
+USER_DATA_MODELS = (WorkoutLog, MealLog, WeightLog, Profile, DailyNutrition)
+
+def upsert(table, connection=None):
+    """INSERT ... ON CONFLICT for the backend in use (SQLite and PostgreSQL spell it the same way)."""
+    dialect = (connection or db.session.get_bind()).dialect.name
+    return (postgresql_insert if dialect == 'postgresql' else sqlite_insert)(table)
+
+def touch_user_data(user_ids=None, connection=None):
+    """Bumps the data version of the given users (all users if None)."""
+    table = UserDataVersion.__table__
+    connection = connection or db.session.connection()
+    now = datetime.utcnow()
+    if user_ids is None:
+        connection.execute(table.update().values(version=table.c.version + 1, updated_at=now))
+        return
+    for user_id in user_ids: # An upsert, so two workers making a user's first write don't collide on the key
+        insert = upsert(table, connection).values(user_id=user_id, version=1, updated_at=now)
+        connection.execute(insert.on_conflict_do_update(index_elements=[table.c.user_id],
+                                                        set_={'version': table.c.version + 1, 'updated_at': now}))
+
+def get_user_data_version(user_id):
+    """Returns (version, updated_at) for a user; (0, None) if nothing was written yet."""
+    row = db.session.query(UserDataVersion.version, UserDataVersion.updated_at)\
+                    .filter(UserDataVersion.user_id == user_id).first()
+    return (row.version, row.updated_at) if row else (0, None)
+
+@event.listens_for(Session, 'after_flush')
+def _bump_user_data_versions(session, flush_context):
+    deleted_users = {obj.id for obj in session.deleted if isinstance(obj, User)}
+    user_ids = {obj.user_id for obj in (*session.new, *session.dirty, *session.deleted)
+                if isinstance(obj, USER_DATA_MODELS) and obj.user_id is not None} - deleted_users
+    if user_ids:
+        touch_user_data(sorted(user_ids), connection=session.connection())
+
+# --- Typo-Tolerant Food Search Index ---
+
+def tokenize(text):
+    """Lower-cased alphanumeric words of a name or query."""
+    return re.findall(r'[a-z0-9]+', text.lower())
+
+def word_trigrams(word):
+    """Trigrams of a word padded so prefixes and suffixes get their own grams."""
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class WordMatcher:
+    """
+    Resolves a query word to words of a fixed vocabulary by exact, prefix, infix and
+    trigram-similarity (misspelling) matches. Work per lookup depends on the vocabulary,
+    not on how many documents use those words.
+    """
+    FUZZY_THRESHOLD = 0.35 # Minimum trigram similarity for a misspelled word to count
+    MAX_PREFIX_WORDS = 64 # Vocabulary words considered per prefix match
+    MAX_MATCHED_WORDS = 64 # Best-scoring vocabulary words kept per query word
+
+    def __init__(self, words):
+        self.words = list(words)
+        self.word_ids = {word: word_id for word_id, word in enumerate(self.words)}
+        self.sorted_words = sorted(self.words)
+        self.word_gram_counts = array('i')
+        gram_postings = defaultdict(list)
+        for word_id, word in enumerate(self.words):
+            grams = word_trigrams(word)
+            self.word_gram_counts.append(len(grams))
+            for gram in grams:
+                gram_postings[gram].append(word_id)
+        self.gram_postings = {gram: array('i', word_ids) for gram, word_ids in gram_postings.items()}
+
+    def __len__(self):
+        return len(self.words)
+
+    def has_prefix(self, query_word):
+        """True if some vocabulary word starts with (or equals) query_word."""
+        start = bisect_left(self.sorted_words, query_word)
+        return start < len(self.sorted_words) and self.sorted_words[start].startswith(query_word)
+
+    def match_words(self, query_word):
+        """Returns {word_id: score} for vocabulary words matching one query word."""
+        scores = {}
+        exact_id = self.word_ids.get(query_word)
+        if exact_id is not None:
+            scores[exact_id] = 1.0
+
+        start = bisect_left(self.sorted_words, query_word)
+        for word in islice(self.sorted_words, start, start + self.MAX_PREFIX_WORDS):
+            if not word.startswith(query_word):
+                break
+            word_id = self.word_ids[word]
+            scores.setdefault(word_id, 0.7 + 0.2 * len(query_word) / len(word))
+
+        if len(query_word) >= 3:
+            query_grams = word_trigrams(query_word)
+            shared_counts = Counter()
+            for gram in query_grams:
+                shared_counts.update(self.gram_postings.get(gram, ()))
+            for word_id, shared in shared_counts.items():
+                if word_id in scores:
+                    continue
+                similarity = shared / (len(query_grams) + self.word_gram_counts[word_id] - shared)
+                if query_word in self.words[word_id]: # Infix match inside a longer word
+                    scores[word_id] = max(0.6, 0.8 * similarity)
+                elif similarity >= self.FUZZY_THRESHOLD:
+                    scores[word_id] = 0.8 * similarity
+        if len(scores) > self.MAX_MATCHED_WORDS:
+            scores = dict(heapq.nlargest(self.MAX_MATCHED_WORDS, scores.items(), key=lambda item: item[1]))
+        return scores
+
+class FoodSearchIndex:
+    """
+    Immutable search index over food entries (dicts with at least a 'name').
+    Entry names are split into words; a WordMatcher over the distinct words resolves each
+    query word to exact, prefix, infix and misspelled matches, and a word -> entries
+    inverted index turns those into candidate entries.
+    """
+    MAX_CANDIDATES = 5000 # Entries scanned per query word (best words and shortest names first)
+
+    def __init__(self, entries):
+        self.entries = entries
+        self.names = [entry['name'].lower() for entry in entries]
+        word_ids = {}
+        words = []
+        postings = []
+        # Shorter (more generic) names go first in every posting list
+        for entry_id in sorted(range(len(entries)), key=lambda i: len(self.names[i])):
+            for word in set(tokenize(self.names[entry_id])):
+                word_id = word_ids.get(word)
+                if word_id is None:
+                    word_id = word_ids[word] = len(words)
+                    words.append(word)
+                    postings.append([])
+                postings[word_id].append(entry_id)
+        self.vocabulary = WordMatcher(words)
+        self.postings = [array('i', entry_ids) for entry_ids in postings]
+        self.first_word_ids = array('i', (word_ids[name_words[0]] if name_words else -1
+                                          for name_words in map(tokenize, self.names)))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def search(self, query, limit=15):
+        """Returns up to `limit` entries ranked by word similarity with prefix/word-boundary boosts."""
+        query_words = tokenize(query)
+        candidate_scores = None
+        leading_matches = None
+        matched_word_count = 0
+        for query_word in query_words:
+            matches = self.vocabulary.match_words(query_word)
+            if not matches:
+                continue # Ignore words we cannot place rather than returning nothing
+            matched_word_count += 1
+            if leading_matches is None:
+                leading_matches = matches
+            entry_scores = {}
+            for word_id, score in sorted(matches.items(), key=lambda item: -item[1]):
+                for entry_id in self.postings[word_id][:self.MAX_CANDIDATES - len(entry_scores)]:
+                    if entry_scores.get(entry_id, 0) < score:
+                        entry_scores[entry_id] = score
+                if len(entry_scores) >= self.MAX_CANDIDATES:
+                    break
+            if candidate_scores is None:
+                candidate_scores = entry_scores
+            else:
+                candidate_scores = {entry_id: total + entry_scores[entry_id]
+                                    for entry_id, total in candidate_scores.items() if entry_id in entry_scores}
+        if not candidate_scores:
+            return []
+
+        query_text = ' '.join(query_words)
+        names = self.names
+        first_word_ids = self.first_word_ids
+
+        def rank(entry_id):
+            name = names[entry_id]
+            score = candidate_scores[entry_id] / matched_word_count
+            if name.startswith(query_text):
+                score += 0.5 # Whole query is a prefix of the name
+            # Word-boundary boost: the name's first word is what the first query word matched
+            score += 0.25 * leading_matches.get(first_word_ids[entry_id], 0)
+            return score - 0.002 * len(name) # Prefer shorter, more generic names on ties
+
+        return [self.entries[entry_id] for entry_id in heapq.nlargest(limit, candidate_scores, key=rank)]
+
+def meal_search_entries():
+    """Meal catalog rows in the same JSON shape as FOOD_DATABASE entries."""
+    return [
+        {
+            "id": f"meal-{meal.id}", "name": meal.name, "serving_description": "1 serving",
+            "calories": meal.calories_est, "protein": meal.protein_est, "carbs": meal.carbs_est,
+            "fat": meal.fat_est, "fiber": meal.fiber_est, "sugar": meal.sugar_est
+        }
+        for meal in get_catalog().meals
+    ]
+
+_food_search_index = None
+_food_search_generation = 0
+_food_search_lock = threading.Lock()
+
+def get_food_search_index():
+    """Returns the process-wide FoodSearchIndex, building it on first use or after a catalog change."""
+    global _food_search_index
+    index = _food_search_index
+    hit = index is not None
+    if index is None:
+        with _food_search_lock:
+            index = _food_search_index
+            if index is None:
+                generation = _food_search_generation
+                index = FoodSearchIndex(FOOD_DATABASE + meal_search_entries())
+                if generation == _food_search_generation: # Not invalidated while we were building
+                    _food_search_index = index
+    record_cache_lookup('food_search_index', hit)
+    return index
+
+@on_catalog_change
+def invalidate_food_search_index(changed_models):
+    global _food_search_index, _food_search_generation
+    if 'Meal' in changed_models:
+        _food_search_generation += 1
+        _food_search_index = None
+
+# --- Autocomplete Name Index & Response Cache ---
+
+class LRUCache:
+    """Small thread-safe LRU mapping with hit/miss counters."""
+
+    def __init__(self, max_size=1024):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+class NameIndex:
+    """
+    Sorted suffix index over catalog names for case-insensitive prefix and infix lookups
+    (the in-memory equivalent of name ILIKE '%q%'). Matches at the start of the name rank
+    first, then matches at the start of a word, then matches inside a word.
+    """
+    MAX_INDEXED_NAME_LENGTH = 100
+
+    def __init__(self, items):
+        """items: iterable of (name, payload) pairs; the payload is what lookups return."""
+        items = list(items)
+        self.names = [name.lower()[:self.MAX_INDEXED_NAME_LENGTH] for name, _ in items]
+        self.payloads = [payload for _, payload in items]
+        suffixes = sorted((name[start:], start, position)
+                          for position, name in enumerate(self.names)
+                          for start in range(len(name)))
+        self.suffix_keys = [suffix for suffix, _, _ in suffixes]
+        self.suffix_refs = [(start, position) for _, start, position in suffixes]
+
+    def lookup(self, query, limit=10):
+        query = query.lower()
+        best_rank = {}
+        for i in range(bisect_left(self.suffix_keys, query), len(self.suffix_keys)):
+            if not self.suffix_keys[i].startswith(query):
+                break
+            start, position = self.suffix_refs[i]
+            if start == 0:
+                rank = 0
+            elif not self.names[position][start - 1].isalnum():
+                rank = 1
+            else:
+                rank = 2
+            if rank < best_rank.get(position, 3):
+                best_rank[position] = rank
+        ordered = sorted(best_rank, key=lambda position: (best_rank[position], self.names[position]))
+        return [self.payloads[position] for position in ordered[:limit]]
+
+SUGGEST_INDEX_MAX_AGE = 60 # Seconds; bounds staleness after catalog edits made by other processes
+suggest_cache = LRUCache(max_size=2048) # (endpoint, query) -> suggestions
+_suggest_indexes = {}
+_suggest_generation = 0
+_suggest_lock = threading.Lock()
+
+def meal_suggestion(meal):
+    return {
+        'name': meal.name,
+        'calories': meal.calories_est,
+        'protein': meal.protein_est,
+        'carbs': meal.carbs_est,
+        'fat': meal.fat_est,
+        'fiber': meal.fiber_est,
+        'sugar': meal.sugar_est,
+        'meal_type': meal.meal_type # Include meal_type if needed
+    }
+
+def build_suggest_index(kind):
+    catalog = get_catalog()
+    if kind == 'workout':
+        return NameIndex((w.name, w.name) for w in sorted(catalog.workouts, key=lambda w: w.id))
+    return NameIndex((meal.name, meal_suggestion(meal)) for meal in catalog.meals)
+
+def get_suggest_index(kind):
+    """Returns the NameIndex for 'workout' or 'meal', (re)building it when missing or too old."""
+    entry = _suggest_indexes.get(kind)
+    hit = True
+    if entry is None or monotonic() - entry[0] > SUGGEST_INDEX_MAX_AGE:
+        with _suggest_lock:
+            entry = _suggest_indexes.get(kind)
+            if entry is None or monotonic() - entry[0] > SUGGEST_INDEX_MAX_AGE:
+                hit = False
+                generation = _suggest_generation
+                entry = (monotonic(), build_suggest_index(kind))
+                if generation == _suggest_generation: # Not invalidated while we were building
+                    _suggest_indexes[kind] = entry
+                    suggest_cache.clear() # Cached responses may predate the rebuilt index
+    record_cache_lookup('suggest_index', hit)
+    return entry[1]
+
+def cached_suggestions(kind, query, limit=10):
+    """Autocomplete results for a query, served from the LRU cache when possible."""
+    key = (kind, query.lower())
+    suggestions = suggest_cache.get(key)
+    if suggestions is None:
+        suggestions = get_suggest_index(kind).lookup(query, limit=limit)
+        suggest_cache.put(key, suggestions)
+    return suggestions
+
+@on_catalog_change
+def invalidate_suggest_indexes(changed_models):
+    global _suggest_generation
+    with _suggest_lock:
+        _suggest_generation += 1
+        if 'Workout' in changed_models:
+            _suggest_indexes.pop('workout', None)
+        if 'Meal' in changed_models:
+            _suggest_indexes.pop('meal', None)
+        suggest_cache.clear()
+
+# --- Signed-In User Cache ---
+# Flask-Login loads the user on every request, and most pages then read the profile too. Both
+# come from a per-process cache of compact snapshots (one joined query on a miss) that is
+# dropped after any commit touching the user or profile, and otherwise expires after
+# USER_CACHE_TTL_SECONDS so edits made in other processes show up. Anything not in the snapshot
+# (relationships, password hash) loads the User row on first use in that request. Admin checks
+# re-read the role from the database, so role changes apply at once in every process.
+
+USER_CACHE_TTL_SECONDS = env_int('USER_CACHE_TTL_SECONDS', 10)
+user_cache = LRUCache(max_size=4096) # user_id -> (expires_at, UserSnapshot)
+_user_cache_generation = 0
+_user_cache_lock = threading.Lock()
+
+class ProfileRecord:
+    """Read-only Profile fields (all of them; the row is small)."""
+    __slots__ = ('id', 'weight', 'height', 'goal', 'goal_weight', 'fitness_level', 'dietary_preferences',
+                 'goal_calories', 'goal_protein', 'goal_carbs', 'goal_fat', 'user_id')
+    COLUMNS = (Profile.id, Profile.weight, Profile.height, Profile.goal, Profile.goal_weight, Profile.fitness_level,
+               Profile.dietary_preferences, Profile.goal_calories, Profile.goal_protein, Profile.goal_carbs,
+               Profile.goal_fat, Profile.user_id)
+
+    def __init__(self, row):
+        (self.id, self.weight, self.height, self.goal, self.goal_weight, self.fitness_level, self.dietary_preferences,
+         self.goal_calories, self.goal_protein, self.goal_carbs, self.goal_fat, self.user_id) = row
+
+class UserSnapshot:
+    """Cached User fields plus the ProfileRecord (or None). Never mutated after construction."""
+    __slots__ = ('id', 'username', 'email', 'role', 'profile')
+    COLUMNS = (User.id, User.username, User.email, User.role)
+
+    def __init__(self, row):
+        self.id, self.username, self.email, self.role = row[:4]
+        self.profile = ProfileRecord(row[4:]) if row[4] is not None else None
+
+class CurrentUser(UserMixin):
+    """current_user for one request: snapshot fields, falling back to the User row for everything else."""
+
+    def __init__(self, snapshot):
+        self.id = snapshot.id
+        self.username = snapshot.username
+        self.email = snapshot.email
+        self.role = snapshot.role
+        self.profile = snapshot.profile # A ProfileRecord; use record.profile to modify the profile
+        self._record = None
+
+    @property
+    def record(self):
+        """The User row, loaded into this request's session on first use.
+
+        If the row is gone (the user was deleted, possibly by another process, while the
+        snapshot was cached), drops the snapshot, logs out and ends the request like login_required.
+        """
+        if self._record is None:
+            self._record = db.session.get(User, self.id)
+            if self._record is None:
+                invalidate_cached_users([self.id])
+                logout_user()
+                abort(login_manager.unauthorized())
+        return self._record
+
+    def __getattr__(self, name): # Only called for attributes not set above
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.record, name)
+
+def load_user_snapshot(user_id):
+    row = db.session.query(*UserSnapshot.COLUMNS, *ProfileRecord.COLUMNS)\
+                    .outerjoin(Profile, Profile.user_id == User.id).filter(User.id == user_id).first()
+    return UserSnapshot(row) if row else None
+
+def get_user_snapshot(user_id):
+    entry = user_cache.get(user_id)
+    if entry is not None and entry[0] > monotonic():
+        record_cache_lookup('user', True)
+        return entry[1]
+    record_cache_lookup('user', False)
+    generation = _user_cache_generation
+    snapshot = load_user_snapshot(user_id)
+    if snapshot is not None and generation == _user_cache_generation: # Not invalidated while we were loading
+        user_cache.put(user_id, (monotonic() + USER_CACHE_TTL_SECONDS, snapshot))
+    return snapshot
+
+def invalidate_cached_users(user_ids):
+    global _user_cache_generation
+    with _user_cache_lock:
+        _user_cache_generation += 1
+        for user_id in user_ids:
+            user_cache.pop(user_id)
+
+@event.listens_for(Session, 'after_flush')
+def _track_user_changes(session, flush_context):
+    user_ids = {obj.id if isinstance(obj, User) else obj.user_id
+                for obj in (*session.new, *session.dirty, *session.deleted) if isinstance(obj, (User, Profile))}
+    user_ids.discard(None)
+    if user_ids:
+        session.info.setdefault('changed_users', set()).update(user_ids)
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_changed_users(session):
+    user_ids = session.info.pop('changed_users', None)
+    if user_ids:
+        invalidate_cached_users(user_ids)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_user_changes(session):
+    session.info.pop('changed_users', None)
+
+@login_manager.user_loader
+def load_user(user_id):
+    snapshot = get_user_snapshot(int(user_id))
+    return CurrentUser(snapshot) if snapshot else None
+
+# --- Local Food Composition Database (SQLite FTS5) ---
+# A bulk-loaded food table with an FTS5 index on names. It is not an ORM model: ingest builds
+# staging tables and swaps them in with renames, so the live table is replaced atomically.
+# Only available on the SQLite backend; elsewhere food search uses the built-in data.
+
+FOOD_INGEST_CHUNK_SIZE = 10000
+FOOD_NUMERIC_FIELDS = ('calories', 'protein', 'carbs', 'fat', 'fiber', 'sugar')
+FOOD_DEFAULT_SERVING = '100 g' # USDA composition data is reported per 100 g
+
+# Normalised CSV header (lower case, alphanumerics only) -> food_item column.
+# Covers flat exports of FoodData Central and the SR Legacy ABBREV file.
+FOOD_COLUMN_ALIASES = {
+    'source_id': ('fdcid', 'ndbno', 'foodid', 'id', 'code'),
+    'name': ('description', 'name', 'longdesc', 'shrtdesc', 'fooddescription'),
+    'serving_description': ('servingdescription', 'serving', 'portion', 'gmwtdesc1'),
+    'calories': ('calories', 'energykcal', 'energkcal', 'kcal', 'energy'),
+    'protein': ('protein', 'proteing'),
+    'carbs': ('carbs', 'carbohydrate', 'carbohydratebydifference', 'carbohydrtg'),
+    'fat': ('fat', 'totalfat', 'totallipidfat', 'lipidtotg'),
+    'fiber': ('fiber', 'fibertotaldietary', 'fibertdg'),
+    'sugar': ('sugar', 'sugars', 'sugarstotal', 'sugartotg'),
+}
+
+FOOD_TABLE_DDL = """
+CREATE TABLE {table} (
+    id INTEGER PRIMARY KEY,
+    source_id TEXT,
+    name TEXT NOT NULL,
+    serving_description TEXT,
+    calories REAL, protein REAL, carbs REAL, fat REAL, fiber REAL, sugar REAL
+)"""
+FOOD_FTS_DDL = "CREATE VIRTUAL TABLE {table} USING fts5(name, tokenize='unicode61 remove_diacritics 2')"
+FOOD_STATE_DDL = """
+CREATE TABLE IF NOT EXISTS food_ingest_state (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    source TEXT, source_size INTEGER, source_mtime REAL,
+    rows_done INTEGER NOT NULL DEFAULT 0,
+    rows_loaded INTEGER NOT NULL DEFAULT 0,
+    live_version TEXT
+)"""
+
+def map_food_columns(fieldnames):
+    """Returns {food_item column: CSV header} for the headers present in a food dump."""
+    normalised = {re.sub(r'[^a-z0-9]', '', name.lower()): name for name in fieldnames or ()}
+    mapping = {}
+    for column, aliases in FOOD_COLUMN_ALIASES.items():
+        for alias in aliases:
+            if alias in normalised:
+                mapping[column] = normalised[alias]
+                break
+    return mapping
+
+def parse_food_row(row, mapping):
+    """Converts one CSV row to a food_item tuple (without id), or None if it has no name."""
+    def cell(column):
+        header = mapping.get(column)
+        return (row.get(header) or '').strip() if header else ''
+
+    name = cell('name')
+    if not name:
+        return None
+    values = [cell('source_id') or None, name, cell('serving_description') or FOOD_DEFAULT_SERVING]
+    for field in FOOD_NUMERIC_FIELDS:
+        raw = cell(field)
+        try:
+            values.append(float(raw) if raw else None)
+        except ValueError:
+            values.append(None)
+    return tuple(values)
+
+def ingest_food_database(path, chunk_size=FOOD_INGEST_CHUNK_SIZE, restart=False, progress=None):
+    """
+    Streams a flat USDA-style food composition CSV into food_item/food_item_fts.
+    Rows are loaded into staging tables in committed chunks; the progress is stored in
+    food_ingest_state, so an interrupted run resumes where it stopped when given the same
+    file. When the file is fully loaded the staging tables replace the live ones in a single
+    transaction. Returns the number of foods loaded.
+    """
+    if db.engine.dialect.name != 'sqlite':
+        raise RuntimeError('The local food database needs the SQLite backend (FTS5).')
+    stat = os.stat(path)
+    raw = db.engine.raw_connection()
+    conn = raw.driver_connection
+    previous_isolation = conn.isolation_level
+    conn.isolation_level = None # We issue BEGIN/COMMIT ourselves so DDL is transactional
+    try:
+        conn.execute(FOOD_STATE_DDL)
+        state = conn.execute("SELECT source, source_size, source_mtime, rows_done, rows_loaded "
+                             "FROM food_ingest_state WHERE id = 1").fetchone()
+        staging_exists = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'food_item_staging'").fetchone()
+        resumable = (not restart and state is not None and staging_exists is not None
+                     and state[:3] == (os.path.abspath(path), stat.st_size, stat.st_mtime))
+        if resumable:
+            rows_done, rows_loaded = state[3], state[4]
+        else:
+            rows_done = rows_loaded = 0
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DROP TABLE IF EXISTS food_item_staging")
+            conn.execute("DROP TABLE IF EXISTS food_item_staging_fts")
+            conn.execute(FOOD_TABLE_DDL.format(table='food_item_staging'))
+            conn.execute(FOOD_FTS_DDL.format(table='food_item_staging_fts'))
+            conn.execute("INSERT INTO food_ingest_state (id, source, source_size, source_mtime, rows_done, rows_loaded) "
+                         "VALUES (1, ?, ?, ?, 0, 0) ON CONFLICT(id) DO UPDATE SET source = excluded.source, "
+                         "source_size = excluded.source_size, source_mtime = excluded.source_mtime, "
+                         "rows_done = 0, rows_loaded = 0",
+                         (os.path.abspath(path), stat.st_size, stat.st_mtime))
+            conn.execute("COMMIT")
+
+        with open(path, newline='', encoding='utf-8-sig', errors='replace') as source:
+            reader = csv.DictReader(source)
+            mapping = map_food_columns(reader.fieldnames)
+            if 'name' not in mapping:
+                raise ValueError(f'No food name/description column found in {path}')
+            rows = islice(enumerate(reader, start=1), rows_done, None) # Skip rows committed by an earlier run
+            while True:
+                chunk = []
+                last_row_number = rows_done
+                for row_number, row in islice(rows, chunk_size):
+                    last_row_number = row_number
+                    food = parse_food_row(row, mapping)
+                    if food is not None:
+                        chunk.append((row_number,) + food) # Row number doubles as a stable id
+                if last_row_number == rows_done:
+                    break
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany("INSERT INTO food_item_staging VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", chunk)
+                conn.executemany("INSERT INTO food_item_staging_fts (rowid, name) VALUES (?, ?)",
+                                 [(food[0], food[2]) for food in chunk])
+                rows_done = last_row_number
+                rows_loaded += len(chunk)
+                conn.execute("UPDATE food_ingest_state SET rows_done = ?, rows_loaded = ? WHERE id = 1",
+                             (rows_done, rows_loaded))
+                conn.execute("COMMIT")
+                if progress:
+                    progress(rows_done, rows_loaded)
+
+        # Swap the fully loaded staging tables in atomically
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DROP TABLE IF EXISTS food_item_fts_vocab")
+        conn.execute("DROP TABLE IF EXISTS food_item")
+        conn.execute("DROP TABLE IF EXISTS food_item_fts")
+        conn.execute("ALTER TABLE food_item_staging RENAME TO food_item")
+        conn.execute("ALTER TABLE food_item_staging_fts RENAME TO food_item_fts")
+        conn.execute("CREATE VIRTUAL TABLE food_item_fts_vocab USING fts5vocab(food_item_fts, 'row')")
+        conn.execute("UPDATE food_ingest_state SET live_version = ? WHERE id = 1", (datetime.utcnow().isoformat(),))
+        conn.execute("COMMIT")
+        conn.execute("INSERT INTO food_item_fts (food_item_fts) VALUES ('optimize')")
+        return rows_loaded
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.isolation_level = previous_isolation
+        raw.close()
+
+FOOD_VERSION_CHECK_SECONDS = 30
+_food_dataset = {'version': None, 'checked_at': 0.0, 'vocabulary': None}
+_food_dataset_lock = threading.Lock()
+
+def get_food_dataset():
+    """
+    Returns (version, WordMatcher over the FTS vocabulary) for the loaded food table, or
+    (None, None) when no food database has been ingested. The version is re-checked at most
+    every FOOD_VERSION_CHECK_SECONDS, so a re-ingest from another process is picked up.
+    """
+    now = monotonic()
+    if now - _food_dataset['checked_at'] < FOOD_VERSION_CHECK_SECONDS:
+        return _food_dataset['version'], _food_dataset['vocabulary']
+    with _food_dataset_lock:
+        if db.engine.dialect.name != 'sqlite':
+            _food_dataset['checked_at'] = float('inf') # Never loaded on other backends
+        elif now - _food_dataset['checked_at'] >= FOOD_VERSION_CHECK_SECONDS:
+            try:
+                version = db.session.execute(text("SELECT live_version FROM food_ingest_state WHERE id = 1")).scalar()
+            except OperationalError: # Table not created yet
+                db.session.rollback()
+                version = None
+            if version != _food_dataset['version']:
+                vocabulary = None
+                if version:
+                    terms = db.session.execute(text("SELECT term FROM food_item_fts_vocab")).scalars()
+                    vocabulary = WordMatcher(terms)
+                _food_dataset.update(version=version, vocabulary=vocabulary)
+            _food_dataset['checked_at'] = now
+    return _food_dataset['version'], _food_dataset['vocabulary']
+
+def search_food_table(query, vocabulary, limit=15):
+    """
+    Searches the ingested food table with FTS5, ranked by bm25. Each query word is matched
+    as a prefix; a word that no food name starts with is replaced by the closest vocabulary
+    words, so misspellings such as "brocoli" still find results.
+    """
+    clauses = []
+    for word in tokenize(query):
+        if vocabulary is None or vocabulary.has_prefix(word):
+            clauses.append(f'"{word}"*')
+            continue
+        matches = vocabulary.match_words(word)
+        if not matches:
+            continue # Nothing close in the food vocabulary; ignore the word
+        variants = [f'"{vocabulary.words[word_id]}"'
+                    for word_id, _ in heapq.nlargest(5, matches.items(), key=lambda item: item[1])]
+        clauses.append('(' + ' OR '.join(variants) + ')')
+    if not clauses:
+        return []
+    # Rank inside the FTS query first so only the top rows are joined to food_item
+    rows = db.session.execute(text(
+        "SELECT f.source_id, f.id, f.name, f.serving_description, "
+        "f.calories, f.protein, f.carbs, f.fat, f.fiber, f.sugar "
+        "FROM (SELECT rowid, rank FROM food_item_fts WHERE food_item_fts MATCH :match "
+        "      ORDER BY rank LIMIT :limit) AS matches "
+        "JOIN food_item f ON f.id = matches.rowid ORDER BY matches.rank"
+    ), {'match': ' AND '.join(clauses), 'limit': limit}).all()
+    return [
+        {
+            "id": str(row.source_id or row.id), "name": row.name, "serving_description": row.serving_description,
+            "calories": row.calories, "protein": row.protein, "carbs": row.carbs,
+            "fat": row.fat, "fiber": row.fiber, "sugar": row.sugar
+        }
+        for row in rows
+    ]
+
+# --- Keyset (Cursor) Pagination ---
+
+WORKOUT_LOG_PAGE_SIZE = 25
+ADMIN_PAGE_SIZE = 50
+
+def encode_cursor(values):
+    """Opaque, URL-safe cursor holding the sort key of the last row on a page."""
+    payload = json.dumps([export_value(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor, order):
+    """Returns the sort key stored in a cursor, or None if it is missing or malformed."""
+    if not cursor:
+        return None
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(order):
+            return None
+        return [datetime.fromisoformat(value) if isinstance(expr.type, db.DateTime) and value is not None else value
+                for (expr, _), value in zip(order, values)]
+    except (ValueError, TypeError):
+        return None
+
+def keyset_after(order, after):
+    """Condition selecting the rows that come strictly after the sort key `after` in `order`."""
+    clauses = []
+    for i, (expr, descending) in enumerate(order):
+        equal_prefix = [order[j][0] == after[j] for j in range(i)]
+        clauses.append(and_(*equal_prefix, expr < after[i] if descending else expr > after[i]))
+    return or_(*clauses)
+
+def keyset_page(query, order, key, cursor=None, page_size=ADMIN_PAGE_SIZE):
+    """
+    Returns (rows, next_cursor) for one page of `query` ordered by `order`, a list of
+    (expression, descending) pairs ending in a unique column. `key(row)` gives a row's
+    values for those expressions. Pages continue strictly after the cursor's row, so rows
+    inserted meanwhile never shift or duplicate the rows of later pages.
+    """
+    after = decode_cursor(cursor, order)
+    if after is not None:
+        query = query.filter(keyset_after(order, after))
+    query = query.order_by(*[expr.desc() if descending else expr.asc() for expr, descending in order])
+    rows = query.limit(page_size + 1).all()
+    next_cursor = encode_cursor(key(rows[page_size - 1])) if len(rows) > page_size else None
+    return rows[:page_size], next_cursor
+
+# --- Chart Series Downsampling ---
+
+DEFAULT_CHART_POINTS = 150 # Used when the page doesn't say how wide the chart is
+MIN_CHART_POINTS = 10
+MAX_CHART_POINTS = 1000
+CHART_MODES = ('lttb', 'minmax', 'latest')
+
+def lttb(points, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling of (x, y) points sorted by x. Keeps the
+    first and last points and, from each bucket in between, the point forming the largest
+    triangle with the previously kept point and the next bucket's average.
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+    sampled = [points[0]]
+    bucket_size = (n - 2) / (threshold - 2)
+    previous = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        if end >= next_end: # Last bucket: the "next bucket" is just the final point
+            avg_x, avg_y = points[-1][0], points[-1][1]
+        else:
+            next_bucket = points[end:next_end]
+            avg_x = sum(p[0] for p in next_bucket) / len(next_bucket)
+            avg_y = sum(p[1] for p in next_bucket) / len(next_bucket)
+        ax, ay = points[previous][0], points[previous][1]
+        best_area, best = -1.0, start
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (points[j][1] - ay) - (ax - points[j][0]) * (avg_y - ay))
+            if area > best_area:
+                best_area, best = area, j
+        sampled.append(points[best])
+        previous = best
+    sampled.append(points[-1])
+    return sampled
+
+def minmax_downsample(points, threshold):
+    """Keeps the lowest and highest point (in time order) of each of threshold/2 equal-count buckets."""
+    n = len(points)
+    if threshold >= n or threshold < 2:
+        return list(points)
+    buckets = threshold // 2
+    sampled = []
+    for i in range(buckets):
+        bucket = points[i * n // buckets:(i + 1) * n // buckets]
+        if not bucket:
+            continue
+        low = min(range(len(bucket)), key=lambda k: bucket[k][1])
+        high = max(range(len(bucket)), key=lambda k: bucket[k][1])
+        sampled.extend(bucket[k] for k in sorted({low, high}))
+    return sampled
+
+def weight_series(user_id, points=DEFAULT_CHART_POINTS, mode='lttb'):
+    """
+    Chart.js-ready weight history: {'labels', 'data', 'total_points'}. 'latest' returns the
+    most recent `points` entries; 'lttb' and 'minmax' cover the whole history in at most
+    `points` points, so the payload stays bounded however long the history is.
+    """
+    points = max(MIN_CHART_POINTS, min(int(points), MAX_CHART_POINTS))
+    query = db.session.query(WeightLog.log_time, WeightLog.weight).filter(WeightLog.user_id == user_id)
+    if mode == 'latest':
+        rows = query.order_by(WeightLog.log_time.desc()).limit(points).all()[::-1]
+        total_points = query.count() if len(rows) == points else len(rows)
+    else:
+        rows = query.order_by(WeightLog.log_time.asc()).all()
+        total_points = len(rows)
+        if total_points > points:
+            samples = [(log_time.timestamp(), weight, log_time) for log_time, weight in rows]
+            downsample = minmax_downsample if mode == 'minmax' else lttb
+            rows = [(log_time, weight) for _, weight, log_time in downsample(samples, points)]
+    return {
+        'labels': [log_time.strftime('%Y-%m-%d') for log_time, _ in rows],
+        'data': [weight for _, weight in rows],
+        'total_points': total_points
+    }
+
+# --- Helpers for Time-Range Queries ---
+
+def day_range(start_day, days=1):
+    """
+    Returns a half-open (start, end) datetime range covering `days` calendar days
+    beginning at start_day. Filter with `log_time >= start` and `log_time < end`
+    so the (user_id, log_time) indexes can serve the query.
+    """
+    start = datetime.combine(start_day, time.min)
+    return start, start + timedelta(days=days)
+
+def log_day(column):
+    """SQL expression for the calendar day ('YYYY-MM-DD') of a DateTime column, for grouping."""
+    return func.date(column)
+
+# --- Helpers for the Daily Nutrition Rollup ---
+
+NUTRIENT_FIELDS = ('calories', 'protein', 'carbs', 'fat', 'fiber', 'sugar')
+
+def add_to_daily_nutrition(user_id, day, totals, meal_count=1):
+    """
+    Increments one DailyNutrition row by the given nutrient totals, creating it if needed. A
+    single upsert, so concurrent first meals of a day add up instead of colliding on the key.
+    The caller bumps the user's data version (core statements don't fire the flush hook).
+    """
+    table = DailyNutrition.__table__
+    insert = upsert(table).values(user_id=user_id, day=day, meal_count=meal_count,
+                                  **{field: totals[field] for field in NUTRIENT_FIELDS})
+    db.session.execute(insert.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.day],
+        set_={field: table.c[field] + insert.excluded[field] for field in (*NUTRIENT_FIELDS, 'meal_count')}
+    ))
+
+def get_daily_nutrition(user_id, start_day, days=1):
+    """Returns {date: DailyNutrition} for the given user over `days` days starting at start_day."""
+    rows = DailyNutrition.query.filter(
+        DailyNutrition.user_id == user_id,
+        DailyNutrition.day >= start_day,
+        DailyNutrition.day < start_day + timedelta(days=days)
+    ).all()
+    return {row.day: row for row in rows}
+
+DAILY_NUTRITION_CHUNK_USERS = 200 # Users whose rollups are rebuilt per transaction by the migration
+
+def rebuild_daily_nutrition(user_ids=None):
+    """Recomputes DailyNutrition rows from raw MealLog rows (for all users, or the given ones). The caller commits."""
+    delete_query = DailyNutrition.query
+    source_query = db.session.query(
+        MealLog.user_id,
+        log_day(MealLog.log_time),
+        *[func.coalesce(func.sum(getattr(MealLog, field)), 0) for field in NUTRIENT_FIELDS],
+        func.count(MealLog.id)
+    )
+    if user_ids is not None:
+        delete_query = delete_query.filter(DailyNutrition.user_id.in_(user_ids))
+        source_query = source_query.filter(MealLog.user_id.in_(user_ids))
+    source_query = source_query.group_by(MealLog.user_id, log_day(MealLog.log_time))
+
+    delete_query.delete(synchronize_session=False)
+    target_columns = ['user_id', 'day', *NUTRIENT_FIELDS, 'meal_count']
+    result = db.session.execute(
+        DailyNutrition.__table__.insert().from_select(target_columns, source_query)
+    )
+    touch_user_data(user_ids)
+    return result.rowcount
+
+def daily_nutrition_chunk(cursor, chunk_size):
+    """Backfill step: rebuilds the rollups of the next chunk_size users in id order. Returns (users, cursor)."""
+    order = [(User.id, False)]
+    after = decode_cursor(cursor, order)
+    user_ids = [user_id for (user_id,) in db.session.query(User.id).filter(User.id > (after[0] if after else 0))
+                                                  .order_by(User.id).limit(chunk_size)]
+    if not user_ids:
+        return 0, None
+    rebuild_daily_nutrition(user_ids)
+    return len(user_ids), encode_cursor([user_ids[-1]])
+
+# --- Workout Log Links ---
+# Workout logs (and their parsed sets) point at the catalog Workout by id, resolved from the
+# name when the log is written, so renaming a workout keeps its history and per-workout queries
+# seek the (user_id, workout_id, log_time) indexes by integer key. workout_name stays on the log
+# as written, for display and for names that aren't in the catalog (imports, deleted workouts),
+# whose logs keep workout_id NULL and are matched by name. Logs from before the column existed
+# are linked by migration 4 (`flask migrate`); until then they don't show under their workout.
+
+WORKOUT_LINK_CHUNK_SIZE = 20000 # Primary key range per UPDATE batch
+
+def resolve_workout_ids(rows):
+    """Sets workout_id on workout log row dicts from their workout_name (None if not in the catalog)."""
+    workouts_by_name = get_catalog().workouts_by_name
+    for row in rows:
+        workout = workouts_by_name.get(row['workout_name'])
+        row['workout_id'] = workout.id if workout else None
+
+def catalog_workout(row):
+    """The catalog WorkoutRecord a workout log row (dict or Row) refers to, or None."""
+    catalog = get_catalog()
+    if row['workout_id'] is not None:
+        return catalog.workouts_by_id.get(row['workout_id'])
+    return catalog.workouts_by_name.get(row['workout_name']) # Not linked yet
+
+def workout_history_filter(model, user_id, workout_name):
+    """
+    Condition selecting a user's WorkoutLog or WorkoutSet rows for the workout shown as
+    workout_name: by its catalog id, else (not a catalog workout) unlinked rows with that name.
+    Both are equality seeks on the (user_id, workout_id, log_time) indexes, in time order.
+    """
+    workout = get_catalog().workouts_by_name.get(workout_name)
+    if workout is not None:
+        return and_(model.user_id == user_id, model.workout_id == workout.id)
+    return and_(model.user_id == user_id, model.workout_id.is_(None), model.workout_name == workout_name)
+
+def workout_ids_chunk(cursor, chunk_size):
+    """
+    Backfill step: links the unlinked workout logs (and their sets) in the next chunk_size
+    primary key values to catalog workouts by name, with two set-based UPDATEs.
+    Returns (log ids scanned, cursor).
+    """
+    logs = WorkoutLog.__table__
+    sets = WorkoutSet.__table__
+    workouts = Workout.__table__
+    after = decode_cursor(cursor, [(logs.c.id, False)])
+    first_id, last_id = db.session.query(func.min(logs.c.id), func.max(logs.c.id)).one()
+    start = after[0] if after else first_id
+    if start is None or start > last_id:
+        return 0, None
+    end = start + chunk_size
+    catalog_id = db.select(func.min(workouts.c.id)).where(workouts.c.name == logs.c.workout_name).scalar_subquery()
+    db.session.execute(
+        logs.update()
+            .where(logs.c.id >= start, logs.c.id < end, logs.c.workout_id.is_(None),
+                   logs.c.workout_name.in_(db.select(workouts.c.name)))
+            .values(workout_id=catalog_id)
+    )
+    log_workout_id = db.select(logs.c.workout_id).where(logs.c.id == sets.c.log_id).scalar_subquery()
+    db.session.execute(
+        sets.update()
+            .where(sets.c.log_id >= start, sets.c.log_id < end, sets.c.workout_id.is_(None),
+                   log_workout_id.is_not(None))
+            .values(workout_id=log_workout_id)
+    )
+    return min(end, last_id + 1) - start, encode_cursor([end])
+
+def backfill_workout_ids(chunk_size=WORKOUT_LINK_CHUNK_SIZE, pause=0.05, progress=None):
+    """
+    Links existing workout logs and their sets to catalog workouts by name, one primary key
+    range per short transaction (see run_backfill). Only unlinked rows are touched, so it is
+    safe to interrupt and re-run. Returns the number of log ids scanned.
+    """
+    first_id, last_id = db.session.query(func.min(WorkoutLog.id), func.max(WorkoutLog.id)).one()
+    total = last_id - first_id + 1 if first_id is not None else 0
+    return run_backfill(workout_ids_chunk, chunk_size, pause=pause, progress=progress and (lambda done: progress(done, total)))
+
+def unlink_workout_logs(workout_id):
+    """Detaches logs and sets from a workout that is being deleted; they are then matched by their name."""
+    logs = WorkoutLog.__table__
+    sets = WorkoutSet.__table__
+    linked_logs = db.select(logs.c.id).where(logs.c.workout_id == workout_id)
+    db.session.execute(sets.update().where(sets.c.log_id.in_(linked_logs)).values(workout_id=None))
+    db.session.execute(logs.update().where(logs.c.workout_id == workout_id).values(workout_id=None))
+
+# --- Calorie Burn Estimates ---
+# Each workout log stores an estimate of the energy it burned, MET x body weight (kg) x hours,
+# worked out when the log is written. The MET value comes from the workout's category and the
+# logged intensity (else the catalog's intensity), the duration from the catalog's
+# duration_est, and the weight from the user's latest WeightLog at the time of the workout.
+# Logs written before the column existed are filled in by migration 6 (`flask migrate`).
+
+# Approximate values from the Compendium of Physical Activities
+MET_VALUES = {
+    'Push': {'Low': 3.5, 'Medium': 5.0, 'High': 6.0},
+    'Pull': {'Low': 3.5, 'Medium': 5.0, 'High': 6.0},
+    'Legs': {'Low': 3.5, 'Medium': 5.0, 'High': 6.0},
+    'Full Body': {'Low': 3.5, 'Medium': 5.0, 'High': 8.0}, # High is circuit training
+    'Cardio': {'Low': 4.0, 'Medium': 7.0, 'High': 10.0},
+    'Yoga/Flexibility': {'Low': 2.5, 'Medium': 3.0, 'High': 4.0},
+    'Home': {'Low': 3.0, 'Medium': 3.8, 'High': 5.0},
+}
+DEFAULT_METS = {'Low': 3.0, 'Medium': 4.5, 'High': 6.0} # Unknown workouts and categories
+DEFAULT_WORKOUT_MINUTES = 30
+DEFAULT_BODY_WEIGHT_KG = 70
+INTENSITY_WORDS = {'low': 'Low', 'light': 'Low', 'easy': 'Low', 'gentle': 'Low', 'recovery': 'Low',
+                   'medium': 'Medium', 'moderate': 'Medium', 'normal': 'Medium',
+                   'high': 'High', 'hard': 'High', 'vigorous': 'High', 'intense': 'High', 'max': 'High', 'maximum': 'High'}
+CALORIE_BACKFILL_CHUNK_SIZE = 5000
+
+def intensity_band(text):
+    """'Low', 'Medium' or 'High' for an intensity such as 'High', 'moderate' or '7/10'; None if unrecognised."""
+    if not text:
+        return None
+    text = text.lower()
+    score = re.search(r'(\d+(?:\.\d+)?)\s*/\s*10\b', text)
+    if score:
+        score = float(score.group(1))
+        return 'Low' if score <= 3 else 'Medium' if score <= 6 else 'High'
+    for word in re.findall(r'[a-z]+', text):
+        if word in INTENSITY_WORDS:
+            return INTENSITY_WORDS[word]
+    return None
+
+def calories_per_kg(workout, intensity_level):
+    """Estimated kcal burned per kg of body weight by one session of a catalog WorkoutRecord (None if unknown)."""
+    band = intensity_band(intensity_level) or intensity_band(workout and workout.intensity) or 'Medium'
+    met = MET_VALUES.get(workout and workout.category, DEFAULT_METS)[band]
+    minutes = (workout and workout.duration_est) or DEFAULT_WORKOUT_MINUTES
+    return met * minutes / 60
+
+def body_weight_lookup(windows):
+    """
+    windows: {user_id: (first_time, last_time)}. Returns weight_at(user_id, time): the user's
+    latest WeightLog weight at or before that time (their first weigh-in for earlier times),
+    else their profile weight, else DEFAULT_BODY_WEIGHT_KG.
+    """
+    histories = {}
+    for user_id, (start, end) in windows.items():
+        columns = (WeightLog.log_time, WeightLog.weight)
+        rows = db.session.query(*columns).filter(WeightLog.user_id == user_id, WeightLog.log_time <= start)\
+                         .order_by(WeightLog.log_time.desc()).limit(1).all()
+        if end > start:
+            rows += db.session.query(*columns).filter(WeightLog.user_id == user_id, WeightLog.log_time > start,
+                                                      WeightLog.log_time <= end).order_by(WeightLog.log_time).all()
+        if not rows: # No weigh-in up to the window's end: use the first one after it, if any
+            rows += db.session.query(*columns).filter(WeightLog.user_id == user_id, WeightLog.log_time > end)\
+                              .order_by(WeightLog.log_time).limit(1).all()
+        histories[user_id] = ([row[0] for row in rows], [row[1] for row in rows])
+    missing = [user_id for user_id, (times, _) in histories.items() if not times]
+    profile_weights = dict(db.session.query(Profile.user_id, Profile.weight).filter(Profile.user_id.in_(missing))) if missing else {}
+
+    def weight_at(user_id, when):
+        times, weights = histories[user_id]
+        if not weights:
+            return profile_weights.get(user_id) or DEFAULT_BODY_WEIGHT_KG
+        return weights[max(bisect_right(times, when) - 1, 0)]
+    return weight_at
+
+def estimate_calories_burned(rows):
+    """Fills in calories_burned on workout log row dicts that don't have a value yet."""
+    pending = [row for row in rows if row.get('calories_burned') is None]
+    if not pending:
+        return
+    windows = {}
+    for row in pending:
+        start, end = windows.get(row['user_id'], (row['log_time'], row['log_time']))
+        windows[row['user_id']] = (min(start, row['log_time']), max(end, row['log_time']))
+    weight_at = body_weight_lookup(windows)
+    factors = {} # Few distinct (workout, intensity) pairs, so each MET/duration lookup is done once per batch
+    for row in pending:
+        workout = catalog_workout(row)
+        key = (workout and workout.id, row['intensity_level'])
+        if key not in factors:
+            factors[key] = calories_per_kg(workout, row['intensity_level'])
+        row['calories_burned'] = round(factors[key] * weight_at(row['user_id'], row['log_time']))
+
+CALORIE_BACKFILL_ORDER = [(WorkoutLog.__table__.c.user_id, False), (WorkoutLog.__table__.c.log_time, False),
+                          (WorkoutLog.__table__.c.id, False)] # Batches each user's weight lookups
+
+def calories_burned_chunk(cursor, chunk_size, recompute=False):
+    """
+    Backfill step: estimates calories_burned for the next chunk_size workout logs (only those
+    without a value unless recompute) in (user_id, log_time, id) index order. Returns (rows, cursor).
+    """
+    table = WorkoutLog.__table__
+    pending = [table.c.calories_burned.is_(None)] if not recompute else []
+    query = db.session.query(table.c.id, table.c.user_id, table.c.workout_id, table.c.workout_name,
+                             table.c.intensity_level, table.c.log_time).filter(*pending)
+    after = decode_cursor(cursor, CALORIE_BACKFILL_ORDER)
+    if after is not None:
+        query = query.filter(keyset_after(CALORIE_BACKFILL_ORDER, after))
+    rows = [row._asdict() for row in query.order_by(*[column for column, _ in CALORIE_BACKFILL_ORDER]).limit(chunk_size)]
+    if not rows:
+        return 0, None
+    estimate_calories_burned(rows)
+    update = table.update().where(table.c.id == bindparam('row_id')).values(calories_burned=bindparam('kcal'))
+    db.session.execute(update, [{'row_id': row['id'], 'kcal': row['calories_burned']} for row in rows])
+    touch_user_data(sorted({row['user_id'] for row in rows}))
+    return len(rows), encode_cursor([rows[-1]['user_id'], rows[-1]['log_time'], rows[-1]['id']])
+
+def backfill_calories_burned(chunk_size=CALORIE_BACKFILL_CHUNK_SIZE, pause=0.05, recompute=False, progress=None):
+    """
+    Estimates calories_burned for existing workout logs (only those without a value unless
+    recompute) in chunks, each in its own short transaction (see run_backfill). Safe to
+    interrupt and re-run. Returns the number of rows updated.
+    """
+    pending = [WorkoutLog.calories_burned.is_(None)] if not recompute else []
+    total = db.session.query(func.count(WorkoutLog.id)).filter(*pending).scalar()
+    return run_backfill(lambda cursor, size: calories_burned_chunk(cursor, size, recompute=recompute), chunk_size,
+                        pause=pause, progress=progress and (lambda done: progress(done, total)))
+
+# --- Set/Rep Parsing ---
+# WorkoutLog.repetitions is free text ('3x10', '5x5 @ 100kg', '3 sets of 8-12 reps', '100kg x 5,
+# 110kg x 3', '15 reps'). It is parsed once, when the log is written, into WorkoutSet rows with
+# normalized reps and load, so progression charts read indexed numbers instead of re-parsing
+# every historical log. WorkoutLog.set_count records how many sets were found (0 for text such
+# as '30 min' or 'To Failure'); logs still at NULL are parsed by migration 5 (`flask migrate`).
+
+LOAD_UNITS = {'kg': 'kg', 'kgs': 'kg', 'kilo': 'kg', 'kilos': 'kg', 'lb': 'lb', 'lbs': 'lb', 'pound': 'lb', 'pounds': 'lb'}
+KG_PER_UNIT = {'kg': 1.0, 'lb': 0.45359237, None: 1.0} # Loads without a unit are taken as kg, like body weight
+MAX_PARSED_SETS = 20 # More sets than this is taken as a typo and the text is left unparsed
+MAX_PARSED_REPS = 500
+MAX_1RM_REPS = 12 # Rep-based 1RM estimates are unreliable beyond this
+SET_BACKFILL_CHUNK_SIZE = 5000
+
+SET_LOAD_PATTERN = re.compile(r'(?:@\s*)?(\d+(?:\.\d+)?)\s*(kgs?|kilos?|lbs?|pounds?)\b|@\s*(\d+(?:\.\d+)?)')
+SET_SCHEME_PATTERN = re.compile(r'^(\d+)\s*(?:x|sets?\s+of|sets?\s*x)\s*(\d+)(?:\s*(?:-|to)\s*\d+)?\s*(?:reps?)?$')
+LOAD_FIRST_PATTERN = re.compile(r'^x\s*(\d+)(?:\s*x\s*(\d+))?\s*(?:reps?)?$') # What's left of '100kg x 5 (x 3)'
+SINGLE_SET_PATTERN = re.compile(r'^(\d+)(?:\s*(?:-|to)\s*\d+)?\s*(?:reps?)?$')
+BODYWEIGHT_PATTERN = re.compile(r'\b(?:bw|body\s*weight)\b') # '3x10 bodyweight' is unloaded
+
+def estimated_1rm(reps, load_kg):
+    """Epley one-rep max estimate in kg, or None for unloaded or high-rep sets."""
+    if not load_kg or not 1 <= reps <= MAX_1RM_REPS:
+        return None
+    return round(load_kg if reps == 1 else load_kg * (1 + reps / 30), 1)
+
+def parse_sets(text):
+    """
+    Parses a repetitions string into a list of set dicts (set_number, reps, load, unit,
+    load_kg, est_1rm). Comma/semicolon-separated parts are parsed separately; a load given
+    only once ('10, 8, 6 @ 60kg') applies to every set. Returns [] if nothing is recognised.
+    """
+    if not text:
+        return []
+    parts = []
+    text = BODYWEIGHT_PATTERN.sub(' ', text.lower().replace('×', 'x').replace('*', 'x'))
+    for segment in re.split(r'[,;/+]|\bthen\b', text):
+        load_match = SET_LOAD_PATTERN.search(segment)
+        load = unit = None
+        if load_match:
+            load = float(load_match.group(1) or load_match.group(3))
+            unit = LOAD_UNITS.get(load_match.group(2))
+            segment = segment[:load_match.start()] + segment[load_match.end():]
+        segment = ' '.join(segment.split())
+        if not segment:
+            if load is not None and parts and parts[-1][2] is None: # '5x5, @ 100kg'
+                parts[-1] = (*parts[-1][:2], load, unit)
+            continue
+        for pattern, sets_group, reps_group in ((SET_SCHEME_PATTERN, 1, 2), (LOAD_FIRST_PATTERN, 2, 1),
+                                                (SINGLE_SET_PATTERN, None, 1)):
+            match = pattern.match(segment)
+            if match:
+                sets = int(match.group(sets_group) or 1) if sets_group else 1
+                parts.append((sets, int(match.group(reps_group)), load, unit))
+                break
+        else:
+            return [] # Any unrecognised part makes the whole text ambiguous
+    loads = {(load, unit) for _, _, load, unit in parts if load is not None}
+    if len(loads) == 1:
+        shared_load, shared_unit = loads.pop()
+        parts = [(sets, reps, shared_load, shared_unit) if load is None else (sets, reps, load, unit)
+                 for sets, reps, load, unit in parts]
+    if not parts or sum(sets for sets, *_ in parts) > MAX_PARSED_SETS:
+        return []
+    parsed = []
+    for sets, reps, load, unit in parts:
+        if not 0 < reps <= MAX_PARSED_REPS:
+            return []
+        load_kg = round(load * KG_PER_UNIT[unit], 2) if load else None
+        for _ in range(sets):
+            parsed.append({'set_number': len(parsed) + 1, 'reps': reps, 'load': load or None, 'unit': unit,
+                           'load_kg': load_kg, 'est_1rm': estimated_1rm(reps, load_kg)})
+    return parsed
+
+def workout_set_rows(log, log_id, sets):
+    """WorkoutSet insert rows for one workout log row dict and its parsed sets."""
+    return [{'log_id': log_id, 'user_id': log['user_id'], 'workout_id': log['workout_id'],
+             'workout_name': log['workout_name'], 'log_time': log['log_time'], **workout_set} for workout_set in sets]
+
+def insert_workout_logs(rows):
+    """Inserts workout log row dicts together with the sets parsed from their repetitions."""
+    table = WorkoutLog.__table__
+    parsed = [parse_sets(row.get('repetitions')) for row in rows]
+    for row, sets in zip(rows, parsed):
+        row['set_count'] = len(sets)
+    if not any(parsed):
+        db.session.execute(table.insert(), rows)
+        return
+    # RETURNING in parameter order gives each row's new id, still as one executemany
+    ids = db.session.execute(table.insert().returning(table.c.id, sort_by_parameter_order=True), rows).scalars().all()
+    db.session.execute(WorkoutSet.__table__.insert(),
+                       [set_row for row, log_id, sets in zip(rows, ids, parsed) if sets
+                        for set_row in workout_set_rows(row, log_id, sets)])
+
+def workout_sets_chunk(cursor, chunk_size, reparse=False):
+    """
+    Backfill step: parses the repetitions of the next chunk_size workout logs (only logs not
+    yet parsed unless reparse) in primary key order into WorkoutSet rows. Returns (rows, cursor).
+    """
+    table = WorkoutLog.__table__
+    sets_table = WorkoutSet.__table__
+    pending = [table.c.set_count.is_(None)] if not reparse else []
+    after = decode_cursor(cursor, [(table.c.id, False)])
+    rows = [row._asdict() for row in db.session.query(
+        table.c.id, table.c.user_id, table.c.workout_id, table.c.workout_name, table.c.log_time, table.c.repetitions
+    ).filter(table.c.id > (after[0] if after else 0), *pending).order_by(table.c.id).limit(chunk_size)]
+    if not rows:
+        return 0, None
+    if reparse:
+        db.session.execute(sets_table.delete().where(sets_table.c.log_id.in_([row['id'] for row in rows])))
+    parsed = [parse_sets(row['repetitions']) for row in rows]
+    set_rows = [set_row for row, sets in zip(rows, parsed) for set_row in workout_set_rows(row, row['id'], sets)]
+    if set_rows:
+        db.session.execute(sets_table.insert(), set_rows)
+    update = table.update().where(table.c.id == bindparam('row_id')).values(set_count=bindparam('sets'))
+    db.session.execute(update, [{'row_id': row['id'], 'sets': len(sets)} for row, sets in zip(rows, parsed)])
+    touch_user_data(sorted({row['user_id'] for row in rows}))
+    return len(rows), encode_cursor([rows[-1]['id']])
+
+def backfill_workout_sets(chunk_size=SET_BACKFILL_CHUNK_SIZE, pause=0.05, reparse=False, progress=None):
+    """
+    Parses the repetitions of existing workout logs into WorkoutSet rows (only logs not yet
+    parsed unless reparse) in chunks, each in its own short transaction (see run_backfill).
+    Safe to interrupt and re-run. Returns the number of logs processed.
+    """
+    pending = [WorkoutLog.set_count.is_(None)] if not reparse else []
+    total = db.session.query(func.count(WorkoutLog.id)).filter(*pending).scalar()
+    return run_backfill(lambda cursor, size: workout_sets_chunk(cursor, size, reparse=reparse), chunk_size,
+                        pause=pause, progress=progress and (lambda done: progress(done, total)))
+
+def strength_series(user_id, workout_name, points=DEFAULT_CHART_POINTS):
+    """
+    Per-session progression for one exercise: {'labels', 'est_1rm', 'top_set', 'volume',
+    'reps', 'loaded', 'total_points'}. Reads the (user_id, workout_id, log_time, log_id)
+    index in order, one row per session; long histories are reduced to `points` sessions
+    with LTTB on volume (total reps for unloaded exercises).
+    """
+    points = max(MIN_CHART_POINTS, min(int(points), MAX_CHART_POINTS))
+    rows = db.session.query(
+        WorkoutSet.log_time,
+        func.max(WorkoutSet.est_1rm),
+        func.max(WorkoutSet.load_kg),
+        func.sum(WorkoutSet.reps * WorkoutSet.load_kg),
+        func.sum(WorkoutSet.reps)
+    ).filter(workout_history_filter(WorkoutSet, user_id, workout_name))\
+     .group_by(WorkoutSet.log_time, WorkoutSet.log_id)\
+     .order_by(WorkoutSet.log_time, WorkoutSet.log_id).all()
+    total_points = len(rows)
+    loaded = any(row[2] for row in rows)
+    if total_points > points:
+        samples = [(row[0].timestamp(), (row[3] or 0) if loaded else row[4], i) for i, row in enumerate(rows)]
+        rows = [rows[i] for _, _, i in lttb(samples, points)]
+    return {
+        'labels': [log_time.strftime('%Y-%m-%d') for log_time, *_ in rows],
+        'est_1rm': [est_1rm for _, est_1rm, *_ in rows],
+        'top_set': [top_set for _, _, top_set, *_ in rows],
+        'volume': [round(volume, 1) if volume is not None else None for *_, volume, _ in rows],
+        'reps': [reps for *_, reps in rows],
+        'loaded': loaded,
+        'total_points': total_points
+    }
+
+# --- Bulk History Import ---
+
+IMPORT_MODELS = {'meal': MealLog, 'workout': WorkoutLog, 'weight': WeightLog}
+IMPORT_BATCH_SIZE = 5000 # Rows per INSERT batch / commit
+IMPORT_MAX_REPORTED_ERRORS = 500 # Keep the error report bounded for huge files
+IMPORT_SKIPPED_TYPES = ('profile', 'saved_workout') # Export records that aren't history, passed over on re-import
+
+def import_columns(model):
+    """Columns a user may supply for a log model (everything except the keys we assign)."""
+    return [column for column in model.__table__.columns if column.name not in ('id', 'user_id')]
+
+def parse_import_value(column, raw):
+    """Converts one raw CSV/JSON value to the column's Python type, raising ValueError if invalid."""
+    if isinstance(raw, str):
+        raw = raw.strip()
+    if raw is None or raw == '':
+        return None
+    if isinstance(column.type, db.DateTime):
+        if isinstance(raw, (int, float)):
+            return datetime.utcfromtimestamp(raw)
+        return datetime.fromisoformat(str(raw).replace('Z', '+00:00')).replace(tzinfo=None)
+    if isinstance(column.type, db.Integer):
+        value = float(raw)
+        if not value.is_integer():
+            raise ValueError(f'{column.name} must be a whole number')
+        return int(value)
+    if isinstance(column.type, db.Float):
+        return float(raw)
+    value = str(raw)
+    max_length = getattr(column.type, 'length', None)
+    if max_length and len(value) > max_length:
+        raise ValueError(f'{column.name} is longer than {max_length} characters')
+    return value
+
+def validate_import_record(kind, record):
+    """Validates a raw record against the log model's schema and returns a dict ready for INSERT."""
+    model = IMPORT_MODELS.get(kind)
+    if model is None:
+        raise ValueError(f'unknown record type "{kind}"')
+    row = {}
+    for column in import_columns(model):
+        try:
+            value = parse_import_value(column, record.get(column.name))
+        except (TypeError, ValueError, OverflowError) as e:
+            raise ValueError(f'invalid {column.name}: {e}')
+        if value is None:
+            if column.name == 'log_time':
+                value = datetime.utcnow()
+            elif not column.nullable:
+                raise ValueError(f'{column.name} is required')
+        if isinstance(value, (int, float)) and value < 0:
+            raise ValueError(f'{column.name} cannot be negative')
+        row[column.name] = value
+    return row
+
+def iter_import_records(stream, filename):
+    """
+    Yields (line_number, record_dict) from a CSV or NDJSON upload one line at a time,
+    so memory use does not depend on the file size.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if filename.lower().endswith('.csv'):
+        reader = csv.DictReader(text)
+        for record in reader:
+            yield reader.line_num, record
+    else: # NDJSON / JSON Lines
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_number, ValueError(f'invalid JSON: {e}')
+                continue
+            yield line_number, record
+
+def insert_log_rows(kind, rows):
+    """
+    Inserts validated log rows (each carrying its user_id) with one executemany, updating
+    the nutrition rollups and data versions of the users involved. The caller commits.
+    """
+    if kind == 'workout':
+        resolve_workout_ids(rows)
+        estimate_calories_burned(rows)
+        insert_workout_logs(rows)
+    else:
+        db.session.execute(IMPORT_MODELS[kind].__table__.insert(), rows)
+    if kind == 'meal':
+        day_totals = defaultdict(lambda: dict.fromkeys(NUTRIENT_FIELDS, 0))
+        day_counts = defaultdict(int)
+        for row in rows:
+            key = (row['user_id'], row['log_time'].date())
+            for field in NUTRIENT_FIELDS:
+                day_totals[key][field] += row[field] or 0
+            day_counts[key] += 1
+        for (user_id, day), totals in day_totals.items():
+            add_to_daily_nutrition(user_id, day, totals, meal_count=day_counts[user_id, day])
+    touch_user_data(sorted({row['user_id'] for row in rows})) # Core inserts don't fire the ORM flush hook
+
+def flush_import_batch(kind, rows):
+    """Inserts one batch of validated rows (and their nutrition rollups) in a single transaction."""
+    insert_log_rows(kind, rows)
+    db.session.commit()
+
+def import_history(user_id, stream, filename, default_kind=None, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Streams meal/workout/weight history from a CSV or NDJSON file into the log tables.
+    Each record's type comes from its 'type' field, falling back to default_kind; profile and
+    saved-workout records from an export are skipped. Returns a summary dict with per-type
+    insert counts, per-row errors and throughput.
+    """
+    started = datetime.utcnow()
+    batches = {kind: [] for kind in IMPORT_MODELS}
+    inserted = dict.fromkeys(IMPORT_MODELS, 0)
+    errors = []
+    error_count = 0
+    skipped = 0
+    rows_read = 0
+
+    for line_number, record in iter_import_records(stream, filename):
+        rows_read += 1
+        try:
+            if isinstance(record, Exception):
+                raise record
+            if not isinstance(record, dict):
+                raise ValueError('record must be an object')
+            kind = (record.get('type') or default_kind or '').strip().lower()
+            if kind in IMPORT_SKIPPED_TYPES:
+                skipped += 1
+                continue
+            row = validate_import_record(kind, record)
+        except ValueError as e:
+            error_count += 1
+            if len(errors) < IMPORT_MAX_REPORTED_ERRORS:
+                errors.append((line_number, str(e)))
+            continue
+
+        row['user_id'] = user_id
+        batches[kind].append(row)
+        if len(batches[kind]) >= batch_size:
+            flush_import_batch(kind, batches[kind])
+            inserted[kind] += len(batches[kind])
+            batches[kind] = []
+
+    for kind, rows in batches.items():
+        if rows:
+            flush_import_batch(kind, rows)
+            inserted[kind] += len(rows)
+
+    elapsed = max((datetime.utcnow() - started).total_seconds(), 1e-6)
+    total_inserted = sum(inserted.values())
+    return {
+        'rows_read': rows_read,
+        'inserted': inserted,
+        'total_inserted': total_inserted,
+        'skipped': skipped,
+        'error_count': error_count,
+        'errors': errors,
+        'elapsed_seconds': round(elapsed, 2),
+        'rows_per_second': int(total_inserted / elapsed),
+    }
+
+# --- Write-Behind Log Queue ---
+# With WRITE_BEHIND=sync or async, meal/workout/weight log inserts from the tracking routes
+# are queued and a single writer thread group-commits them: up to WRITE_BEHIND_BATCH_SIZE
+# rows, waiting at most WRITE_BEHIND_MAX_DELAY_MS for a batch to fill. In sync mode the
+# request waits until its row is committed; in async mode it returns as soon as the row is
+# queued. The default (off) inserts and commits in the request, as before.
+
+WRITE_BEHIND_MODES = ('off', 'sync', 'async')
+WRITE_BEHIND_MODE = os.environ.get('WRITE_BEHIND', 'off').lower()
+if WRITE_BEHIND_MODE not in WRITE_BEHIND_MODES:
+    raise RuntimeError(f'WRITE_BEHIND must be one of {", ".join(WRITE_BEHIND_MODES)}')
+WRITE_BEHIND_BATCH_SIZE = env_int('WRITE_BEHIND_BATCH_SIZE', 200)
+WRITE_BEHIND_MAX_DELAY_MS = env_int('WRITE_BEHIND_MAX_DELAY_MS', 10)
+WRITE_BEHIND_WAIT_SECONDS = 30 # How long a sync-mode request waits for its commit
+
+class PendingWrite:
+    """One queued log row for `app`'s database; `done` is set once it is committed (or has failed with `error`)."""
+    __slots__ = ('app', 'kind', 'row', 'done', 'error')
+
+    def __init__(self, app, kind, row):
+        self.app = app
+        self.kind = kind
+        self.row = row
+        self.done = threading.Event()
+        self.error = None
+
+class LogWriter:
+    """A queue of log rows drained by one writer thread that commits them in groups."""
+    _STOP = object()
+
+    def __init__(self, batch_size, max_delay_ms):
+        self.batch_size = batch_size
+        self.max_delay = max_delay_ms / 1000
+        self.reset()
+
+    def reset(self):
+        """Starts over with an empty queue and no writer thread (used in forked worker processes)."""
+        self.queue = queue.Queue()
+        self.thread = None
+        self.stopping = False
+        self.lock = threading.Lock()
+        self.stats = {'rows_committed': 0, 'rows_failed': 0, 'commits': 0, 'last_batch_size': 0,
+                      'commit_seconds_total': 0.0, 'commit_seconds_max': 0.0, 'commit_seconds_last': 0.0}
+
+    def submit(self, kind, row, wait=True):
+        """Queues a row. With wait, blocks until it is committed and re-raises any insert error."""
+        pending = PendingWrite(current_app._get_current_object(), kind, row)
+        with self.lock:
+            if self.stopping:
+                raise RuntimeError('The log writer is shut down.')
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='log-writer', daemon=True)
+                self.thread.start()
+            self.queue.put(pending)
+        if wait:
+            if not pending.done.wait(WRITE_BEHIND_WAIT_SECONDS):
+                raise TimeoutError('Timed out waiting for the log writer.')
+            if pending.error is not None:
+                raise pending.error
+        return pending
+
+    def run(self):
+        stop = False
+        while not stop:
+            item = self.queue.get()
+            if item is self._STOP:
+                break
+            batch = [item]
+            deadline = monotonic() + self.max_delay
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.queue.get(timeout=max(deadline - monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stop = True # Commit what we have, then exit
+                    break
+                batch.append(item)
+            self.commit(batch)
+
+    def commit(self, batch):
+        batch_apps = {pending.app for pending in batch}
+        if len(batch_apps) > 1: # Several apps in one process (tests): one transaction per database
+            for app in batch_apps:
+                self.commit([pending for pending in batch if pending.app is app])
+            return
+        started = monotonic()
+        app = batch[0].app
+        with app.app_context():
+            try:
+                rows_by_kind = defaultdict(list)
+                for pending in batch:
+                    rows_by_kind[pending.kind].append(pending.row)
+                for kind, rows in rows_by_kind.items():
+                    insert_log_rows(kind, rows)
+                db.session.commit()
+                error = None
+            except Exception as e:
+                db.session.rollback()
+                error = e
+        if error is not None and len(batch) > 1:
+            for pending in batch: # Retry one by one so a bad row only fails its own request
+                self.commit([pending])
+            return
+        elapsed = monotonic() - started
+        with self.lock:
+            stats = self.stats
+            if error is None:
+                stats['rows_committed'] += len(batch)
+                stats['commits'] += 1
+                stats['last_batch_size'] = len(batch)
+                stats['commit_seconds_total'] += elapsed
+                stats['commit_seconds_max'] = max(stats['commit_seconds_max'], elapsed)
+                stats['commit_seconds_last'] = elapsed
+            else:
+                stats['rows_failed'] += 1
+        if error is not None:
+            app.logger.error('Log writer failed to insert a %s row: %s', batch[0].kind, error, exc_info=error)
+        for pending in batch:
+            pending.error = error
+            pending.done.set()
+
+    def stop(self, timeout=None):
+        """Commits everything already queued, then stops the writer thread."""
+        with self.lock:
+            self.stopping = True
+            thread = self.thread
+        if thread is not None and thread.is_alive():
+            self.queue.put(self._STOP) # Queued after every pending row, so those are drained first
+            thread.join(timeout)
+
+    def metrics(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats['mode'] = WRITE_BEHIND_MODE
+        stats['queue_depth'] = self.queue.qsize()
+        stats['commit_seconds_avg'] = stats['commit_seconds_total'] / stats['commits'] if stats['commits'] else 0.0
+        return stats
+
+log_writer = LogWriter(WRITE_BEHIND_BATCH_SIZE, WRITE_BEHIND_MAX_DELAY_MS)
+atexit.register(log_writer.stop)
+
+def log_row(kind, user_id, **values):
+    """A meal/workout/weight log row dict for insert_log_rows (unset columns are None, log_time defaults to now)."""
+    row = {column.name: values.get(column.name) for column in import_columns(IMPORT_MODELS[kind])}
+    row['user_id'] = user_id
+    row['log_time'] = row['log_time'] or datetime.utcnow()
+    return row
+
+def save_log(kind, user_id, **values):
+    """
+    Inserts one meal/workout/weight log row for a user, through the write-behind queue when
+    it is enabled. Returns True once the row is committed, False if it was only queued.
+    """
+    row = log_row(kind, user_id, **values)
+    if WRITE_BEHIND_MODE == 'off' or log_writer.stopping:
+        insert_log_rows(kind, [row])
+        db.session.commit()
+        return True
+    wait = WRITE_BEHIND_MODE == 'sync'
+    log_writer.submit(kind, row, wait=wait)
+    return wait
+
+# --- Streaming History Export ---
+
+EXPORT_CHUNK_SIZE = 1000 # Rows fetched per short read transaction
+EXPORT_LOG_MODELS = (('weight', WeightLog), ('meal', MealLog), ('workout', WorkoutLog))
+EXPORT_SAVED_WORKOUT_COLUMNS = ('workout_id', 'name', 'category')
+
+def export_columns(model):
+    """Columns written for a model in an export (internal keys are left out)."""
+    return [column.name for column in model.__table__.columns if column.name not in ('id', 'user_id')]
+
+def iter_log_rows(model, user_id, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yields a user's rows from a log table in id order, fetched in keyset-paginated chunks.
+    Each chunk is a separate short read, so other requests can write to the database
+    between chunks and memory use is bounded by chunk_size.
+    """
+    table = model.__table__
+    columns = [table.c[name] for name in export_columns(model)]
+    last_id = 0
+    while True:
+        chunk = db.session.execute(
+            db.select(table.c.id, *columns)
+              .where(table.c.user_id == user_id, table.c.id > last_id)
+              .order_by(table.c.id)
+              .limit(chunk_size)
+              .execution_options(stream_results=True) # Server-side cursor where the driver supports it
+        ).all()
+        db.session.commit() # End the read transaction before handing rows to the client
+        if not chunk:
+            return
+        for row in chunk:
+            yield dict(row._mapping)
+        last_id = chunk[-1].id
+
+def iter_user_records(user_id):
+    """Yields (record_type, record_dict) for everything stored about one user."""
+    profile_row = Profile.query.filter_by(user_id=user_id).first()
+    if profile_row:
+        yield 'profile', {name: getattr(profile_row, name) for name in export_columns(Profile)}
+    db.session.commit()
+
+    for record_type, model in EXPORT_LOG_MODELS:
+        for row in iter_log_rows(model, user_id):
+            row.pop('id')
+            yield record_type, row
+
+    saved = db.session.execute(
+        db.select(Workout.id, Workout.name, Workout.category)
+          .join(user_saved_workouts, user_saved_workouts.c.workout_id == Workout.id)
+          .where(user_saved_workouts.c.user_id == user_id)
+          .order_by(Workout.name)
+    ).all()
+    db.session.commit()
+    for workout_id, name, category in saved:
+        yield 'saved_workout', {'workout_id': workout_id, 'name': name, 'category': category}
+
+def export_value(value):
+    """JSON/CSV-friendly representation of a column value."""
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def iter_export_lines(user_id, fmt='ndjson'):
+    """Yields a user's export as text chunks in NDJSON or CSV format."""
+    if fmt == 'csv':
+        # One CSV with a 'type' column and the union of all record columns, so it can be re-imported
+        header = ['type']
+        for model in (Profile,) + tuple(model for _, model in EXPORT_LOG_MODELS):
+            header += [name for name in export_columns(model) if name not in header]
+        header += [name for name in EXPORT_SAVED_WORKOUT_COLUMNS if name not in header]
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=header, extrasaction='ignore')
+        writer.writeheader()
+        for record_type, record in iter_user_records(user_id):
+            writer.writerow({'type': record_type, **{k: export_value(v) for k, v in record.items()}})
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    else:
+        for record_type, record in iter_user_records(user_id):
+            yield json.dumps({'type': record_type, **{k: export_value(v) for k, v in record.items()}}) + '\n'
+
+def gzip_stream(chunks):
+    """Gzip-compresses an iterable of text chunks on the fly."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) # wbits=31 writes a gzip header
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+# --- Schema Migrations ---
+# The schema is versioned by numbered migrations, recorded in SchemaMigration as they are
+# applied. Schema migrations are quick, additive DDL (new tables, nullable columns) and run when
+# the app starts; since they never depend on data they may go ahead of pending online ones.
+# Online migrations (index builds, data backfills) can take hours on a big database, so they run
+# with `flask migrate` while the app keeps serving: backfills work in short chunked transactions
+# that save a resume cursor with each chunk, and PostgreSQL builds indexes CONCURRENTLY.
+# MIGRATE_ON_START=all (the default, fine for small databases) also runs online migrations at
+# startup; set it to 'schema' in production and run `flask migrate` after deploying.
+# To change the schema, append a migration with the next version; never edit an applied one.
+
+MIGRATE_ON_START_MODES = ('all', 'schema', 'off')
+MIGRATE_ON_START = os.environ.get('MIGRATE_ON_START', 'all').lower()
+if MIGRATE_ON_START not in MIGRATE_ON_START_MODES:
+    raise RuntimeError(f'MIGRATE_ON_START must be one of {", ".join(MIGRATE_ON_START_MODES)}')
+MIGRATION_CHUNK_SIZE = env_int('MIGRATION_CHUNK_SIZE', 5000) # Rows per backfill transaction
+MIGRATION_LEASE_SECONDS = env_int('MIGRATION_LEASE_SECONDS', 900) # Silence after which another runner may take over
+OBSOLETE_INDEXES = ('ix_workout_set_user_workout_time',) # Superseded by ix_workout_set_user_workout_id_time
+
+class MigrationBusy(Exception):
+    """Another runner holds the lease on a migration."""
+
+class Migration:
+    __slots__ = ('version', 'name', 'online', 'apply')
+
+    def __init__(self, version, name, online, apply):
+        self.version = version
+        self.name = name
+        self.online = online
+        self.apply = apply
+
+MIGRATIONS = []
+
+def migration(version, name, online=False):
+    """Registers apply() as migration `version`. Online migrations are called with a MigrationRun."""
+    def register(apply):
+        if any(existing.version == version for existing in MIGRATIONS):
+            raise RuntimeError(f'Duplicate migration version {version}')
+        MIGRATIONS.append(Migration(version, name, online, apply))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return apply
+    return register
+
+def run_backfill(step, chunk_size, pause=0.05, cursor=None, checkpoint=None, progress=None):
+    """
+    Calls step(cursor, chunk_size) -> (rows, next_cursor) until it returns no cursor. Every
+    chunk is committed on its own, after checkpoint(next_cursor, rows) so a saved resume point
+    commits together with the chunk's writes, and `pause` seconds separate chunks so other
+    writers get the database lock. progress(done) follows each chunk. Returns the rows processed.
+    """
+    done = 0
+    while True:
+        rows, cursor = step(cursor, chunk_size)
+        if checkpoint:
+            checkpoint(cursor, rows)
+        db.session.commit()
+        done += rows
+        if progress and rows:
+            progress(done)
+        if cursor is None:
+            return done
+        sleep(pause)
+
+class MigrationRun:
+    """Handed to an online migration: runs its backfill from the saved cursor and keeps the lease alive."""
+
+    def __init__(self, record, chunk_size, pause, progress):
+        self.record = record
+        self.chunk_size = chunk_size
+        self.pause = pause
+        self.progress = progress
+
+    def heartbeat(self):
+        self.record.heartbeat_at = datetime.utcnow()
+        db.session.commit()
+
+    def backfill(self, step, total=None, chunk_size=None):
+        """Runs a backfill step (see run_backfill), resuming where an interrupted run stopped. One per migration."""
+        def checkpoint(cursor, rows):
+            self.record.cursor = cursor
+            self.record.rows_done += rows
+            self.record.heartbeat_at = datetime.utcnow()
+
+        def report(done):
+            if self.progress:
+                self.progress(self.record, done, total)
+        return run_backfill(step, chunk_size or self.chunk_size, pause=self.pause, cursor=self.record.cursor,
+                            checkpoint=checkpoint, progress=report)
+
+def migration_owner():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+def claim_migration(migration):
+    """
+    Takes the lease on a pending migration, creating its SchemaMigration row on first use.
+    Returns the row, or None if it is applied or another runner holds a live lease on it.
+    """
+    now = datetime.utcnow()
+    owner = migration_owner()
+    if db.session.get(SchemaMigration, migration.version) is None:
+        db.session.add(SchemaMigration(version=migration.version, name=migration.name, started_at=now, rows_done=0))
+        try:
+            db.session.commit()
+        except IntegrityError: # Another runner created it first
+            db.session.rollback()
+    claimed = SchemaMigration.query.filter(
+        SchemaMigration.version == migration.version,
+        SchemaMigration.applied_at.is_(None),
+        or_(SchemaMigration.owner.is_(None), SchemaMigration.owner == owner,
+            SchemaMigration.heartbeat_at < now - timedelta(seconds=MIGRATION_LEASE_SECONDS))
+    ).update({'owner': owner, 'heartbeat_at': now}, synchronize_session=False)
+    db.session.commit()
+    return db.session.get(SchemaMigration, migration.version) if claimed else None
+
+def run_migration(migration, chunk_size=MIGRATION_CHUNK_SIZE, pause=0.05, progress=None, wait=False):
+    """
+    Applies one migration under its lease. If another runner holds the lease, raises
+    MigrationBusy, or with wait, waits until the lease is free or the migration is applied.
+    Returns False if another runner applied it meanwhile.
+    """
+    while True:
+        record = claim_migration(migration)
+        if record is not None:
+            break
+        state = db.session.get(SchemaMigration, migration.version)
+        if state.applied_at is not None:
+            return False
+        if not wait:
+            raise MigrationBusy(f'Migration {migration.version} ({migration.name}) is being applied by {state.owner}')
+        sleep(1)
+    try:
+        if migration.online:
+            migration.apply(MigrationRun(record, chunk_size, pause, progress))
+        else:
+            migration.apply()
+        record.applied_at = datetime.utcnow()
+        record.cursor = None
+        record.owner = None
+        db.session.commit()
+    except BaseException:
+        db.session.rollback()
+        try: # Hand the lease back so the migration can be resumed at once
+            record.owner = None
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+        raise
+    return True
+
+def pending_migrations():
+    applied = {version for (version,) in db.session.query(SchemaMigration.version)
+                                                    .filter(SchemaMigration.applied_at.is_not(None))}
+    return [migration for migration in MIGRATIONS if migration.version not in applied]
+
+def migrate(online=True, target=None, chunk_size=MIGRATION_CHUNK_SIZE, pause=0.05, progress=None, announce=None, wait=False):
+    """
+    Applies pending migrations in version order, up to version `target`. Without online, only
+    schema migrations run. announce(migration, seconds) is called before (seconds=None) and
+    after each one. Returns the versions applied.
+    """
+    SchemaMigration.__table__.create(db.engine, checkfirst=True)
+    applied = []
+    for migration in pending_migrations():
+        if target is not None and migration.version > target:
+            break
+        if migration.online and not online:
+            continue
+        if announce:
+            announce(migration, None)
+        started = monotonic()
+        # Schema migrations are short, so wait out a concurrent runner rather than start without them
+        if run_migration(migration, chunk_size, pause, progress, wait=wait or not migration.online):
+            applied.append(migration.version)
+        if announce:
+            announce(migration, monotonic() - started)
+    return applied
+
+def stamp_migrations():
+    """Records every migration as applied (a database just made by db.create_all() is current)."""
+    now = datetime.utcnow()
+    db.session.add_all(SchemaMigration(version=migration.version, name=migration.name, started_at=now, applied_at=now,
+                                       rows_done=0) for migration in MIGRATIONS)
+    db.session.commit()
+
+def add_column(column):
+    """
+    ALTER TABLE ... ADD COLUMN for a nullable model column the table doesn't have yet. Without a
+    default this only changes the table definition (SQLite and PostgreSQL don't rewrite rows).
+    """
+    table = column.table
+    if column.name in {existing['name'] for existing in inspect(db.engine).get_columns(table.name)}:
+        return False
+    quote = db.engine.dialect.identifier_preparer.quote
+    column_type = column.type.compile(dialect=db.engine.dialect)
+    with db.engine.begin() as connection:
+        connection.execute(text(f'ALTER TABLE {quote(table.name)} ADD COLUMN {quote(column.name)} {column_type}'))
+    return True
+
+def add_missing_columns():
+    """Adds the nullable columns introduced after each existing table was created."""
+    inspector = inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        if inspector.has_table(table.name):
+            for column in table.columns:
+                add_column(column)
+
+def create_index_online(index):
+    """
+    CREATE INDEX IF NOT EXISTS. PostgreSQL builds it CONCURRENTLY (outside a transaction), so
+    writes carry on during the build; SQLite holds the write lock for the build while readers
+    carry on (WAL).
+    """
+    # IF NOT EXISTS rather than checkfirst: reflection can't see the expression indexes on User
+    if db.engine.dialect.name != 'postgresql':
+        with db.engine.begin() as connection:
+            connection.execute(CreateIndex(index, if_not_exists=True))
+        return
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        # An interrupted concurrent build leaves an invalid index behind, which IF NOT EXISTS would keep
+        invalid = connection.execute(text(
+            'SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE c.relname = :name AND NOT i.indisvalid'
+        ), {'name': index.name}).first()
+        if invalid:
+            drop_index_online(index.name)
+        index.dialect_kwargs['postgresql_concurrently'] = True
+        try:
+            connection.execute(CreateIndex(index, if_not_exists=True))
+        finally:
+            index.dialect_kwargs['postgresql_concurrently'] = False
+
+def drop_index_online(name):
+    """DROP INDEX IF EXISTS, CONCURRENTLY on PostgreSQL."""
+    quote = db.engine.dialect.identifier_preparer.quote
+    if db.engine.dialect.name != 'postgresql':
+        with db.engine.begin() as connection:
+            connection.execute(text(f'DROP INDEX IF EXISTS {quote(name)}'))
+        return
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        connection.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS {quote(name)}'))
+
+def ensure_indexes(heartbeat=None):
+    """Adds indexes to databases created before they existed, and drops superseded ones."""
+    for model in (User, WorkoutLog, WorkoutSet, MealLog, WeightLog):
+        for index in model.__table__.indexes:
+            create_index_online(index)
+            if heartbeat:
+                heartbeat()
+    for name in OBSOLETE_INDEXES:
+        drop_index_online(name)
+
+# Migrations 1-6 bring a database made by any earlier version of the app up to date; each step
+# is idempotent, since those databases never recorded which changes they already had.
+
+@migration(1, 'Create missing tables and columns')
+def create_tables_and_columns():
+    db.create_all() # Only creates tables that are missing
+    add_missing_columns()
+
+@migration(2, 'Create indexes', online=True)
+def create_indexes(run):
+    ensure_indexes(heartbeat=run.heartbeat)
+
+@migration(3, 'Rebuild daily nutrition rollups', online=True)
+def backfill_daily_nutrition(run):
+    run.backfill(daily_nutrition_chunk, total=db.session.query(func.count(User.id)).scalar(),
+                 chunk_size=DAILY_NUTRITION_CHUNK_USERS)
+
+@migration(4, 'Link workout logs to workouts', online=True)
+def backfill_workout_log_links(run):
+    first_id, last_id = db.session.query(func.min(WorkoutLog.id), func.max(WorkoutLog.id)).one()
+    run.backfill(workout_ids_chunk, total=last_id - first_id + 1 if first_id is not None else 0,
+                 chunk_size=WORKOUT_LINK_CHUNK_SIZE)
+
+@migration(5, 'Parse workout sets', online=True)
+def backfill_parsed_sets(run):
+    run.backfill(workout_sets_chunk, total=db.session.query(func.count(WorkoutLog.id)).filter(WorkoutLog.set_count.is_(None)).scalar())
+
+@migration(6, 'Estimate calories burned', online=True)
+def backfill_calorie_estimates(run):
+    run.backfill(calories_burned_chunk,
+                 total=db.session.query(func.count(WorkoutLog.id)).filter(WorkoutLog.calories_burned.is_(None)).scalar())
+
 # --- Helper Function for Nutrition Goal Estimation ---
 def estimate_nutrition_goals(weight_kg, height_cm, goal_text, fitness_level, goal_weight_kg=None): # Added goal_weight_kg
     """
@@ -259,57 +2803,599 @@ def estimate_nutrition_goals(weight_kg, height_cm, goal_text, fitness_level, goa
         'fat': int(round(goal_fat_g))
     }
 
-# --- Routes ---
+# --- Dashboard Summary ---
+# Everything the dashboard shows about a user (latest meal and workout, today's totals, profile
+# goals and weight) comes from one joined statement, kept per process until the user's data
+# version moves on (any write to their logs or profile) or the day changes. So a repeat view
+# costs a single primary-key lookup however many cards the dashboard grows.
+
+DASHBOARD_MEAL_COLUMNS = ('meal_name', 'meal_type', 'calories', 'protein', 'carbs', 'fat', 'fiber', 'sugar', 'notes', 'log_time')
+DASHBOARD_WORKOUT_COLUMNS = ('workout_name', 'intensity_level', 'repetitions', 'calories_burned', 'notes', 'log_time')
+DASHBOARD_PROFILE_COLUMNS = ('weight', 'goal_weight', 'goal_calories', 'goal_protein', 'goal_carbs', 'goal_fat')
+dashboard_cache = LRUCache(max_size=4096) # user_id -> DashboardSummary
+
+class RecentLog:
+    """Read-only fields of a user's latest meal or workout log (the dashboard cards)."""
+    __slots__ = DASHBOARD_MEAL_COLUMNS + ('workout_name', 'intensity_level', 'repetitions', 'calories_burned')
+
+    def __init__(self, columns, values):
+        for column, value in zip(columns, values):
+            setattr(self, column, value)
+
+    def __getattr__(self, name): # Fields of the other log kind read as missing (None)
+        if name in RecentLog.__slots__:
+            return None
+        raise AttributeError(name)
+
+class DashboardSummary:
+    """One user's dashboard data at one data version and day. Never mutated after construction."""
+    __slots__ = ('version', 'day', 'recent_meal', 'recent_workout', 'totals', 'calories_burned') + DASHBOARD_PROFILE_COLUMNS
+
+    def __init__(self, version, day, row):
+        self.version = version
+        self.day = day
+        values = iter(row)
+        meal = [next(values) for _ in DASHBOARD_MEAL_COLUMNS]
+        workout = [next(values) for _ in DASHBOARD_WORKOUT_COLUMNS]
+        self.recent_meal = RecentLog(DASHBOARD_MEAL_COLUMNS, meal) if meal[-1] is not None else None
+        self.recent_workout = RecentLog(DASHBOARD_WORKOUT_COLUMNS, workout) if workout[-1] is not None else None
+        self.totals = {field: next(values) or 0 for field in NUTRIENT_FIELDS}
+        for column in DASHBOARD_PROFILE_COLUMNS:
+            setattr(self, column, next(values))
+        self.calories_burned = next(values) # By the day's workouts
+
+    def today(self):
+        """Today's consumed/burned/net calories, macros and goals (the dashboard "today" card)."""
+        return {
+            'calories_consumed': self.totals['calories'],
+            'protein_consumed': self.totals['protein'],
+            'carbs_consumed': self.totals['carbs'],
+            'fat_consumed': self.totals['fat'],
+            'net_calories': self.totals['calories'] - self.calories_burned,
+            'calories_burned': self.calories_burned,
+            'goal_calories': self.goal_calories,
+            'goal_protein': self.goal_protein,
+            'goal_carbs': self.goal_carbs,
+            'goal_fat': self.goal_fat
+        }
+
+def dashboard_summary_query(user_id, day):
+    """Latest meal and workout, the day's rollup and calories burned, and the profile for one user, as a single row."""
+    def latest(model):
+        return db.session.query(model.id).filter(model.user_id == User.id)\
+                         .order_by(model.log_time.desc(), model.id.desc()).limit(1).correlate(User).scalar_subquery()
+    day_start, day_end = day_range(day)
+    burned = aliased(WorkoutLog)
+    calories_burned = db.session.query(func.coalesce(func.sum(burned.calories_burned), 0))\
+                                .filter(burned.user_id == User.id, burned.log_time >= day_start, burned.log_time < day_end)\
+                                .correlate(User).scalar_subquery()
+    columns = [getattr(MealLog, column) for column in DASHBOARD_MEAL_COLUMNS]
+    columns += [getattr(WorkoutLog, column) for column in DASHBOARD_WORKOUT_COLUMNS]
+    columns += [getattr(DailyNutrition, field) for field in NUTRIENT_FIELDS]
+    columns += [getattr(Profile, column) for column in DASHBOARD_PROFILE_COLUMNS]
+    columns.append(calories_burned)
+    return db.session.query(*columns).select_from(User)\
+        .outerjoin(MealLog, MealLog.id == latest(MealLog))\
+        .outerjoin(WorkoutLog, WorkoutLog.id == latest(WorkoutLog))\
+        .outerjoin(DailyNutrition, and_(DailyNutrition.user_id == User.id, DailyNutrition.day == day))\
+        .outerjoin(Profile, Profile.user_id == User.id)\
+        .filter(User.id == user_id)
+
+def get_dashboard_summary(user_id):
+    """The user's DashboardSummary, recomputed only after they have written something (or at midnight)."""
+    version, _ = get_user_data_version(user_id)
+    today = date.today()
+    summary = dashboard_cache.get(user_id)
+    if summary is not None and summary.version == version and summary.day == today:
+        record_cache_lookup('dashboard', True)
+        return summary
+    record_cache_lookup('dashboard', False)
+    summary = DashboardSummary(version, today, dashboard_summary_query(user_id, today).one())
+    dashboard_cache.put(user_id, summary)
+    return summary
+
+# --- Dashboard Widgets ---
+# Pages render a shell and fetch each chart/summary from its own JSON endpoint, so one slow
+# aggregate no longer holds back the whole page. Responses carry an ETag and Last-Modified
+# derived from the user's data version, and unchanged widgets are answered with a 304.
+
+def day_start_utc():
+    """Start of the current local day (when "today" widgets roll over) as a naive UTC datetime, like log times."""
+    return datetime.combine(date.today(), time.min).astimezone(timezone.utc).replace(tzinfo=None)
+
+def widget_response(build):
+    """JSON response from build() with validators; 304 (without calling build) when unchanged."""
+    version, updated_at = get_user_data_version(current_user.id)
+    day_start = day_start_utc()
+    # The day is part of the validators because "today" and "last N days" widgets roll over at midnight.
+    # Both validators use UTC, the clock of updated_at, so Last-Modified never goes backwards.
+    etag = f'{current_user.id}.{version}.{day_start:%Y%m%dT%H%M}.{zlib.crc32(request.full_path.encode()):08x}'
+    last_modified = max(updated_at or datetime.min, day_start).replace(microsecond=0)
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    elif request.if_modified_since:
+        not_modified = request.if_modified_since.replace(tzinfo=None) >= last_modified
+    else:
+        not_modified = False
+    record_cache_lookup('widget_etag', not_modified) # Browser copies revalidated without rebuilding
+    response = Response(status=304) if not_modified else jsonify(build())
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # Browsers may keep the body but must revalidate it (cheaply) on every use
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+def daily_labels(first_day, days):
+    return [(first_day + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(days)]
+
+def nutrition_week_series(user_id):
+    """Daily calories and macros for the last 7 days (zeros for days without meals)."""
+    first_day = date.today() - timedelta(days=6)
+    rows = {day.strftime('%Y-%m-%d'): row for day, row in get_daily_nutrition(user_id, first_day, days=7).items()}
+    labels = daily_labels(first_day, 7)
+    series = {'labels': labels}
+    for field in ('calories', 'protein', 'carbs', 'fat'):
+        series[field] = [(getattr(rows[label], field) or 0) if label in rows else 0 for label in labels]
+    return series
+
+def workout_activity_series(user_id, days=30):
+    """Workouts logged per day over the last `days` days."""
+    first_day = date.today() - timedelta(days=days - 1)
+    range_start, range_end = day_range(first_day, days=days)
+    counts = db.session.query(log_day(WorkoutLog.log_time), func.count(WorkoutLog.id)).filter(
+        WorkoutLog.user_id == user_id,
+        WorkoutLog.log_time >= range_start,
+        WorkoutLog.log_time < range_end
+    ).group_by(log_day(WorkoutLog.log_time)).all()
+    counts = {str(day): count for day, count in counts}
+    labels = daily_labels(first_day, days)
+    return {'labels': labels, 'data': [counts.get(label, 0) for label in labels]}
+
+def calorie_goal_series(user_id, days=30):
+    """Calories consumed per day over the last `days` days, with the user's calorie goal."""
+    first_day = date.today() - timedelta(days=days - 1)
+    calories = {day.strftime('%Y-%m-%d'): row.calories for day, row in get_daily_nutrition(user_id, first_day, days=days).items()}
+    labels = daily_labels(first_day, days)
+    return {
+        'labels': labels,
+        'data': [calories.get(label, 0) for label in labels],
+        # From the summary, which follows the data version like the validators (not the cached user)
+        'goal': get_dashboard_summary(user_id).goal_calories
+    }
 
-@app.route('/')
-@login_required # Protect the dashboard
-def index():
-    profile_data = current_user.profile
-    # Fetch recent logs
-    recent_workout = current_user.workout_logs.order_by(WorkoutLog.log_time.desc()).first()
-    recent_meal = current_user.meal_logs.order_by(MealLog.log_time.desc()).first()
+# --- Per-Request SQL Instrumentation ---
+# Engine events time every statement run while a request is being handled. The totals are
+# kept in a rolling per-route window shown at /admin/sql (per process) and, in debug mode or
+# for signed-in admins only, sent back in Server-Timing / X-SQL-* response headers (they name
+# tables and columns). A statement shape that repeats at least N_PLUS_ONE_THRESHOLD times in
+# one request is flagged as a probable N+1 pattern.
+
+SQL_INSTRUMENTATION = os.environ.get('SQL_INSTRUMENTATION', '1') != '0'
+N_PLUS_ONE_THRESHOLD = 5
+SQL_WINDOW_SECONDS = 15 * 60
+SQL_WINDOW_MAX_REQUESTS = 200 # Per route
+SQL_SLOWEST_KEPT = 5
+
+# Collapse expanded IN lists, "(?, ?, ?)" or "(%(id_1)s, %(id_2)s)", so they share one shape
+_SQL_IN_LIST = re.compile(r'\((?:\s*(?:\?|%\(\w+\)s)\s*,)+\s*(?:\?|%\(\w+\)s)\s*\)')
+
+def statement_shape(statement):
+    return ' '.join(_SQL_IN_LIST.sub('(?)', statement).split())
+
+class RequestSQLStats:
+    """SQL statements run while handling one request."""
+    __slots__ = ('count', 'seconds', 'statements', 'slowest')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter() # Raw text; shapes are only computed once per distinct statement
+        self.slowest = [] # Min-heap of (seconds, statement)
+
+    def record(self, statement, seconds):
+        self.count += 1
+        self.seconds += seconds
+        self.statements[statement] += 1
+        if len(self.slowest) < SQL_SLOWEST_KEPT:
+            heapq.heappush(self.slowest, (seconds, statement))
+        elif seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (seconds, statement))
+
+    def repeated_shapes(self):
+        """[(shape, executions)] for shapes run at least N_PLUS_ONE_THRESHOLD times."""
+        shapes = Counter()
+        for statement, count in self.statements.items():
+            shapes[statement_shape(statement)] += count
+        return [(shape, count) for shape, count in shapes.most_common() if count >= N_PLUS_ONE_THRESHOLD]
+
+class SQLRouteWindow:
+    """The most recent requests' SQL stats for each route."""
+
+    def __init__(self):
+        self.requests = defaultdict(lambda: deque(maxlen=SQL_WINDOW_MAX_REQUESTS))
+        self.lock = threading.Lock()
+
+    def add(self, endpoint, stats, repeated):
+        entry = (monotonic(), stats.count, stats.seconds, stats.slowest, repeated)
+        with self.lock:
+            self.requests[endpoint].append(entry)
+
+    def summary(self):
+        """Per-route aggregates over the last SQL_WINDOW_SECONDS, most total DB time first."""
+        cutoff = monotonic() - SQL_WINDOW_SECONDS
+        with self.lock:
+            snapshot = {endpoint: [entry for entry in entries if entry[0] >= cutoff]
+                        for endpoint, entries in self.requests.items()}
+        routes = []
+        for endpoint, entries in snapshot.items():
+            if not entries:
+                continue
+            counts = [entry[1] for entry in entries]
+            db_ms = [entry[2] * 1000 for entry in entries]
+            repeated = Counter()
+            for entry in entries:
+                for shape, count in entry[4]:
+                    repeated[shape] = max(repeated[shape], count)
+            slowest = heapq.nlargest(SQL_SLOWEST_KEPT, (item for entry in entries for item in entry[3]))
+            routes.append({
+                'endpoint': endpoint,
+                'requests': len(entries),
+                'avg_queries': round(sum(counts) / len(entries), 1),
+                'max_queries': max(counts),
+                'avg_db_ms': round(sum(db_ms) / len(entries), 2),
+                'max_db_ms': round(max(db_ms), 2),
+                'total_db_ms': round(sum(db_ms), 1),
+                'n_plus_one_requests': sum(1 for entry in entries if entry[4]),
+                'repeated_shapes': [{'shape': shape, 'max_executions': count} for shape, count in repeated.most_common(5)],
+                'slowest': [{'ms': round(seconds * 1000, 2), 'statement': statement} for seconds, statement in slowest],
+            })
+        routes.sort(key=lambda route: route['total_db_ms'], reverse=True)
+        return routes
+
+_sql_request = threading.local()
+sql_window = SQLRouteWindow()
+
+def sql_headers_allowed():
+    """SQL figures go only to developers: in debug mode, or to admins (role from the cached user)."""
+    return current_app.debug or (current_user.is_authenticated and current_user.role == 'admin')
+
+if SQL_INSTRUMENTATION:
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def _start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info['statement_started'] = perf_counter()
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def _record_statement(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop('statement_started', None)
+        stats = getattr(_sql_request, 'stats', None)
+        if stats is not None and started is not None: # Only statements run by request handlers (not the log writer etc.)
+            stats.record(statement, perf_counter() - started)
+
+    @main.before_app_request
+    def _start_request_sql_stats():
+        _sql_request.stats = RequestSQLStats()
+
+    @main.after_app_request
+    def _report_request_sql_stats(response):
+        stats = getattr(_sql_request, 'stats', None)
+        if stats is None:
+            return response
+        _sql_request.stats = None
+        repeated = stats.repeated_shapes()
+        if sql_headers_allowed():
+            response.headers['X-SQL-Queries'] = str(stats.count)
+            response.headers['X-SQL-Time-Ms'] = f'{stats.seconds * 1000:.2f}'
+            response.headers.add('Server-Timing', f'db;dur={stats.seconds * 1000:.2f};desc="{stats.count} queries"')
+            if repeated:
+                response.headers['X-SQL-N-Plus-One'] = '; '.join(f'{count}x {shape[:120]}' for shape, count in repeated[:3])
+        sql_window.add(request.endpoint or 'unmatched', stats, repeated)
+        return response
+
+# --- Prometheus Metrics ---
+# /metrics serves Prometheus text format. Hot-path updates go to a dict owned by the calling
+# thread, so recording takes no lock; a scrape adds up the per-thread dicts. Under a pre-fork
+# server every worker publishes its totals to METRICS_DIR (every METRICS_PUBLISH_SECONDS and on
+# exit) and a scrape answered by any worker adds up all the files. When a worker exits the
+# master folds its counters into exited.json (see gunicorn.conf.py); its gauges are dropped.
+
+METRICS_ENABLED = os.environ.get('METRICS', '1') != '0'
+METRICS_DIR = os.environ.get('METRICS_DIR') # Shared by the workers of one server; unset for a single process
+METRICS_PUBLISH_SECONDS = 5
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') # When set, /metrics requires "Authorization: Bearer <token>"
+METRICS_EXITED_FILE = 'exited.json'
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PASSWORD_HASH_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SQLITE_WRITE_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+HTTP_METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'))
+
+def merge_samples(totals, samples, families, skip_gauges=False):
+    """Adds samples ({(name, labels): value or histogram bucket list}) into totals."""
+    for key, value in samples.items():
+        family = families.get(key[0])
+        if family is None or (skip_gauges and family[0] == 'gauge'):
+            continue
+        if isinstance(value, list):
+            current = totals.get(key)
+            totals[key] = list(value) if current is None else [a + b for a, b in zip(current, value)]
+        else:
+            totals[key] = totals.get(key, 0) + value
 
-    # Fetch latest weight for progress overview text
-    latest_weight = profile_data.weight if profile_data else None
-    goal_weight = profile_data.goal_weight if profile_data else None # Get goal weight
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n') for _, value in labels)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + '}'
 
-    # --- Prepare Weight Chart Data ---
-    weight_logs = WeightLog.query.filter_by(user_id=current_user.id)\
-                                 .order_by(WeightLog.log_time.asc())\
-                                 .limit(30).all() # Get last 30 entries for the chart
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
 
-    weight_chart_labels = [log.log_time.strftime('%Y-%m-%d') for log in weight_logs]
-    weight_chart_data = [log.weight for log in weight_logs]
-    # --- End Weight Chart Data ---
+class MetricsRegistry:
+    """
+    Counters, gauges and histograms keyed by (name, labels), labels being a tuple of (name, value)
+    pairs. Histogram samples are lists: one count per bucket (the last for +Inf), then the sum.
+    """
 
-    # --- Calculate Today's Summary ---
-    today_start = datetime.combine(date.today(), time.min)
-    today_end = datetime.combine(date.today(), time.max)
+    def __init__(self):
+        self.families = {} # name -> (type, help, buckets)
+        self.collectors = [] # Called per snapshot; yield (name, labels, value) read from elsewhere
+        self.reset()
+
+    def reset(self):
+        """Starts over with no recorded values (used in forked worker processes)."""
+        self._local = threading.local()
+        self._threads = [] # [(thread, its values dict)]
+        self._retired = {} # Totals of threads that have exited
+        self._lock = threading.Lock()
+        self._publisher_pid = None
+
+    def counter(self, name, help):
+        self.families[name] = ('counter', help, None)
+
+    def gauge(self, name, help):
+        self.families[name] = ('gauge', help, None)
+
+    def histogram(self, name, help, buckets):
+        self.families[name] = ('histogram', help, tuple(buckets))
+
+    def _values(self):
+        values = getattr(self._local, 'values', None)
+        if values is None:
+            values = self._local.values = {}
+            with self._lock: # Once per thread
+                self._threads.append((threading.current_thread(), values))
+        return values
+
+    def inc(self, name, labels=(), amount=1):
+        values = self._values()
+        key = (name, labels)
+        values[key] = values.get(key, 0) + amount
+
+    def observe(self, name, value, labels=()):
+        values = self._values()
+        bounds = self.families[name][2]
+        buckets = values.get((name, labels))
+        if buckets is None:
+            buckets = values[(name, labels)] = [0] * (len(bounds) + 2)
+        buckets[bisect_left(bounds, value)] += 1
+        buckets[-1] += value
+
+    def snapshot(self):
+        """This process's totals, including values read by the collectors."""
+        totals = {}
+        with self._lock:
+            live = []
+            for thread, values in self._threads:
+                if thread.is_alive():
+                    live.append((thread, values))
+                else:
+                    merge_samples(self._retired, values, self.families)
+            self._threads = live
+            merge_samples(totals, self._retired, self.families)
+            for _, values in live:
+                merge_samples(totals, values.copy(), self.families) # dict.copy() is atomic under the GIL
+        for collect in self.collectors:
+            for name, labels, value in collect():
+                totals[(name, labels)] = value
+        return totals
+
+    # Sharing between worker processes
+
+    @staticmethod
+    def _encode(samples):
+        return json.dumps([[name, [list(pair) for pair in labels], value] for (name, labels), value in samples.items()])
+
+    @staticmethod
+    def _decode(data):
+        return {(name, tuple(tuple(pair) for pair in labels)): value for name, labels, value in json.loads(data)}
+
+    def _write(self, filename, samples):
+        path = os.path.join(METRICS_DIR, filename)
+        with open(path + '.tmp', 'w') as f:
+            f.write(self._encode(samples))
+        os.replace(path + '.tmp', path) # Readers never see a half-written file
+
+    def _read(self, filename):
+        try:
+            with open(os.path.join(METRICS_DIR, filename)) as f:
+                return self._decode(f.read())
+        except (OSError, ValueError):
+            return {}
+
+    def start_publishing(self):
+        """Starts this process's publisher thread on first use (no-op without METRICS_DIR)."""
+        if METRICS_DIR is None or self._publisher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._publisher_pid == os.getpid():
+                return
+            self._publisher_pid = os.getpid()
+        threading.Thread(target=self._publish_loop, name='metrics-publisher', daemon=True).start()
+
+    def _publish_loop(self):
+        while True:
+            sleep(METRICS_PUBLISH_SECONDS)
+            self.publish()
+
+    def publish(self):
+        if METRICS_DIR is not None and self._publisher_pid == os.getpid():
+            self._write(f'{os.getpid()}.json', self.snapshot())
+
+    def retire_worker(self, pid):
+        """Runs in the server master when a worker exits: keeps its counters, drops its gauges."""
+        samples = self._read(f'{pid}.json')
+        if samples:
+            totals = self._read(METRICS_EXITED_FILE)
+            merge_samples(totals, samples, self.families, skip_gauges=True)
+            self._write(METRICS_EXITED_FILE, totals)
+        try:
+            os.remove(os.path.join(METRICS_DIR, f'{pid}.json'))
+        except OSError:
+            pass
+
+    def collect(self):
+        """Totals over every worker sharing METRICS_DIR (or just this process)."""
+        if METRICS_DIR is None:
+            return self.snapshot()
+        own = f'{os.getpid()}.json'
+        totals = self.snapshot()
+        for filename in os.listdir(METRICS_DIR):
+            if filename.endswith('.json') and filename != own:
+                merge_samples(totals, self._read(filename), self.families)
+        return totals
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        by_family = defaultdict(list)
+        for (name, labels), value in self.collect().items():
+            by_family[name].append((labels, value))
+        lines = []
+        for name, (kind, help, bounds) in self.families.items():
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in sorted(by_family.get(name, ())):
+                if kind != 'histogram':
+                    lines.append(f'{name}{_format_labels(labels)} {_format_value(value)}')
+                    continue
+                cumulative = 0
+                for bound, count in zip((*bounds, '+Inf'), value):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_format_labels(labels + (("le", str(bound)),))} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {_format_value(value[-1])}')
+                lines.append(f'{name}_count{_format_labels(labels)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+metrics = MetricsRegistry()
+metrics.histogram('smartfit_http_request_duration_seconds', 'Request latency by route.', LATENCY_BUCKETS)
+metrics.counter('smartfit_http_requests_total', 'Requests by route, method and status code.')
+metrics.gauge('smartfit_http_requests_in_flight', 'Requests currently being handled.')
+metrics.gauge('smartfit_db_pool_size', 'Configured connection pool size.')
+metrics.gauge('smartfit_db_pool_checked_out', 'Pooled connections currently in use.')
+metrics.gauge('smartfit_db_pool_overflow', 'Connections open beyond the pool size.')
+metrics.counter('smartfit_db_pool_checkouts_total', 'Connections checked out of the pool.')
+metrics.counter('smartfit_sqlite_busy_errors_total', 'Statements that failed with "database is locked" after busy_timeout.')
+metrics.histogram('smartfit_sqlite_write_seconds', 'SQLite INSERT/UPDATE/DELETE time, including waits for the write lock.', SQLITE_WRITE_BUCKETS)
+metrics.histogram('smartfit_password_hash_seconds', 'Password hashing time by operation (generate or verify).', PASSWORD_HASH_BUCKETS)
+metrics.counter('smartfit_password_hash_rejected_total', 'Sign-ins refused because the password hash queue was full.')
+metrics.counter('smartfit_cache_requests_total', 'In-process cache and HTTP revalidation lookups by cache and result.')
+metrics.gauge('smartfit_write_queue_depth', 'Log rows waiting for the write-behind writer.')
+metrics.counter('smartfit_write_queue_rows_total', 'Rows handled by the write-behind writer by result.')
+
+def record_cache_lookup(cache, hit):
+    metrics.inc('smartfit_cache_requests_total', (('cache', cache), ('result', 'hit' if hit else 'miss')))
+
+def _collect_process_metrics():
+    yield 'smartfit_cache_requests_total', (('cache', 'autocomplete'), ('result', 'hit')), suggest_cache.hits
+    yield 'smartfit_cache_requests_total', (('cache', 'autocomplete'), ('result', 'miss')), suggest_cache.misses
+    stats = log_writer.metrics()
+    yield 'smartfit_write_queue_depth', (), stats['queue_depth']
+    yield 'smartfit_write_queue_rows_total', (('result', 'committed'),), stats['rows_committed']
+    yield 'smartfit_write_queue_rows_total', (('result', 'failed'),), stats['rows_failed']
+    engines = {}
+    for app in list(apps):
+        with app.app_context(): # Also called from the publisher thread
+            engines.update(db.engines)
+    for bind, engine in engines.items():
+        pool = engine.pool
+        if isinstance(pool, QueuePool):
+            labels = (('engine', bind or 'default'),)
+            yield 'smartfit_db_pool_size', labels, pool.size()
+            yield 'smartfit_db_pool_checked_out', labels, pool.checkedout()
+            yield 'smartfit_db_pool_overflow', labels, max(pool.overflow(), 0)
+
+metrics.collectors.append(_collect_process_metrics)
+atexit.register(metrics.publish) # Final totals of a worker that is shutting down
+
+if METRICS_ENABLED:
+    @event.listens_for(Pool, 'checkout')
+    def _count_pool_checkout(dbapi_connection, connection_record, connection_proxy):
+        metrics.inc('smartfit_db_pool_checkouts_total')
+
+    @event.listens_for(Engine, 'handle_error')
+    def _count_sqlite_busy(context):
+        error = context.original_exception
+        if isinstance(error, sqlite3.OperationalError) and ('locked' in str(error) or 'busy' in str(error)):
+            metrics.inc('smartfit_sqlite_busy_errors_total')
+
+    @event.listens_for(Engine, 'before_cursor_execute')
+    def _start_write_timer(conn, cursor, statement, parameters, context, executemany):
+        if conn.dialect.name == 'sqlite' and statement.lstrip()[:6].upper() in ('INSERT', 'UPDATE', 'DELETE'):
+            conn.info['write_started'] = perf_counter()
+
+    @event.listens_for(Engine, 'after_cursor_execute')
+    def _record_write_time(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop('write_started', None)
+        if started is not None:
+            metrics.observe('smartfit_sqlite_write_seconds', perf_counter() - started)
+
+    @main.before_app_request
+    def _start_request_metrics():
+        metrics.start_publishing()
+        metrics.inc('smartfit_http_requests_in_flight')
+        _metrics_request.started = perf_counter()
+        _metrics_request.status = 500 # Unless a response is produced
+
+    @main.after_app_request
+    def _note_response_status(response):
+        _metrics_request.status = response.status_code
+        return response
+
+    @main.teardown_app_request
+    def _record_request_metrics(exc):
+        started = getattr(_metrics_request, 'started', None)
+        if started is None:
+            return
+        _metrics_request.started = None
+        method = request.method if request.method in HTTP_METHODS else 'other'
+        route = request.endpoint or 'unmatched'
+        metrics.observe('smartfit_http_request_duration_seconds', perf_counter() - started, (('route', route), ('method', method)))
+        metrics.inc('smartfit_http_requests_total', (('route', route), ('method', method), ('status', str(_metrics_request.status))))
+        metrics.inc('smartfit_http_requests_in_flight', amount=-1)
+
+_metrics_request = threading.local()
+
+@main.route('/metrics')
+def metrics_endpoint():
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
-    # Meal Totals
-    todays_meals = MealLog.query.filter(
-        MealLog.user_id == current_user.id,
-        MealLog.log_time >= today_start,
-        MealLog.log_time <= today_end
-    ).all()
-    calories_consumed = sum(meal.calories for meal in todays_meals if meal.calories)
-    protein_consumed = sum(meal.protein for meal in todays_meals if meal.protein)
-    carbs_consumed = sum(meal.carbs for meal in todays_meals if meal.carbs)
-    fat_consumed = sum(meal.fat for meal in todays_meals if meal.fat)
-
-    # Workout Totals
-    todays_workouts = WorkoutLog.query.filter(
-        WorkoutLog.user_id == current_user.id,
-        WorkoutLog.log_time >= today_start,
-        WorkoutLog.log_time <= today_end
-    ).all()
-    # Explicitly set calories_burned to 0 as WorkoutLog doesn't track it yet
-    calories_burned = 0
-    # calories_burned = sum(workout.calories_burned for workout in todays_workouts if hasattr(workout, 'calories_burned') and workout.calories_burned) # Original line (commented out)
+# --- Routes ---
 
-    # Net Calories
-    net_calories = calories_consumed - calories_burned
-    # --- End Today's Summary ---
+@main.route('/')
+@login_required # Protect the dashboard
+def index():
+    profile_data = current_user.profile
+    # Recent logs, weight and goals in one statement (memoized until the user's next write)
+    summary = get_dashboard_summary(current_user.id)
+    recent_workout = summary.recent_workout
+    recent_meal = summary.recent_meal
+
+    # Latest weight for progress overview text
+    latest_weight = summary.weight
+    goal_weight = summary.goal_weight
+
+    # The weight chart and today's summary are loaded by the page from /widgets/*
 
     # Get current date/time for the template
     now = datetime.utcnow() # Or datetime.now() depending on timezone needs
@@ -325,39 +3411,40 @@ def index():
                            recent_workout=recent_workout, recent_meal=recent_meal,
                            latest_weight=latest_weight, # Pass latest weight for text display
                            goal_weight=goal_weight,     # Pass goal weight
-                           weight_chart_labels=weight_chart_labels, # Pass chart labels
-                           weight_chart_data=weight_chart_data,     # Pass chart data
-                           # Pass Today's Summary Data
-                           calories_consumed=calories_consumed,
-                           calories_burned=calories_burned, # Pass the calculated (now 0) value
-                           net_calories=net_calories,
-                           protein_consumed=protein_consumed,
-                           carbs_consumed=carbs_consumed,
-                           fat_consumed=fat_consumed,
                            now=now, # Pass the current datetime object
                            current_year=current_year) # Pass current_year
 
-@app.route('/login', methods=['GET', 'POST'])
+@main.route('/login', methods=['GET', 'POST'])
 def login():
     if current_user.is_authenticated:
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     if request.method == 'POST':
         username = request.form['username']
         password = request.form['password']
         user = User.query.filter_by(username=username).first()
-        if user and user.check_password(password):
+        try:
+            valid = user is not None and user.check_password(password)
+        except PasswordHashBusy:
+            return password_hash_busy_response('login.html', title='Login')
+        if valid:
+            if password_hasher.needs_rehash(user.password_hash):
+                try:
+                    user.set_password(password) # Upgrade to the current PASSWORD_HASH_METHOD
+                    db.session.commit()
+                except PasswordHashBusy:
+                    pass # Upgrade at a later login
             login_user(user, remember=request.form.get('remember')) # Add 'remember me' checkbox in template
             next_page = request.args.get('next')
             flash(f'Welcome back, {user.username}!', 'success')
-            return redirect(next_page or url_for('index'))
+            return redirect(next_page or url_for('main.index'))
         else:
             flash('Invalid username or password.', 'danger')
     return render_template('login.html', title='Login')
 
-@app.route('/register', methods=['GET', 'POST'])
+@main.route('/register', methods=['GET', 'POST'])
 def register():
     if current_user.is_authenticated:
-        return redirect(url_for('index'))
+        return redirect(url_for('main.index'))
     if request.method == 'POST':
         # Account Info
         username = request.form.get('username')
@@ -367,12 +3454,12 @@ def register():
         # Basic Validation for Account Info
         if not username or not email or not password:
              flash('Username, email, and password are required.', 'warning')
-             return redirect(url_for('register')) # Consider re-rendering with entered data
+             return redirect(url_for('main.register')) # Consider re-rendering with entered data
 
         existing_user = User.query.filter((User.username == username) | (User.email == email)).first()
         if existing_user:
             flash('Username or email already exists.', 'warning')
-            return redirect(url_for('register'))
+            return redirect(url_for('main.register'))
 
         # Profile Info (from new fields) - use .get with type and default=None
         weight = request.form.get('weight', type=float) # Get as float first
@@ -418,7 +3505,13 @@ def register():
 
         # Create User
         new_user = User(username=username, email=email, role='user')
-        new_user.set_password(password)
+        try:
+            new_user.set_password(password)
+        except PasswordHashBusy:
+            return password_hash_busy_response('register.html', title='Register', username=username, email=email,
+                                               weight=request.form.get('weight'), height=request.form.get('height'),
+                                               goal=goal, goal_weight=request.form.get('goal_weight'),
+                                               fitness_level=fitness_level, dietary_preferences=dietary_preferences)
         db.session.add(new_user)
         db.session.flush() # Flush to get the new_user.id
 
@@ -445,22 +3538,57 @@ def register():
         db.session.commit()
 
         flash('Account created successfully! Please log in.', 'success')
-        return redirect(url_for('login'))
+        return redirect(url_for('main.login'))
 
     # GET request
     return render_template('register.html', title='Register')
 
-@app.route('/logout')
+@main.route('/logout')
 @login_required
 def logout():
     logout_user()
     flash('You have been logged out.', 'success')
-    return redirect(url_for('login'))
+    return redirect(url_for('main.login'))
+
+# --- Dashboard Widget Endpoints ---
+
+@main.route('/widgets/weight-trend')
+@login_required
+def weight_trend_widget():
+    """
+    Weight history series for charts. ?points= is the target point count (the client
+    derives it from the canvas width) and ?mode= is lttb, minmax or latest.
+    """
+    mode = request.args.get('mode', 'lttb')
+    if mode not in CHART_MODES:
+        mode = 'lttb'
+    points = request.args.get('points', DEFAULT_CHART_POINTS, type=int)
+    return widget_response(lambda: weight_series(current_user.id, points=points, mode=mode))
 
-@app.route('/profile', methods=['GET', 'POST'])
+@main.route('/widgets/todays-macros')
+@login_required
+def todays_macros_widget():
+    return widget_response(lambda: get_dashboard_summary(current_user.id).today())
+
+@main.route('/widgets/nutrition-week')
+@login_required
+def nutrition_week_widget():
+    return widget_response(lambda: nutrition_week_series(current_user.id))
+
+@main.route('/widgets/workout-activity')
+@login_required
+def workout_activity_widget():
+    return widget_response(lambda: workout_activity_series(current_user.id))
+
+@main.route('/widgets/calorie-goal')
+@login_required
+def calorie_goal_widget():
+    return widget_response(lambda: calorie_goal_series(current_user.id))
+
+@main.route('/profile', methods=['GET', 'POST'])
 @login_required
 def profile():
-    profile_data = current_user.profile
+    profile_data = current_user.record.profile # The Profile row itself, since this page edits it
     if not profile_data: # Should not happen if profile created on register, but good check
         profile_data = Profile(user_id=current_user.id)
         db.session.add(profile_data)
@@ -567,148 +3695,51 @@ def profile():
             profile_data.goal_fat = old_goal_fat
         # --- End Set Final Nutrition Goals ---
 
-        # Log weight change if it's different and valid
+        # Log weight change if it's different and valid, in the profile's transaction (never queued)
         if new_weight is not None and new_weight != old_weight:
-            weight_log_entry = WeightLog(weight=new_weight, user_id=current_user.id)
-            db.session.add(weight_log_entry)
-
+            insert_log_rows('weight', [log_row('weight', current_user.id, weight=new_weight)])
         db.session.commit()
         flash('Profile updated successfully!', 'success')
-        return redirect(url_for('profile')) # Redirect back to profile page
-
-    # --- Prepare Weight Chart Data (for GET request) ---
-    weight_logs = WeightLog.query.filter_by(user_id=current_user.id)\
-                                 .order_by(WeightLog.log_time.asc())\
-                                 .all() # Get all entries for the profile chart
-
-    weight_chart_labels = [log.log_time.strftime('%Y-%m-%d') for log in weight_logs]
-    weight_chart_data = [log.weight for log in weight_logs]
-    # --- End Weight Chart Data ---
-
-    # --- Prepare Workout Progress Chart Data (Last 30 Days) ---
-    thirty_days_ago = date.today() - timedelta(days=29)
-    workout_counts_by_day = db.session.query(
-        cast(WorkoutLog.log_time, Date).label('log_date'),
-        func.count(WorkoutLog.id).label('workout_count')
-    ).filter(
-        WorkoutLog.user_id == current_user.id,
-        cast(WorkoutLog.log_time, Date) >= thirty_days_ago
-    ).group_by(
-        cast(WorkoutLog.log_time, Date)
-    ).order_by(
-        cast(WorkoutLog.log_time, Date)
-    ).all()
-
-    # Create a dictionary for quick lookup
-    logs_dict = {log.log_date.strftime('%Y-%m-%d'): log.workout_count for log in workout_counts_by_day}
-
-    # Generate labels and data for the last 30 days, filling in 0s for days with no logs
-    progress_chart_labels = [(thirty_days_ago + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(30)]
-    progress_chart_data = [logs_dict.get(label_date, 0) for label_date in progress_chart_labels]
-    # --- End Workout Progress Chart Data ---
-
-    # --- Prepare Calorie Intake Progress Chart Data (Last 30 Days) ---
-    thirty_days_ago_calories = date.today() - timedelta(days=29) # Reuse or redefine if needed
-    daily_calorie_logs = db.session.query(
-        cast(MealLog.log_time, Date).label('log_date'),
-        func.sum(MealLog.calories).label('total_calories')
-    ).filter(
-        MealLog.user_id == current_user.id,
-        cast(MealLog.log_time, Date) >= thirty_days_ago_calories
-    ).group_by(
-        cast(MealLog.log_time, Date)
-    ).order_by(
-        cast(MealLog.log_time, Date)
-    ).all()
-
-    # Create a dictionary for quick lookup
-    calorie_logs_dict = {log.log_date.strftime('%Y-%m-%d'): log.total_calories for log in daily_calorie_logs}
-
-    # Generate labels and data for the last 30 days, filling in 0s for days with no logs
-    calorie_progress_labels = [(thirty_days_ago_calories + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(30)]
-    calorie_progress_data = [calorie_logs_dict.get(label_date, 0) for label_date in calorie_progress_labels]
-
-    # Get calorie goal from profile
-    calorie_goal = profile_data.goal_calories if profile_data else None
-    # --- End Calorie Intake Progress Chart Data ---
-
+        return redirect(url_for('main.profile')) # Redirect back to profile page
 
-    return render_template('profile.html', title='Profile', user=current_user, profile_data=profile_data,
-                           weight_chart_labels=weight_chart_labels, # Pass weight chart labels
-                           weight_chart_data=weight_chart_data,     # Pass weight chart data
-                           progress_chart_labels=progress_chart_labels, # Pass progress chart labels
-                           progress_chart_data=progress_chart_data,     # Pass progress chart data
-                           # Pass calorie progress chart data
-                           calorie_progress_labels=calorie_progress_labels,
-                           calorie_progress_data=calorie_progress_data,
-                           calorie_goal=calorie_goal)
+    # Charts are loaded by the page from /widgets/* (weight-trend, workout-activity, calorie-goal)
+    return render_template('profile.html', title='Profile', user=current_user, profile_data=profile_data)
 
 # --- Feature Routes ---
 
-@app.route('/workouts')
+@main.route('/workouts')
 @login_required
 def workouts():
-    # Fetch workouts grouped by the new category structure
-    # Define the desired order of categories
-    category_order = ['Push', 'Pull', 'Legs', 'Full Body', 'Cardio', 'Yoga/Flexibility']
-
-    # Fetch all workouts first
-    all_workouts_query = Workout.query
+    # Browsing is served entirely from the in-memory catalog snapshot
+    catalog = get_catalog()
 
     # Apply filters if implemented (based on request.args)
-    search_term = request.args.get('search')
-    intensity_filter = request.args.get('intensity')
-    duration_filter = request.args.get('duration')
-    category_filter = request.args.get('category') # Use the new category filter
-
-    if search_term:
-        all_workouts_query = all_workouts_query.filter(Workout.name.ilike(f"%{search_term}%"))
-    if intensity_filter:
-        all_workouts_query = all_workouts_query.filter_by(intensity=intensity_filter)
-    if duration_filter:
-        # Example duration filtering logic (adjust ranges as needed)
-        if duration_filter == '1': # < 15 min
-            all_workouts_query = all_workouts_query.filter(Workout.duration_est < 15)
-        elif duration_filter == '2': # 15-30 min
-            all_workouts_query = all_workouts_query.filter(Workout.duration_est >= 15, Workout.duration_est <= 30)
-        elif duration_filter == '3': # > 30 min
-            all_workouts_query = all_workouts_query.filter(Workout.duration_est > 30)
-    if category_filter:
-        all_workouts_query = all_workouts_query.filter_by(category=category_filter)
-
-
-    all_workouts = all_workouts_query.order_by(Workout.name).all()
-
-    # Group workouts by category
-    grouped_workouts = defaultdict(list)
-    for workout in all_workouts:
-        grouped_workouts[workout.category].append(workout)
-
-    # Create an ordered list of tuples (category, workouts_list) based on category_order
-    ordered_grouped_workouts = [
-        (category, grouped_workouts[category])
-        for category in category_order if category in grouped_workouts
-    ]
-    # Add any remaining categories not in the defined order
-    for category, workouts_list in grouped_workouts.items():
-        if category not in category_order:
-            ordered_grouped_workouts.append((category, workouts_list))
-
-
-    # Pass current_user's saved workout IDs to template for button state
-    saved_workout_ids = {w.id for w in current_user.saved_workouts}
-
-    # Get distinct categories for the filter dropdown
-    available_categories = sorted([cat[0] for cat in db.session.query(Workout.category).distinct().all()])
-
+    ordered_grouped_workouts = catalog.find_workouts(
+        search=request.args.get('search'),
+        intensity=request.args.get('intensity'),
+        duration=request.args.get('duration'),
+        category=request.args.get('category') # Use the new category filter
+    )
+
+    # Pass current_user's saved workout IDs to template for button state (ids only, no Workout rows)
+    saved_workout_ids = set(db.session.execute(
+        db.select(user_saved_workouts.c.workout_id).where(user_saved_workouts.c.user_id == current_user.id)
+    ).scalars())
 
     return render_template('workouts.html', title='Workouts',
                            ordered_grouped_workouts=ordered_grouped_workouts, # Pass the ordered list
                            saved_workout_ids=saved_workout_ids,
-                           available_categories=available_categories) # Pass categories for filter
+                           available_categories=catalog.workout_categories) # Pass categories for filter
+
+@main.route('/workouts/<int:workout_id>/details')
+@login_required
+def workout_details(workout_id):
+    """Description, instructions, form tips and video for one workout (loaded when its card is opened)."""
+    workout = Workout.query.get_or_404(workout_id)
+    return render_template('workout_details.html', workout=workout)
 
 # New route to add a workout to the user's saved list
-@app.route('/workouts/add/<int:workout_id>', methods=['POST'])
+@main.route('/workouts/add/<int:workout_id>', methods=['POST'])
 @login_required
 def add_workout(workout_id):
     workout = Workout.query.get_or_404(workout_id)
@@ -719,10 +3750,10 @@ def add_workout(workout_id):
     else:
         flash(f'"{workout.name}" is already in My Workouts.', 'info')
     # Redirect back to the workouts page (or potentially the 'my_workouts' page)
-    return redirect(request.referrer or url_for('workouts'))
+    return redirect(request.referrer or url_for('main.workouts'))
 
 # New route to remove a workout from the user's saved list (Optional but good practice)
-@app.route('/workouts/remove/<int:workout_id>', methods=['POST'])
+@main.route('/workouts/remove/<int:workout_id>', methods=['POST'])
 @login_required
 def remove_workout(workout_id):
     workout = Workout.query.get_or_404(workout_id)
@@ -733,10 +3764,10 @@ def remove_workout(workout_id):
     else:
         flash(f'"{workout.name}" was not found in My Workouts.', 'info')
     # Redirect back to the page the user came from (likely my_workouts)
-    return redirect(request.referrer or url_for('my_workouts'))
+    return redirect(request.referrer or url_for('main.my_workouts'))
 
 # Renamed route for displaying saved workouts
-@app.route('/my_workouts')
+@main.route('/my_workouts')
 @login_required
 def my_workouts():
     # Fetch the workouts saved by the current user
@@ -744,7 +3775,7 @@ def my_workouts():
     return render_template('my_workouts.html', title='My Workouts', workouts=user_workouts)
 
 # Renamed route for logging and viewing progress of a SPECIFIC workout
-@app.route('/workout_progress/<string:workout_name>', methods=['GET', 'POST'])
+@main.route('/workout_progress/<string:workout_name>', methods=['GET', 'POST'])
 @login_required
 def workout_progress(workout_name):
     # Ensure the workout exists in the user's saved list (optional but good practice)
@@ -759,111 +3790,100 @@ def workout_progress(workout_name):
 
         if not intensity_level and not repetitions: # Require at least one detail
             flash('Please provide intensity level or repetitions.', 'warning')
-            return redirect(url_for('workout_progress',
+            return redirect(url_for('main.workout_progress',
                                     workout_name=workout_name,
                                     intensity_level=intensity_level, # Pass back submitted values
                                     repetitions=repetitions,
                                     notes=notes))
 
-        log = WorkoutLog(
+        save_log('workout', current_user.id,
             workout_name=workout_name,
             intensity_level=intensity_level, # Save new field
             repetitions=repetitions,         # Save new field
-            notes=notes,
-            logger=current_user
+            notes=notes
         )
-        db.session.add(log)
-        db.session.commit()
         flash(f'Workout "{workout_name}" logged successfully!', 'success')
         # Redirect back to the same page to show the updated history
-        return redirect(url_for('workout_progress', workout_name=workout_name))
+        return redirect(url_for('main.workout_progress', workout_name=workout_name))
 
-    # GET request - Display the form and history
-    # Fetch historical logs for this specific workout for the current user
-    logs = WorkoutLog.query.filter_by(logger=current_user, workout_name=workout_name)\
-                           .order_by(WorkoutLog.log_time.desc())\
-                           .all()
+    # GET request - Display the form and one page of history (newest first)
+    logs, next_cursor = workout_log_page(workout_name, request.args.get('cursor'))
+    # Summary stats come from one aggregate query rather than the full history
+    total_sessions, last_session = db.session.query(func.count(WorkoutLog.id), func.max(WorkoutLog.log_time))\
+                                             .filter(workout_history_filter(WorkoutLog, current_user.id, workout_name)).one()
+    # Personal bests come from the per-set index, not from re-parsing the repetitions text
+    best_1rm, best_load = db.session.query(func.max(WorkoutSet.est_1rm), func.max(WorkoutSet.load_kg))\
+                                    .filter(workout_history_filter(WorkoutSet, current_user.id, workout_name)).one()
 
     # Render the template, passing workout name, pre-fill data, and logs
     return render_template('workout_progress.html',
                            title=f'Log & Progress: {workout_name}',
                            workout_name=workout_name,
-                           logs=logs) # Pass the historical logs
+                           logs=logs, # Pass the historical logs
+                           next_cursor=next_cursor,
+                           total_sessions=total_sessions,
+                           last_session=last_session,
+                           best_1rm=best_1rm,
+                           best_load=best_load)
+
+WORKOUT_LOG_ORDER = [(WorkoutLog.log_time, True), (WorkoutLog.id, True)]
+
+def workout_log_page(workout_name, cursor):
+    """One page of the current user's logs for a workout, newest first."""
+    # Matched by workout id (and by name for unlinked logs) through the (user_id, workout_id, log_time) index
+    query = WorkoutLog.query.filter(workout_history_filter(WorkoutLog, current_user.id, workout_name))
+    return keyset_page(query, WORKOUT_LOG_ORDER, lambda log: (log.log_time, log.id),
+                       cursor=cursor, page_size=WORKOUT_LOG_PAGE_SIZE)
+
+@main.route('/workout_progress/<string:workout_name>/logs.json')
+@login_required
+def workout_progress_logs_json(workout_name):
+    """JSON pages of workout history for infinite scroll; pass back next_cursor as ?cursor=."""
+    logs, next_cursor = workout_log_page(workout_name, request.args.get('cursor'))
+    return jsonify(items=[{
+        'id': log.id,
+        'log_time': log.log_time.isoformat(),
+        'intensity_level': log.intensity_level,
+        'repetitions': log.repetitions,
+        'calories_burned': log.calories_burned,
+        'notes': log.notes
+    } for log in logs], next_cursor=next_cursor)
+
+@main.route('/workout_progress/<string:workout_name>/progression.json')
+@login_required
+def workout_progression_json(workout_name):
+    """Per-session strength progression for charts; ?points= caps the number of sessions returned."""
+    points = request.args.get('points', DEFAULT_CHART_POINTS, type=int)
+    return widget_response(lambda: strength_series(current_user.id, workout_name, points=points))
 
 # New route for suggestions
-@app.route('/workouts/suggest')
+@main.route('/workouts/suggest')
 @login_required
 def workout_suggest():
     query = request.args.get('q', '') # Get search query from request args
     suggestions = []
     if query:
-        # Find workouts where the name contains the query (case-insensitive)
-        search = f"%{query}%"
-        results = Workout.query.filter(Workout.name.ilike(search)).limit(10).all() # Limit results
-        suggestions = [w.name for w in results]
+        # Find workouts where the name contains the query (case-insensitive), from the in-memory index
+        suggestions = cached_suggestions('workout', query, limit=10)
     return jsonify(suggestions)
 
-@app.route('/meals')
+@main.route('/meals')
 @login_required
 def meals():
     # Fetch profile for goals
     profile_data = current_user.profile
 
-    # --- Prepare 7-Day Chart Data ---
-    today = date.today()
-    seven_days_ago = today - timedelta(days=6) # Corrected syntax
-
-    # Query daily sums for the last 7 days
-    daily_logs_7_days = db.session.query(
-        cast(MealLog.log_time, Date).label('log_date'),
-        func.sum(MealLog.calories).label('total_calories'),
-        func.sum(MealLog.protein).label('total_protein'),
-        func.sum(MealLog.carbs).label('total_carbs'),
-        func.sum(MealLog.fat).label('total_fat')
-    ).filter(
-        MealLog.user_id == current_user.id,
-        cast(MealLog.log_time, Date) >= seven_days_ago,
-        cast(MealLog.log_time, Date) <= today
-    ).group_by(
-        cast(MealLog.log_time, Date)
-    ).order_by(
-        cast(MealLog.log_time, Date)
-    ).all()
-
-    # Prepare data for Chart.js (7-day chart) - Restored Logic
-    chart_labels_7_days = [(seven_days_ago + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(7)]
-    chart_data_7_days = {
-        'calories': [0] * 7,
-        'protein': [0] * 7,
-        'carbs': [0] * 7,
-        'fat': [0] * 7,
-    }
-    logs_dict_7_days = {log.log_date.strftime('%Y-%m-%d'): log for log in daily_logs_7_days}
-
-    for i, label_date_str in enumerate(chart_labels_7_days):
-        log = logs_dict_7_days.get(label_date_str)
-        if log:
-            chart_data_7_days['calories'][i] = log.total_calories or 0
-            chart_data_7_days['protein'][i] = log.total_protein or 0
-            chart_data_7_days['carbs'][i] = log.total_carbs or 0
-            chart_data_7_days['fat'][i] = log.total_fat or 0
-    # --- End 7-Day Chart Data ---
+    # The 7-day chart and today's totals are loaded by the page from /widgets/*
 
-    # --- Calculate Today's Summary & Fetch Logs ---
-    today_start = datetime.combine(date.today(), time.min)
-    today_end = datetime.combine(date.today(), time.max)
+    # --- Fetch Today's Logs ---
+    today_start, tomorrow_start = day_range(date.today())
 
     todays_meal_logs = MealLog.query.filter(
         MealLog.user_id == current_user.id,
         MealLog.log_time >= today_start,
-        MealLog.log_time <= today_end
+        MealLog.log_time < tomorrow_start
     ).order_by(MealLog.log_time.asc()).all() # Fetch individual logs for today
 
-    today_calories = sum(meal.calories for meal in todays_meal_logs if meal.calories)
-    today_protein = sum(meal.protein for meal in todays_meal_logs if meal.protein)
-    today_carbs = sum(meal.carbs for meal in todays_meal_logs if meal.carbs)
-    today_fat = sum(meal.fat for meal in todays_meal_logs if meal.fat)
-
     # --- Group Today's Logs by Meal Type ---
     grouped_meals = defaultdict(list)
     meal_types_order = ['Breakfast', 'Lunch', 'Dinner', 'Snack', None] # Define order, None for uncategorized
@@ -878,20 +3898,14 @@ def meals():
     # --- End Grouping ---
 
 
-    # Pass grouped meals, profile (for goals), 7-day chart data, and today's data
+    # Pass grouped meals and profile (for goals)
     return render_template('meals.html', title='Meal Log History', # Changed title
                            profile=profile_data,
-                           chart_labels=chart_labels_7_days,
-                           chart_data=chart_data_7_days,
                            # Pass grouped meals instead of individual list
-                           ordered_grouped_meals=ordered_grouped_meals,
-                           today_calories=today_calories,
-                           today_protein=today_protein,
-                           today_carbs=today_carbs,
-                           today_fat=today_fat)
+                           ordered_grouped_meals=ordered_grouped_meals)
 
 # Original route (GET only now, for pre-filling form from links)
-@app.route('/track/meal', methods=['GET']) # Changed methods to only allow GET
+@main.route('/track/meal', methods=['GET']) # Changed methods to only allow GET
 @login_required
 def track_meal():
     # Removed the entire 'if request.method == 'POST':' block
@@ -919,7 +3933,7 @@ def track_meal():
 
 
 # New AJAX route for logging meals
-@app.route('/track/meal_ajax', methods=['POST'])
+@main.route('/track/meal_ajax', methods=['POST'])
 @login_required
 def track_meal_ajax():
     try:
@@ -939,99 +3953,36 @@ def track_meal_ajax():
              # Return error as JSON
              return jsonify(success=False, message='Meal name and valid calories are required.')
 
-        # Create and save new log entry
-        log = MealLog(
+        # Create and save new log entry (its rollup is updated in the same transaction)
+        committed = save_log('meal', current_user.id,
             meal_name=meal_name, meal_type=meal_type, calories=calories,
             protein=protein, carbs=carbs, fat=fat, fiber=fiber, sugar=sugar,
-            notes=notes, logger=current_user
+            notes=notes
         )
-        db.session.add(log)
-        db.session.commit()
 
-        # Recalculate today's summary after saving
-        today_start = datetime.combine(date.today(), time.min)
-        today_end = datetime.combine(date.today(), time.max)
+        # Return success and today's updated totals (same shape as /widgets/todays-macros).
+        # In async write-behind mode the totals may not include this meal yet.
+        return jsonify(success=True, queued=not committed, **get_dashboard_summary(current_user.id).today())
 
-        # Meal Totals
-        todays_meals = MealLog.query.filter(
-            MealLog.user_id == current_user.id,
-            MealLog.log_time >= today_start, MealLog.log_time <= today_end
-        ).all()
-        calories_consumed = sum(meal.calories for meal in todays_meals if meal.calories)
-        protein_consumed = sum(meal.protein for meal in todays_meals if meal.protein)
-        carbs_consumed = sum(meal.carbs for meal in todays_meals if meal.carbs)
-        fat_consumed = sum(meal.fat for meal in todays_meals if meal.fat)
-
-        # Workout Totals
-        todays_workouts = WorkoutLog.query.filter(
-            WorkoutLog.user_id == current_user.id,
-            WorkoutLog.log_time >= today_start,
-            WorkoutLog.log_time <= today_end
-        ).all()
-        # Explicitly set calories_burned to 0 as WorkoutLog doesn't track it yet
-        calories_burned = 0
-        # calories_burned = sum(workout.calories_burned for workout in todays_workouts if hasattr(workout, 'calories_burned') and workout.calories_burned) # Original line (commented out)
-
-        # Net Calories
-        net_calories = calories_consumed - calories_burned
-
-        # Get user goals
-        profile = current_user.profile
-        goal_calories = profile.goal_calories if profile else None
-        goal_protein = profile.goal_protein if profile else None
-        goal_carbs = profile.goal_carbs if profile else None
-        goal_fat = profile.goal_fat if profile else None
-
-        # Return success and updated totals as JSON
-        return jsonify(
-            success=True,
-            calories_consumed=calories_consumed,
-            protein_consumed=protein_consumed,
-            carbs_consumed=carbs_consumed,
-            fat_consumed=fat_consumed,
-            net_calories=net_calories,
-            calories_burned=calories_burned, # Send the calculated (now 0) value
-            goal_calories=goal_calories,
-            goal_protein=goal_protein,
-            goal_carbs=goal_carbs,
-            goal_fat=goal_fat
-            # Optionally include details of the last logged meal if needed for another card update
-            # last_meal={'name': log.meal_name, 'calories': log.calories, ...}
-        )
-
-    except Exception as e:
+    except Exception:
         db.session.rollback() # Rollback in case of error during commit
-        print(f"Error in track_meal_ajax: {e}") # Log the error
+        current_app.logger.exception('Error in track_meal_ajax for user %s', current_user.id)
         return jsonify(success=False, message='An internal error occurred.')
 
 
 # New route for meal suggestions with details
-@app.route('/meals/suggest')
+@main.route('/meals/suggest')
 @login_required
 def meal_suggest():
     query = request.args.get('q', '') # Get search query
     suggestions = []
     if query and len(query) > 1: # Only search if query is long enough
-        search = f"%{query}%"
-        results = Meal.query.filter(Meal.name.ilike(search)).limit(10).all()
-        # Return a list of dictionaries with meal details
-        suggestions = [
-            {
-                'name': meal.name,
-                'calories': meal.calories_est,
-                'protein': meal.protein_est,
-                'carbs': meal.carbs_est,
-                'fat': meal.fat_est,
-                'fiber': meal.fiber_est,
-                'sugar': meal.sugar_est,
-                'meal_type': meal.meal_type # Include meal_type if needed
-            }
-            for meal in results
-        ]
+        # Return a list of dictionaries with meal details, from the in-memory index
+        suggestions = cached_suggestions('meal', query, limit=10)
     return jsonify(suggestions)
 
 # Food Database Search Endpoint (with AI potential)
-@app.route('/search_food')
+@main.route('/search_food')
 @login_required
 def search_food():
     query = request.args.get('q', '').lower()
@@ -1045,178 +3996,135 @@ def search_food():
     #    Example: "morning oats with berries" -> search for "oatmeal", "blueberries", "strawberries" etc.
     # ---
 
-    # --- Placeholder Data & Search Logic ---
-    # In a real app, query an external API or local DB using the (potentially AI-processed) query.
-    placeholder_db = [
-        # Fruits
-        {
-            "id": "1", "name": "Apple, raw, with skin", "serving_description": "1 medium (182g)",
-            "calories": 95, "protein": 0.5, "carbs": 25.1, "fat": 0.3, "fiber": 4.4, "sugar": 18.9
-        },
-        {
-            "id": "2", "name": "Banana, raw", "serving_description": "1 medium (118g)",
-            "calories": 105, "protein": 1.3, "carbs": 27, "fat": 0.4, "fiber": 3.1, "sugar": 14.4
-        },
-        {
-            "id": "7", "name": "Orange, raw", "serving_description": "1 medium (154g)",
-            "calories": 73, "protein": 1.3, "carbs": 18.1, "fat": 0.2, "fiber": 3.4, "sugar": 14.0
-        },
-        {
-            "id": "8", "name": "Strawberries, raw", "serving_description": "1 cup, whole (144g)",
-            "calories": 46, "protein": 1.0, "carbs": 11.1, "fat": 0.4, "fiber": 2.9, "sugar": 7.0
-        },
-        {
-            "id": "9", "name": "Blueberries, raw", "serving_description": "1 cup (148g)",
-            "calories": 84, "protein": 1.1, "carbs": 21.4, "fat": 0.5, "fiber": 3.6, "sugar": 14.7
-        },
-        # Vegetables
-        {
-            "id": "10", "name": "Broccoli, raw", "serving_description": "1 cup, chopped (91g)",
-            "calories": 31, "protein": 2.5, "carbs": 6.0, "fat": 0.3, "fiber": 2.4, "sugar": 1.5
-        },
-        {
-            "id": "11", "name": "Spinach, raw", "serving_description": "1 cup (30g)",
-            "calories": 7, "protein": 0.9, "carbs": 1.1, "fat": 0.1, "fiber": 0.7, "sugar": 0.1
-        },
-        {
-            "id": "12", "name": "Carrot, raw", "serving_description": "1 medium (61g)",
-            "calories": 25, "protein": 0.6, "carbs": 5.8, "fat": 0.1, "fiber": 1.7, "sugar": 2.9
-        },
-        {
-            "id": "13", "name": "Bell Pepper, red, raw", "serving_description": "1 medium (119g)",
-            "calories": 30, "protein": 1.2, "carbs": 6.3, "fat": 0.3, "fiber": 2.1, "sugar": 4.2
-        },
-        # Grains & Breads
-        {
-            "id": "5", "name": "Oatmeal, cooked with water", "serving_description": "1 cup cooked (234g)",
-            "calories": 158, "protein": 5.9, "carbs": 27.3, "fat": 3.2, "fiber": 4.0, "sugar": 1.1
-        },
-        {
-            "id": "14", "name": "Brown Rice, cooked", "serving_description": "1 cup (195g)",
-            "calories": 216, "protein": 5.0, "carbs": 44.8, "fat": 1.8, "fiber": 3.5, "sugar": 0.4
-        },
-        {
-            "id": "15", "name": "White Rice, cooked", "serving_description": "1 cup (158g)",
-            "calories": 205, "protein": 4.3, "carbs": 44.5, "fat": 0.4, "fiber": 0.6, "sugar": 0.1
-        },
-        {
-            "id": "16", "name": "Whole Wheat Bread", "serving_description": "1 slice (32g)",
-            "calories": 81, "protein": 3.9, "carbs": 13.8, "fat": 1.1, "fiber": 1.9, "sugar": 1.4
-        },
-        {
-            "id": "17", "name": "White Bread", "serving_description": "1 slice (25g)",
-            "calories": 66, "protein": 1.9, "carbs": 12.7, "fat": 0.8, "fiber": 0.6, "sugar": 1.1
-        },
-        # Proteins
-        {
-            "id": "3", "name": "Chicken Breast, grilled", "serving_description": "3 oz (85g)",
-            "calories": 140, "protein": 26, "carbs": 0, "fat": 3, "fiber": 0, "sugar": 0
-        },
-        {
-            "id": "18", "name": "Salmon, Atlantic, cooked", "serving_description": "3 oz (85g)",
-            "calories": 175, "protein": 22.1, "carbs": 0, "fat": 8.9, "fiber": 0, "sugar": 0
-        },
-        {
-            "id": "19", "name": "Egg, large, boiled", "serving_description": "1 large (50g)",
-            "calories": 78, "protein": 6.3, "carbs": 0.6, "fat": 5.3, "fiber": 0, "sugar": 0.6
-        },
-        {
-            "id": "20", "name": "Tofu, firm", "serving_description": "1/2 cup (126g)",
-            "calories": 181, "protein": 21.8, "carbs": 3.5, "fat": 11.0, "fiber": 2.9, "sugar": 0.9
-        },
-        {
-            "id": "21", "name": "Lentils, cooked", "serving_description": "1 cup (198g)",
-            "calories": 230, "protein": 17.9, "carbs": 39.9, "fat": 0.8, "fiber": 15.6, "sugar": 1.8
-        },
-        {
-            "id": "22", "name": "Ground Beef, 90% lean, cooked", "serving_description": "3 oz (85g)",
-            "calories": 184, "protein": 24.2, "carbs": 0, "fat": 8.8, "fiber": 0, "sugar": 0
-        },
-        # Dairy & Alternatives
-        {
-            "id": "23", "name": "Milk, 2% fat", "serving_description": "1 cup (244g)",
-            "calories": 122, "protein": 8.1, "carbs": 11.7, "fat": 4.8, "fiber": 0, "sugar": 12.3
-        },
-        {
-            "id": "24", "name": "Yogurt, Greek, plain, nonfat", "serving_description": "1 container (170g)",
-            "calories": 97, "protein": 17.3, "carbs": 6.1, "fat": 0.4, "fiber": 0, "sugar": 6.1
-        },
-        {
-            "id": "25", "name": "Cheddar Cheese", "serving_description": "1 oz (28g)",
-            "calories": 114, "protein": 6.7, "carbs": 0.9, "fat": 9.4, "fiber": 0, "sugar": 0.1
-        },
-        {
-            "id": "26", "name": "Almond Milk, unsweetened", "serving_description": "1 cup (240ml)",
-            "calories": 30, "protein": 1.0, "carbs": 1.0, "fat": 2.5, "fiber": 1.0, "sugar": 0
-        },
-        # Fats & Oils
-        {
-            "id": "27", "name": "Olive Oil", "serving_description": "1 tbsp (14g)",
-            "calories": 119, "protein": 0, "carbs": 0, "fat": 13.5, "fiber": 0, "sugar": 0
-        },
-        {
-            "id": "28", "name": "Avocado, raw", "serving_description": "1/2 medium (100g)",
-            "calories": 160, "protein": 2.0, "carbs": 8.5, "fat": 14.7, "fiber": 6.7, "sugar": 0.7
-        },
-        {
-            "id": "29", "name": "Almonds", "serving_description": "1 oz (approx 23 nuts, 28g)",
-            "calories": 164, "protein": 6.0, "carbs": 6.1, "fat": 14.2, "fiber": 3.5, "sugar": 1.2
-        },
-        # Beverages
-        {
-            "id": "6", "name": "Apple Juice, unsweetened", "serving_description": "1 cup (248g)",
-            "calories": 114, "protein": 0.2, "carbs": 28, "fat": 0.3, "fiber": 0.5, "sugar": 24
-        },
-        {
-            "id": "30", "name": "Coffee, black, brewed", "serving_description": "1 cup (8 fl oz)",
-            "calories": 2, "protein": 0.3, "carbs": 0, "fat": 0, "fiber": 0, "sugar": 0
-        },
-        # Prepared/Mixed Foods (Examples - highly variable)
-        {
-            "id": "4", "name": "Chicken Salad Sandwich", "serving_description": "1 sandwich",
-            "calories": 450, "protein": 20, "carbs": 40, "fat": 22, "fiber": 3, "sugar": 5 # Example estimate
-        },
-        {
-            "id": "31", "name": "Pizza, Cheese, regular crust", "serving_description": "1 slice (1/8 of 14\" pizza)",
-            "calories": 285, "protein": 12.2, "carbs": 35.7, "fat": 10.4, "fiber": 2.5, "sugar": 3.8 # Example estimate
-        },
-        {
-            "id": "32", "name": "Caesar Salad with Grilled Chicken", "serving_description": "1 large serving",
-            "calories": 550, "protein": 40, "carbs": 15, "fat": 35, "fiber": 5, "sugar": 3 # Example estimate
-        },
-
-    ]
-    # Simple placeholder keyword matching
-    results = [
-        food for food in placeholder_db
-        if query in food['name'].lower()
-    ]
-    # --- End Placeholder ---
+    # Use the ingested food composition database when one is loaded; otherwise fall back to
+    # the typo-tolerant in-memory index over the placeholder foods and the Meal catalog
+    food_version, food_vocabulary = get_food_dataset()
+    if food_version:
+        results = search_food_table(query, food_vocabulary, limit=15)
+    else:
+        results = get_food_search_index().search(query, limit=15)
 
     # --- AI/NLP Integration Point (Future) ---
     # 3. Rank/Filter Results: Use AI to prioritize the most relevant results based on context or user history.
     # ---
 
-    return jsonify(results[:15]) # Return top 15 matches
+    return jsonify(results) # Return top 15 matches
+
+@main.route('/import', methods=['GET', 'POST'])
+@login_required
+def import_data():
+    """Upload a CSV or NDJSON file of meal, workout or weight history."""
+    summary = None
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        default_kind = request.form.get('kind') or None
+        if not upload or not upload.filename:
+            flash('Please choose a file to import.', 'warning')
+            return redirect(url_for('main.import_data'))
+        if not upload.filename.lower().endswith(('.csv', '.ndjson', '.jsonl', '.json')):
+            flash('Unsupported file type. Upload a .csv or .ndjson file.', 'warning')
+            return redirect(url_for('main.import_data'))
+        try:
+            summary = import_history(current_user.id, upload.stream, upload.filename, default_kind=default_kind)
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception('Import failed part-way through for user %s', current_user.id)
+            flash('The import failed part-way through. Rows committed before the failure were kept.', 'danger')
+            return redirect(url_for('main.import_data'))
+        flash(f"Imported {summary['total_inserted']} of {summary['rows_read']} rows.",
+              'success' if not summary['error_count'] else 'warning')
+    return render_template('import_data.html', title='Import History',
+                           kinds=list(IMPORT_MODELS), summary=summary,
+                           columns={kind: [c.name for c in import_columns(model)] for kind, model in IMPORT_MODELS.items()})
+
+@main.route('/export')
+@login_required
+def export_data():
+    """Download everything stored about the current user as NDJSON or CSV."""
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('ndjson', 'csv'):
+        fmt = 'ndjson'
+    compress = request.args.get('compress') == 'gzip'
+    filename = f'smartfit-{current_user.username}-{date.today().isoformat()}.{fmt}'
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+
+    body = iter_export_lines(current_user.id, fmt)
+    if compress:
+        body = gzip_stream(body)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    return Response(stream_with_context(body), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"'})
 
 # --- Admin Routes ---
 
-@app.route('/admin')
+@main.route('/admin')
 @login_required
 @admin_required
 def admin_dashboard():
     """Admin dashboard page."""
-    all_users = User.query.order_by(User.username).all()
+    search = request.args.get('q', '').strip()
+    cursor = request.args.get('cursor')
+    users, next_cursor = admin_user_page(search, cursor)
     # Add current_year to context for footer
     current_year = datetime.utcnow().year
     # Define available roles to pass to the template
     available_roles = ['user', 'admin']
     # Count content items
+    user_count = User.query.count()
     workout_count = Workout.query.count()
     meal_count = Meal.query.count()
-    return render_template('admin_dashboard.html', title='Admin Dashboard', users=all_users, current_year=current_year, available_roles=available_roles, workout_count=workout_count, meal_count=meal_count) # Pass counts
+    return render_template('admin_dashboard.html', title='Admin Dashboard', users=users, current_year=current_year, available_roles=available_roles,
+                           user_count=user_count, workout_count=workout_count, meal_count=meal_count, # Pass counts
+                           search=search, cursor=cursor, next_cursor=next_cursor)
 
-@app.route('/admin/user/<int:user_id>/set_role', methods=['POST'])
+@main.route('/admin/sql')
+@login_required
+@admin_required
+def admin_sql():
+    """Routes ranked by SQL time over the rolling window, with probable N+1 patterns."""
+    return render_template('admin_sql.html', title='SQL Activity', routes=sql_window.summary(),
+                           enabled=SQL_INSTRUMENTATION, window_minutes=SQL_WINDOW_SECONDS // 60,
+                           threshold=N_PLUS_ONE_THRESHOLD, current_year=datetime.utcnow().year)
+
+@main.route('/admin/sql.json')
+@login_required
+@admin_required
+def admin_sql_json():
+    return jsonify(window_seconds=SQL_WINDOW_SECONDS, routes=sql_window.summary())
+
+@main.route('/admin/write-queue.json')
+@login_required
+@admin_required
+def admin_write_queue():
+    """Write-behind queue depth and group-commit latency."""
+    return jsonify(log_writer.metrics())
+
+ADMIN_USER_ORDER = [(User.username, False), (User.id, False)]
+
+def admin_user_page(search, cursor):
+    """One page of users ordered by username, optionally limited to a username/email prefix."""
+    query = User.query
+    if search:
+        # Range predicates on lower(...) can use the expression indexes; ILIKE '%...' could not
+        prefix = search.lower()
+        upper_bound = prefix + '\uffff'
+        query = query.filter(or_(
+            and_(func.lower(User.username) >= prefix, func.lower(User.username) < upper_bound),
+            and_(func.lower(User.email) >= prefix, func.lower(User.email) < upper_bound)
+        ))
+    return keyset_page(query, ADMIN_USER_ORDER, lambda user: (user.username, user.id), cursor=cursor)
+
+@main.route('/admin/users.json')
+@login_required
+@admin_required
+def admin_users_json():
+    """JSON pages of the user list (same ?q= and ?cursor= as the dashboard)."""
+    users, next_cursor = admin_user_page(request.args.get('q', '').strip(), request.args.get('cursor'))
+    return jsonify(items=[{'id': user.id, 'username': user.username, 'email': user.email, 'role': user.role}
+                          for user in users], next_cursor=next_cursor)
+
+@main.route('/admin/user/<int:user_id>/set_role', methods=['POST'])
 @login_required
 @admin_required
 def set_user_role(user_id):
@@ -1227,11 +4135,11 @@ def set_user_role(user_id):
 
     if user_to_modify == current_user:
         flash('Admins cannot change their own role.', 'warning')
-        return redirect(url_for('admin_dashboard'))
+        return redirect(url_for('main.admin_dashboard'))
 
     if new_role not in available_roles:
         flash(f'Invalid role specified: {new_role}.', 'danger')
-        return redirect(url_for('admin_dashboard'))
+        return redirect(url_for('main.admin_dashboard'))
 
     if user_to_modify.role != new_role:
         user_to_modify.role = new_role
@@ -1240,9 +4148,9 @@ def set_user_role(user_id):
     else:
         flash(f'{user_to_modify.username} already has the role {new_role}.', 'info')
 
-    return redirect(url_for('admin_dashboard'))
+    return redirect(url_for('main.admin_dashboard'))
 
-@app.route('/admin/user/<int:user_id>/delete', methods=['POST'])
+@main.route('/admin/user/<int:user_id>/delete', methods=['POST'])
 @login_required
 @admin_required
 def delete_user(user_id):
@@ -1251,13 +4159,13 @@ def delete_user(user_id):
 
     if user_to_delete == current_user:
         flash('Admins cannot delete their own account.', 'danger')
-        return redirect(url_for('admin_dashboard'))
+        return redirect(url_for('main.admin_dashboard'))
 
     # Check if user is the last admin (optional safeguard)
     admin_count = User.query.filter_by(role='admin').count()
     if user_to_delete.role == 'admin' and admin_count <= 1:
          flash('Cannot delete the last remaining admin account.', 'danger')
-         return redirect(url_for('admin_dashboard'))
+         return redirect(url_for('main.admin_dashboard'))
 
     username = user_to_delete.username # Get username before deleting
     # Cascading deletes should handle Profile, WorkoutLog, MealLog due to model setup
@@ -1265,20 +4173,35 @@ def delete_user(user_id):
     db.session.delete(user_to_delete)
     db.session.commit()
     flash(f'Successfully deleted user {username} and their associated data.', 'success')
-    return redirect(url_for('admin_dashboard'))
+    return redirect(url_for('main.admin_dashboard'))
 
 # --- Admin Content Management Routes ---
 
-@app.route('/admin/workouts')
+@main.route('/admin/workouts')
 @login_required
 @admin_required
 def admin_workouts():
-    """List all predefined workouts for management."""
-    all_workouts = Workout.query.order_by(Workout.category, Workout.name).all()
+    """List predefined workouts for management, one page at a time."""
+    cursor = request.args.get('cursor')
+    workouts, next_cursor = admin_workout_page(cursor)
     current_year = datetime.utcnow().year
-    return render_template('admin_workouts.html', title='Manage Workouts', workouts=all_workouts, current_year=current_year)
+    return render_template('admin_workouts.html', title='Manage Workouts', workouts=workouts, current_year=current_year,
+                           workout_count=Workout.query.count(), cursor=cursor, next_cursor=next_cursor)
+
+ADMIN_WORKOUT_ORDER = [(Workout.category, False), (Workout.name, False), (Workout.id, False)]
+
+def admin_workout_page(cursor):
+    return keyset_page(Workout.query, ADMIN_WORKOUT_ORDER, lambda w: (w.category, w.name, w.id), cursor=cursor)
+
+@main.route('/admin/workouts.json')
+@login_required
+@admin_required
+def admin_workouts_json():
+    workouts, next_cursor = admin_workout_page(request.args.get('cursor'))
+    return jsonify(items=[{'id': w.id, 'name': w.name, 'category': w.category, 'intensity': w.intensity}
+                          for w in workouts], next_cursor=next_cursor)
 
-@app.route('/admin/workout/<int:workout_id>/delete', methods=['POST'])
+@main.route('/admin/workout/<int:workout_id>/delete', methods=['POST'])
 @login_required
 @admin_required
 def delete_workout(workout_id):
@@ -1293,19 +4216,17 @@ def delete_workout(workout_id):
 
     if workout_to_delete.saved_by_users.count() > 0:
         flash(f'Cannot delete workout "{workout_name}" because it is saved by one or more users.', 'warning')
-        return redirect(url_for('admin_workouts'))
-
-    # Also consider WorkoutLogs that reference this workout by name.
-    # For now, we are not linking logs directly by ID, so deletion is simpler,
-    # but logs referencing the deleted name will remain.
+        return redirect(url_for('main.admin_workouts'))
 
+    # Logs of this workout keep their name and are matched by it once unlinked
+    unlink_workout_logs(workout_id)
     db.session.delete(workout_to_delete)
     db.session.commit()
     flash(f'Successfully deleted workout "{workout_name}".', 'success')
-    return redirect(url_for('admin_workouts'))
+    return redirect(url_for('main.admin_workouts'))
 
 # New route to display the edit workout form
-@app.route('/admin/workout/edit/<int:workout_id>', methods=['GET'])
+@main.route('/admin/workout/edit/<int:workout_id>', methods=['GET'])
 @login_required
 @admin_required
 def edit_workout_form(workout_id):
@@ -1313,11 +4234,11 @@ def edit_workout_form(workout_id):
     workout = Workout.query.get_or_404(workout_id)
     current_year = datetime.utcnow().year
     # Pass distinct categories for dropdown
-    available_categories = sorted([cat[0] for cat in db.session.query(Workout.category).distinct().all()])
+    available_categories = get_catalog().workout_categories
     return render_template('admin_edit_workout.html', title=f'Edit Workout: {workout.name}', workout=workout, current_year=current_year, available_categories=available_categories)
 
 # New route to handle the edit workout form submission
-@app.route('/admin/workout/edit/<int:workout_id>', methods=['POST'])
+@main.route('/admin/workout/edit/<int:workout_id>', methods=['POST'])
 @login_required
 @admin_required
 def edit_workout(workout_id):
@@ -1373,7 +4294,7 @@ def edit_workout(workout_id):
         for field, msg in errors.items():
             flash(msg, 'danger') # Still flash for general visibility
         current_year = datetime.utcnow().year
-        available_categories = sorted([cat[0] for cat in db.session.query(Workout.category).distinct().all()])
+        available_categories = get_catalog().workout_categories
         # Pass the workout object with the potentially invalid data back to the form
         return render_template('admin_edit_workout.html', title=f'Edit Workout: {workout.name}', workout=workout, current_year=current_year, available_categories=available_categories, errors=errors)
 
@@ -1385,28 +4306,46 @@ def edit_workout(workout_id):
         flash(f'Workout "{workout.name}" updated successfully.', 'success')
     except Exception as e:
         db.session.rollback()
+        current_app.logger.exception('Error updating workout %s', workout_id)
         # Revert video URL in the object if commit failed, before potentially re-rendering
         workout.video_url = original_video_url
         flash(f'Error updating workout: {e}', 'danger')
         # Optionally re-render form on commit error too
         current_year = datetime.utcnow().year
-        available_categories = sorted([cat[0] for cat in db.session.query(Workout.category).distinct().all()])
+        available_categories = get_catalog().workout_categories
         return render_template('admin_edit_workout.html', title=f'Edit Workout: {workout.name}', workout=workout, current_year=current_year, available_categories=available_categories, errors={'general': f'Database error: {e}'})
 
 
-    return redirect(url_for('admin_workouts'))
+    return redirect(url_for('main.admin_workouts'))
 
 
-@app.route('/admin/meals')
+@main.route('/admin/meals')
 @login_required
 @admin_required
 def admin_meals():
-    """List all predefined meals for management."""
-    all_meals = Meal.query.order_by(Meal.meal_type, Meal.name).all()
+    """List predefined meals for management, one page at a time."""
+    cursor = request.args.get('cursor')
+    meals, next_cursor = admin_meal_page(cursor)
     current_year = datetime.utcnow().year
-    return render_template('admin_meals.html', title='Manage Meals', meals=all_meals, current_year=current_year)
+    return render_template('admin_meals.html', title='Manage Meals', meals=meals, current_year=current_year,
+                           meal_count=Meal.query.count(), cursor=cursor, next_cursor=next_cursor)
+
+# meal_type is nullable; coalesce keeps the keyset comparison well defined
+ADMIN_MEAL_ORDER = [(func.coalesce(Meal.meal_type, ''), False), (Meal.name, False), (Meal.id, False)]
 
-@app.route('/admin/meal/<int:meal_id>/delete', methods=['POST'])
+def admin_meal_page(cursor):
+    return keyset_page(Meal.query, ADMIN_MEAL_ORDER, lambda m: (m.meal_type or '', m.name, m.id), cursor=cursor)
+
+@main.route('/admin/meals.json')
+@login_required
+@admin_required
+def admin_meals_json():
+    meals, next_cursor = admin_meal_page(request.args.get('cursor'))
+    return jsonify(items=[{'id': m.id, 'name': m.name, 'meal_type': m.meal_type, 'diet_type': m.diet_type,
+                           'calories_est': m.calories_est}
+                          for m in meals], next_cursor=next_cursor)
+
+@main.route('/admin/meal/<int:meal_id>/delete', methods=['POST'])
 @login_required
 @admin_required
 def delete_meal(meal_id):
@@ -1420,7 +4359,7 @@ def delete_meal(meal_id):
     db.session.delete(meal_to_delete)
     db.session.commit()
     flash(f'Successfully deleted meal "{meal_name}".', 'success')
-    return redirect(url_for('admin_meals'))
+    return redirect(url_for('main.admin_meals'))
 
 
 # --- CLI Command for DB Initialization (Commented out for now) ---
@@ -1432,205 +4371,448 @@ def delete_meal(meal_id):
 #     db.create_all()
 #     click.echo('Initialized the database.')
 #
-# app.cli.add_command(init_db_command)
+# main.cli.add_command(init_db_command)
+
+@main.cli.command('ensure-indexes')
+def ensure_indexes_command():
+    """Add any missing indexes to an existing database."""
+    ensure_indexes()
+    print('Indexes are up to date.')
+
+@main.cli.command('import-history')
+@click.argument('username')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--kind', type=click.Choice(list(IMPORT_MODELS)), default=None,
+              help="Record type for rows without a 'type' field.")
+@click.option('--batch-size', type=int, default=IMPORT_BATCH_SIZE, show_default=True)
+def import_history_command(username, path, kind, batch_size):
+    """Import a CSV or NDJSON history file for USERNAME."""
+    user = User.query.filter_by(username=username).first()
+    if not user:
+        raise click.ClickException(f'No user named {username}.')
+    with open(path, 'rb') as stream:
+        summary = import_history(user.id, stream, path, default_kind=kind, batch_size=batch_size)
+    for line_number, message in summary['errors']:
+        print(f'line {line_number}: {message}')
+    print(f"Read {summary['rows_read']} rows, inserted {summary['total_inserted']} "
+          f"({', '.join(f'{k}: {v}' for k, v in summary['inserted'].items())}), "
+          f"{summary['skipped']} skipped, {summary['error_count']} errors in {summary['elapsed_seconds']}s "
+          f"({summary['rows_per_second']} rows/s).")
+
+@main.cli.command('export-history')
+@click.argument('username')
+@click.option('--format', 'fmt', type=click.Choice(['ndjson', 'csv']), default='ndjson', show_default=True)
+@click.option('--gzip', 'compress', is_flag=True, help='Gzip-compress the output.')
+@click.option('-o', '--output', type=click.Path(dir_okay=False), default=None, help='Output file (default: stdout).')
+def export_history_command(username, fmt, compress, output):
+    """Export everything stored about USERNAME."""
+    user = User.query.filter_by(username=username).first()
+    if not user:
+        raise click.ClickException(f'No user named {username}.')
+    chunks = iter_export_lines(user.id, fmt)
+    with click.open_file(output or '-', 'wb') as out:
+        for chunk in (gzip_stream(chunks) if compress else (c.encode('utf-8') for c in chunks)):
+            out.write(chunk)
+
+@main.cli.command('ingest-foods')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--chunk-size', type=int, default=FOOD_INGEST_CHUNK_SIZE, show_default=True)
+@click.option('--restart', is_flag=True, help='Ignore progress from an interrupted run and start over.')
+def ingest_foods_command(path, chunk_size, restart):
+    """Load a USDA-style food composition CSV into the searchable food database."""
+    started = monotonic()
+    if db.engine.dialect.name != 'sqlite':
+        raise click.ClickException('The local food database is only supported on the SQLite backend.')
+    loaded = ingest_food_database(path, chunk_size=chunk_size, restart=restart,
+                                  progress=lambda done, loaded: print(f'{done} rows read, {loaded} foods loaded', end='\r'))
+    print(f'\nLoaded {loaded} foods in {monotonic() - started:.1f}s; the new food table is live.')
+
+@main.cli.command('rebuild-nutrition')
+@click.option('--user-id', type=int, default=None, help='Only rebuild rollups for this user.')
+def rebuild_nutrition_command(user_id):
+    """Rebuild the DailyNutrition rollup table from raw MealLog rows."""
+    row_count = rebuild_daily_nutrition(None if user_id is None else [user_id])
+    db.session.commit()
+    print(f'Rebuilt {row_count} daily nutrition rows.')
+
+@main.cli.command('backfill-calories-burned')
+@click.option('--chunk-size', type=int, default=CALORIE_BACKFILL_CHUNK_SIZE, show_default=True)
+@click.option('--pause-ms', type=int, default=50, show_default=True, help='Pause between chunks, leaving the database to other writers.')
+@click.option('--recompute', is_flag=True, help='Re-estimate every workout log, not only those without a value.')
+def backfill_calories_burned_command(chunk_size, pause_ms, recompute):
+    """Estimate calories burned for existing workout logs."""
+    started = monotonic()
+    def progress(done, total):
+        print(f'\r{done:,}/{total:,} workout logs ({done / max(monotonic() - started, 1e-9):,.0f}/s)', end='', flush=True)
+    updated = backfill_calories_burned(chunk_size=chunk_size, pause=pause_ms / 1000, recompute=recompute, progress=progress)
+    print(f'\nEstimated calories burned for {updated:,} workout logs.')
+
+@main.cli.command('backfill-workout-sets')
+@click.option('--chunk-size', type=int, default=SET_BACKFILL_CHUNK_SIZE, show_default=True)
+@click.option('--pause-ms', type=int, default=50, show_default=True, help='Pause between chunks, leaving the database to other writers.')
+@click.option('--reparse', is_flag=True, help='Re-parse every workout log, replacing its sets.')
+def backfill_workout_sets_command(chunk_size, pause_ms, reparse):
+    """Parse the repetitions of existing workout logs into per-set rows."""
+    started = monotonic()
+    def progress(done, total):
+        print(f'\r{done:,}/{total:,} workout logs ({done / max(monotonic() - started, 1e-9):,.0f}/s)', end='', flush=True)
+    parsed = backfill_workout_sets(chunk_size=chunk_size, pause=pause_ms / 1000, reparse=reparse, progress=progress)
+    print(f'\nParsed sets for {parsed:,} workout logs.')
+
+@main.cli.command('backfill-workout-ids')
+@click.option('--chunk-size', type=int, default=WORKOUT_LINK_CHUNK_SIZE, show_default=True, help='Log ids per batch.')
+@click.option('--pause-ms', type=int, default=50, show_default=True, help='Pause between batches, leaving the database to other writers.')
+def backfill_workout_ids_command(chunk_size, pause_ms):
+    """Link existing workout logs to catalog workouts by name."""
+    def progress(done, total):
+        print(f'\r{done:,}/{total:,} log ids scanned', end='', flush=True)
+    scanned = backfill_workout_ids(chunk_size=chunk_size, pause=pause_ms / 1000, progress=progress)
+    print(f'\nLinked the unlinked workout logs among {scanned:,} log ids to their workouts.')
+
+@main.cli.command('migrate')
+@click.option('--to', 'target', type=int, default=None, help='Stop after this migration version.')
+@click.option('--chunk-size', type=int, default=MIGRATION_CHUNK_SIZE, show_default=True, help='Rows per backfill transaction.')
+@click.option('--pause-ms', type=int, default=50, show_default=True, help='Pause between chunks, leaving the database to other writers.')
+@click.option('--schema-only', is_flag=True, help='Only apply schema migrations, leaving index builds and backfills.')
+def migrate_command(target, chunk_size, pause_ms, schema_only):
+    """Apply pending schema migrations, resuming any interrupted backfill."""
+    if not inspect(db.engine).has_table(User.__tablename__): # A new database is created at the latest version
+        init_database()
+        print('Created a new database; nothing to migrate.')
+        return
+    started = monotonic()
+    def progress(record, done, total):
+        of_total = f'/{total:,}' if total is not None else ''
+        print(f'\r  {done:,}{of_total} rows ({done / max(monotonic() - started, 1e-9):,.0f}/s)', end='', flush=True)
+    def announce(migration, seconds):
+        nonlocal started
+        if seconds is None:
+            started = monotonic()
+            print(f'Applying {migration.version}: {migration.name}...')
+        else:
+            print(f'\r  done in {seconds:.1f}s' + ' ' * 40)
+    try:
+        applied = migrate(online=not schema_only, target=target, chunk_size=chunk_size, pause=pause_ms / 1000,
+                          progress=progress, announce=announce)
+    except MigrationBusy as error:
+        raise click.ClickException(f'{error}; try again once it finishes.')
+    print(f'Applied {len(applied)} migrations.' if applied else 'Nothing to migrate.')
+
+@main.cli.command('migration-status')
+def migration_status_command():
+    """List schema migrations and whether each is applied."""
+    has_records = inspect(db.engine).has_table(SchemaMigration.__tablename__) # Read-only: never create it here
+    records = {record.version: record for record in SchemaMigration.query} if has_records else {}
+    for migration in MIGRATIONS:
+        record = records.get(migration.version)
+        if record is not None and record.applied_at is not None:
+            state = f'applied {record.applied_at:%Y-%m-%d %H:%M}'
+        elif record is not None and (record.owner or record.rows_done):
+            state = f'in progress, {record.rows_done:,} rows done' + (f' by {record.owner}' if record.owner else ' (interrupted)')
+        else:
+            state = 'pending'
+        kind = 'online' if migration.online else 'schema'
+        print(f'{migration.version:>4}  {kind:<6}  {migration.name:<45}  {state}')
+
+@main.cli.command('calibrate-password-hash')
+@click.option('--target-ms', type=int, default=250, show_default=True, help='Hashing time to aim for on this machine.')
+@click.option('--algorithm', type=click.Choice(['scrypt', 'pbkdf2']), default='scrypt', show_default=True)
+def calibrate_password_hash_command(target_ms, algorithm):
+    """Print a PASSWORD_HASH_METHOD whose hashes take about --target-ms here."""
+    def timed(method):
+        started = perf_counter()
+        generate_password_hash('calibration', method)
+        return (perf_counter() - started) * 1000
+    if algorithm == 'scrypt':
+        n = 2 ** 14
+        while n < 2 ** 20 and timed(f'scrypt:{n}:8:1') < target_ms / 2: # Cost doubles with n
+            n *= 2
+        method = f'scrypt:{n}:8:1'
+    else:
+        iterations = 100_000
+        iterations = max(iterations, int(round(iterations * target_ms / timed(f'pbkdf2:sha256:{iterations}'), -4)))
+        method = f'pbkdf2:sha256:{iterations}'
+    print(f'PASSWORD_HASH_METHOD={method}  ({timed(method):.0f} ms per hash)')
+
+
+# --- Sample Data ---
+
+def seed_database():
+    """Adds the admin user and the sample workout/meal catalog to a newly created database."""
+    # --- Add Sample Admin User ---
+    admin_user = User(username='admin', email='admin@example.com', role='admin')
+    admin_user.set_password('adminpass') # Use a strong password in production!
+    db.session.add(admin_user)
+    # Create a profile for the admin user
+    admin_profile = Profile(user=admin_user, goal='Maintain System')
+    db.session.add(admin_profile)
+
+
+    # --- Add Sample Data (Restructured Categories & Videos) ---
+    # Push Workouts
+    w_push1 = Workout(
+        name="Classic Push Day", category="Push",
+        description="Focuses on chest, shoulders, and triceps.", intensity="Medium", duration_est=50, equipment="Barbell, Dumbbells, Bench",
+        instructions="1. Barbell Bench Press (3x8-12)\n2. Overhead Press (3x8-12)\n3. Incline Dumbbell Press (3x10-15)\n4. Lateral Raises (3x12-15)\n5. Triceps Pushdowns (3x12-15)\n6. Overhead Triceps Extension (3x12-15)",
+        reps_sets="See instructions", form_tips="Focus on controlled movements and full range of motion.",
+        video_url="https://www.youtube.com/watch?v=Au1tQmWt9Qc" # Standard URL
+    )
+    w_push2 = Workout(
+        name="Bodyweight Push Circuit", category="Push",
+        description="Chest, shoulders, and triceps using bodyweight.", intensity="Medium", duration_est=30, equipment="None (Optional: Dip Station)",
+        instructions="Circuit: 45s work / 15s rest. Repeat 3-4 rounds.\n1. Push-ups (various types)\n2. Pike Push-ups\n3. Triceps Dips (using chair or station)\n4. Plank Shoulder Taps\n5. Diamond Push-ups",
+        reps_sets="Circuit based", form_tips="Maintain core stability. Modify exercises as needed.",
+        video_url="https://www.youtube.com/watch?v=IODxDxX7oi4" # Standard URL
+    )
+
+    # Pull Workouts
+    w_pull1 = Workout(
+        name="Classic Pull Day", category="Pull",
+        description="Focuses on back and biceps.", intensity="Medium", duration_est=50, equipment="Pull-up Bar, Barbell, Dumbbells",
+        instructions="1. Pull-ups / Lat Pulldowns (3xAMRAP or 8-12)\n2. Barbell Rows (3x8-12)\n3. Seated Cable Rows (3x10-15)\n4. Face Pulls (3x15-20)\n5. Dumbbell Bicep Curls (3x10-15)\n6. Hammer Curls (3x10-15)",
+        reps_sets="See instructions", form_tips="Initiate pulls with your back muscles, not just arms. Control the negative.",
+        video_url="https://www.youtube.com/watch?v=JEbWPNCksQs" # Standard URL
+    )
+    w_pull2 = Workout(
+        name="Bodyweight Pull Focus", category="Pull",
+        description="Back and biceps using bodyweight and minimal equipment.", intensity="Medium", duration_est=30, equipment="Pull-up Bar (or resistance bands)",
+        instructions="1. Pull-ups / Banded Pull-downs (4xAMRAP or 8-15)\n2. Inverted Rows / Bodyweight Rows (4x10-15)\n3. Supermans (3x15-20)\n4. Bicep Curls with Bands / Towel Curls (3x12-15)",
+        reps_sets="See instructions", form_tips="Focus on squeezing the back muscles. Use full range of motion.",
+        video_url="https://www.youtube.com/watch?v=IMxhZHkH7k4" # Standard URL
+    )
+
+    # Leg Workouts
+    w_leg1 = Workout(
+        name="Classic Leg Day", category="Legs",
+        description="Comprehensive lower body workout.", intensity="High", duration_est=60, equipment="Squat Rack, Leg Press, Dumbbells",
+        instructions="1. Barbell Squats (3x8-12)\n2. Romanian Deadlifts (3x10-12)\n3. Leg Press (3x10-15)\n4. Leg Extensions (3x12-15)\n5. Hamstring Curls (3x12-15)\n6. Calf Raises (4x15-20)",
+        reps_sets="See instructions", form_tips="Prioritize form, especially on squats and deadlifts. Control the weight.",
+        video_url="https://www.youtube.com/watch?v=Jpi-uQw84pA" # Standard URL
+    )
+    w_leg2 = Workout(
+        name="Bodyweight Leg Burner", category="Legs",
+        description="Lower body workout using only bodyweight.", intensity="Medium", duration_est=30, equipment="None",
+        instructions="Circuit: 45s work / 15s rest. Repeat 3-4 rounds.\n1. Squats\n2. Lunges (alternating)\n3. Glute Bridges\n4. Squat Jumps\n5. Calf Raises",
+        reps_sets="Circuit based", form_tips="Focus on depth in squats/lunges. Explode on jumps.",
+        video_url="https://www.youtube.com/watch?v=bOLzfEmk02k" # Standard URL
+    )
+
+    # Full Body Workouts
+    w_full1 = Workout(
+        name="Full Body Strength (3x Week)", category="Full Body",
+        description="Balanced workout targeting major muscle groups.", intensity="Medium", duration_est=45, equipment="Dumbbells, Barbell, Bench",
+        instructions="Perform 2-3 times per week with rest days.\n1. Squats (3x8-12)\n2. Bench Press (3x8-12)\n3. Barbell Rows (3x8-12)\n4. Overhead Press (3x10-15)\n5. Romanian Deadlifts (3x10-12)",
+        reps_sets="See instructions", form_tips="Focus on compound movements. Ensure adequate recovery.",
+        video_url="https://www.youtube.com/watch?v=U0bhE67HuDY" # Standard URL
+    )
+    w_full2 = Workout(
+        name="Bodyweight Full Body Circuit", category="Full Body",
+        description="Workout using only bodyweight exercises.", intensity="Medium", duration_est=30, equipment="None",
+        instructions="Circuit: 40s work / 20s rest. Repeat 3 rounds.\n1. Squats\n2. Push-ups\n3. Lunges\n4. Plank\n5. Glute Bridges\n6. Jumping Jacks",
+        reps_sets="Circuit based", form_tips="Maintain good form throughout. Modify exercises if needed.",
+        video_url="https://www.youtube.com/watch?v=gC_L9qAHVJ8" # Standard URL
+    )
+
+    # Cardio Workouts
+    w_cardio1 = Workout(
+        name="HIIT Cardio Blast", 
+        category="Cardio",
+        description="High-Intensity Interval Training.", 
+        intensity="High", 
+        duration_est=20, 
+        equipment="None",
+        instructions="Warm-up (3 min). Perform each exercise for 45 sec, rest 15 sec: Jumping Jacks, High Knees, Burpees, Mountain Climbers, Squat Jumps. Repeat circuit 3 times. Cool-down (3 min).",
+        reps_sets="3 rounds (45s work / 15s rest)", 
+        form_tips="Maintain high intensity during work periods. Modify as needed.",
+        video_url="https://www.youtube.com/watch?v=cZnsLVArIt8" # Standard URL
+    )
+    
+    w_cardio2 = Workout(
+        name="Steady State Cardio (Run/Cycle)", 
+        category="Cardio",
+        description="A moderate-intensity running workout that builds endurance and cardiovascular fitness over time.", 
+        intensity="Medium", 
+        duration_est=45, 
+        equipment="Running shoes, Optional: Treadmill or outdoor path",
+        instructions="1. Warm-up (5 min): Start with light jogging and dynamic stretches\n2. Main Session (30-35 min): Run at a steady, conversational pace (you should be able to talk but not sing)\n3. Cool down (5 min): Gradually slow to a walk\n4. Post-run stretches: Focus on calves, quads, hamstrings, and hip flexors\n\nBeginner Tip: Start with a run/walk pattern - 3 minutes running, 2 minutes walking.",
+        reps_sets="Continuous effort", 
+        form_tips="Keep your head up, shoulders relaxed. Land midfoot rather than heel-striking. Maintain a slight forward lean. Take shorter strides rather than overstriding. Swing arms at 90° angles without crossing the midline of your body.",
+        video_url="https://www.youtube.com/watch?v=5umbf4ps0GQ" # Running form video
+    )
+
+    # Yoga/Flexibility Workouts
+    w_yoga1 = Workout(
+        name="Morning Yoga Flow", 
+        category="Yoga/Flexibility",
+        description="Start your day with a gentle flow.", 
+        intensity="Low", 
+        duration_est=20, 
+        equipment="None (Yoga Mat optional)",
+        instructions="Follow the video for a guided flow including Child's Pose, Cat-Cow, Downward Dog, Sun Salutations, etc.",
+        reps_sets="Flow based", 
+        form_tips="Focus on breath. Move with intention.",
+        video_url="https://www.youtube.com/watch?v=v7AYKMP6rOE" # Standard URL
+    )
+
+    w_yoga2 = Workout(
+        name="Active Recovery / Stretching",
+        category="Yoga/Flexibility",
+        description="Low-intensity movement and targeted stretching to improve recovery, reduce soreness, and increase range of motion.",
+        intensity="Low",
+        duration_est=25,
+        equipment="Yoga mat, Optional: Foam roller",
+        instructions="1. Start with 5 minutes of gentle movement (walking, arm circles, etc.)\n2. Dynamic stretches (30 seconds each):\n   - Leg swings (forward/backward & side-to-side)\n   - Arm circles and shoulder rolls\n   - Torso rotations\n3. Static stretches (hold 30-60 seconds each):\n   - Standing hamstring stretch\n   - Quad stretch\n   - Chest opener\n   - Figure-4 hip stretch\n   - Child's pose\n   - Cat-cow stretch\n   - Downward dog\n4. Optional foam rolling for tight areas (1-2 minutes per muscle group)",
+        reps_sets="Hold each stretch for 30-60 seconds, breathing deeply",
+        form_tips="Never stretch to the point of pain. Focus on relaxed breathing. Stretches should feel like tension, not pain. For foam rolling, avoid rolling directly on joints or bones.",
+        video_url="https://www.youtube.com/watch?v=Ef6LwAaB3_E" # Standard URL
+    )
+
+    # Additional specialized workouts (Ensure these are defined correctly)
+    w_core = Workout(
+        name="Core Crusher",
+        category="Home", # Changed category to Home as per previous definition
+        description="A focused core workout targeting all areas of the abdominal muscles, obliques, and lower back for strength and stability.",
+        intensity="Medium",
+        duration_est=15,
+        equipment="Exercise mat, Optional: Light dumbbells",
+        instructions="Circuit format - perform each exercise for 45 seconds, rest 15 seconds between exercises, and complete 3 rounds:\n\n1. Plank (standard or on forearms)\n2. Russian Twists\n3. Bicycle Crunches\n4. Mountain Climbers\n5. Slow V-Ups\n6. Side Plank (30s each side)\n7. Dead Bugs\n8. Heel Taps\n\nRest 60 seconds between rounds. Focus on controlled movements rather than speed.",
+        reps_sets="45 seconds work / 15 seconds rest, 3 rounds",
+        form_tips="Engage your core before each movement. Breathe consistently throughout - exhale during exertion. Keep lower back pressed into the mat during floor exercises. Quality over quantity - proper form prevents injury.",
+        video_url="https://www.youtube.com/watch?v=7qA3WmqGAoo" # Standard URL
+    )
+
+    w_pilates = Workout( # Renamed from w12 to w_pilates for consistency
+        name="Pilates Mat",
+        category="Home", # Changed category to Home as per previous definition
+        description="A flowing sequence of precise movements focusing on core strength, spinal alignment, and whole-body coordination.",
+        intensity="Low",
+        duration_est=45,
+        equipment="Exercise mat",
+        instructions="1. Breathing Exercise (2 min): Focus on lateral thoracic breathing\n2. Warm-up (5 min): Gentle spinal articulation, shoulder rolls\n3. Main Sequence (30-35 min):\n   - The Hundred\n   - Roll Up\n   - Single Leg Circles\n   - Rolling Like a Ball\n   - Single Leg Stretch\n   - Double Leg Stretch\n   - Single Straight Leg Stretch\n   - Double Straight Leg Stretch\n   - Criss Cross\n   - Spine Stretch Forward\n   - Open Leg Rocker\n   - Corkscrew\n   - Saw\n4. Cool down (3 min): Child's pose, gentle twists",
+        reps_sets="8-10 repetitions of each exercise",
+        form_tips="Focus on precision rather than repetitions. Maintain the Pilates stance: navel drawn to spine, ribs connected, shoulders relaxed. Coordinate breathing with movement - typically inhale to prepare, exhale during exertion. Keep neck and shoulders relaxed.",
+        video_url="https://www.youtube.com/watch?v=9ATQ-5-1XrE" # Standard URL
+    )
+
+    # Add all workouts to the session
+    db.session.add_all([
+        w_push1, w_push2, w_pull1, w_pull2, w_leg1, w_leg2,
+        w_full1, w_full2, w_cardio1, w_cardio2, w_yoga1, w_yoga2,
+        w_core, w_pilates # Ensure w_core and w_pilates are included
+    ])
+
+    # Sample Meals (Remains the same)
+    m1 = Meal(name="Grilled Chicken Salad", description="A healthy and satisfying salad perfect for lunch.",
+              meal_type="Lunch", diet_type="High-Protein, Low-Carb", calories_est=450,
+              protein_est=40.0, carbs_est=15.0, fat_est=25.0, fiber_est=8.0, sugar_est=5.0)
+    m2 = Meal(name="Berry Oatmeal", description="A warm and filling start to the day.",
+              meal_type="Breakfast", diet_type="Vegan Option", calories_est=350,
+              protein_est=10.0, carbs_est=60.0, fat_est=8.0, fiber_est=10.0, sugar_est=15.0)
+    m3 = Meal(name="Salmon with Roasted Veggies", description="Nutrient-dense dinner.",
+              meal_type="Dinner", diet_type="High-Protein", calories_est=550,
+              protein_est=35.0, carbs_est=40.0, fat_est=28.0, fiber_est=12.0, sugar_est=8.0)
+    db.session.add_all([m1, m2, m3])
+
+    # Add an initial weight log for the admin user if weight is set
+    if admin_profile.weight:
+         initial_weight_log = WeightLog(weight=admin_profile.weight, user_id=admin_user.id)
+         db.session.add(initial_weight_log)
+
+    # Commit sample data
+    db.session.commit()
 
+def init_database():
+    """
+    Creates and seeds the database if it has no tables yet, otherwise applies pending
+    migrations as MIGRATE_ON_START allows. Returns True if created.
+    """
+    if not inspect(db.engine).has_table(User.__tablename__):
+        print(f"No tables found in {db.engine.url!r}. Creating tables and sample data...")
+        db.create_all()
+        seed_database()
+        stamp_migrations()
+        print("Database tables and sample data created.")
+        return True
+    if MIGRATE_ON_START == 'off':
+        return False
+    def announce(migration, seconds):
+        if seconds is None:
+            print(f'Applying migration {migration.version}: {migration.name}...')
+    migrate(online=False, announce=announce)
+    if MIGRATE_ON_START == 'all':
+        try:
+            migrate(announce=announce)
+        except MigrationBusy as error: # Another process is running it; serve meanwhile
+            print(f'{error}; continuing without it.')
+    pending = [migration for migration in pending_migrations() if migration.online]
+    if pending:
+        print(f'{len(pending)} online migrations pending; run `flask --app wsgi migrate` to apply them.')
+    return False
+
+# --- Application Factory ---
+# create_app() builds a new application: config from the environment (overridden by `config`),
+# the database and login extensions and the `main` blueprint. With INIT_DATABASE it also
+# creates or upgrades the database and, with PRELOAD_CATALOG, builds the in-memory catalog
+# read models. Under a pre-fork server (see gunicorn.conf.py) this runs once in the master, so
+# workers share those structures copy-on-write. The in-memory caches are per process, not per
+# app, so all apps in one process are expected to use the same database.
+
+def loaded_by_flask_command():
+    """True while the `flask` command loads the app for one of its commands, other than `flask run`."""
+    context = click.get_current_context(silent=True)
+    return context is not None and isinstance(context.find_root().command, FlaskGroup) and context.command.name != 'run'
+
+def create_app(config=None):
+    """
+    Builds and returns a new application. `config` overrides Flask config values, e.g.
+    SQLALCHEMY_DATABASE_URI (default: DATABASE_URL), PRELOAD_CATALOG or INIT_DATABASE. The
+    database is left alone when INIT_DATABASE is false, which is the default for the
+    maintenance commands run with `flask --app wsgi` (so `migration-status` only reads).
+    """
+    app = Flask(__name__)
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'fallback-secret-key-for-dev') # Use environment variable in production
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    app.config['PRELOAD_CATALOG'] = os.environ.get('PRELOAD_CATALOG', '1') != '0' # Build in-memory catalogs before forking
+    app.config['INIT_DATABASE'] = not loaded_by_flask_command() # Create, seed or upgrade the database on startup
+    app.config.update(config or {})
+    app.config.setdefault('SQLALCHEMY_DATABASE_URI', database_url())
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', database_engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+    db.init_app(app)
+    login_manager.init_app(app)
+    app.register_blueprint(main)
+    apps.add(app)
+    if app.config['INIT_DATABASE']:
+        with app.app_context():
+            init_database()
+            if app.config['PRELOAD_CATALOG']:
+                preload_read_models()
+            for engine in db.engines.values():
+                engine.dispose() # Don't hand pooled connections down to forked workers
+    return app
+
+def preload_read_models():
+    """Builds the in-memory catalog snapshot, name indexes and food search index up front."""
+    get_catalog()
+    get_suggest_index('workout')
+    get_suggest_index('meal')
+    get_food_search_index()
+
+def _reset_after_fork():
+    """Runs in every forked child: drop the parent's pooled connections, log writer, metrics and hash pool."""
+    for app in list(apps):
+        with app.app_context():
+            for engine in db.engines.values():
+                engine.dispose(close=False) # Those connections still belong to the parent
+    log_writer.reset()
+    metrics.reset()
+    password_hasher.reset()
 
-# --- Utility Comments ---
-# The app will now attempt to create the DB automatically on first run if 'smartfit.db' is missing.
+if hasattr(os, 'register_at_fork'): # Not available on Windows
+    os.register_at_fork(after_in_child=_reset_after_fork)
 
-if __name__ == '__main__':
-    # Check if the database file exists, create tables if it doesn't
-    if not os.path.exists(db_path):
-        print(f"Database file not found at {db_path}. Creating tables and sample data...")
-        with app.app_context():
-            db.create_all() # This will now create the WeightLog table too
-
-            # --- Add Sample Admin User ---
-            admin_user = User(username='admin', email='admin@example.com', role='admin')
-            admin_user.set_password('adminpass') # Use a strong password in production!
-            db.session.add(admin_user)
-            # Create a profile for the admin user
-            admin_profile = Profile(user=admin_user, goal='Maintain System')
-            db.session.add(admin_profile)
-
-
-            # --- Add Sample Data (Restructured Categories & Videos) ---
-            # Push Workouts
-            w_push1 = Workout(
-                name="Classic Push Day", category="Push",
-                description="Focuses on chest, shoulders, and triceps.", intensity="Medium", duration_est=50, equipment="Barbell, Dumbbells, Bench",
-                instructions="1. Barbell Bench Press (3x8-12)\n2. Overhead Press (3x8-12)\n3. Incline Dumbbell Press (3x10-15)\n4. Lateral Raises (3x12-15)\n5. Triceps Pushdowns (3x12-15)\n6. Overhead Triceps Extension (3x12-15)",
-                reps_sets="See instructions", form_tips="Focus on controlled movements and full range of motion.",
-                video_url="https://www.youtube.com/watch?v=Au1tQmWt9Qc" # Standard URL
-            )
-            w_push2 = Workout(
-                name="Bodyweight Push Circuit", category="Push",
-                description="Chest, shoulders, and triceps using bodyweight.", intensity="Medium", duration_est=30, equipment="None (Optional: Dip Station)",
-                instructions="Circuit: 45s work / 15s rest. Repeat 3-4 rounds.\n1. Push-ups (various types)\n2. Pike Push-ups\n3. Triceps Dips (using chair or station)\n4. Plank Shoulder Taps\n5. Diamond Push-ups",
-                reps_sets="Circuit based", form_tips="Maintain core stability. Modify exercises as needed.",
-                video_url="https://www.youtube.com/watch?v=IODxDxX7oi4" # Standard URL
-            )
-
-            # Pull Workouts
-            w_pull1 = Workout(
-                name="Classic Pull Day", category="Pull",
-                description="Focuses on back and biceps.", intensity="Medium", duration_est=50, equipment="Pull-up Bar, Barbell, Dumbbells",
-                instructions="1. Pull-ups / Lat Pulldowns (3xAMRAP or 8-12)\n2. Barbell Rows (3x8-12)\n3. Seated Cable Rows (3x10-15)\n4. Face Pulls (3x15-20)\n5. Dumbbell Bicep Curls (3x10-15)\n6. Hammer Curls (3x10-15)",
-                reps_sets="See instructions", form_tips="Initiate pulls with your back muscles, not just arms. Control the negative.",
-                video_url="https://www.youtube.com/watch?v=JEbWPNCksQs" # Standard URL
-            )
-            w_pull2 = Workout(
-                name="Bodyweight Pull Focus", category="Pull",
-                description="Back and biceps using bodyweight and minimal equipment.", intensity="Medium", duration_est=30, equipment="Pull-up Bar (or resistance bands)",
-                instructions="1. Pull-ups / Banded Pull-downs (4xAMRAP or 8-15)\n2. Inverted Rows / Bodyweight Rows (4x10-15)\n3. Supermans (3x15-20)\n4. Bicep Curls with Bands / Towel Curls (3x12-15)",
-                reps_sets="See instructions", form_tips="Focus on squeezing the back muscles. Use full range of motion.",
-                video_url="https://www.youtube.com/watch?v=IMxhZHkH7k4" # Standard URL
-            )
-
-            # Leg Workouts
-            w_leg1 = Workout(
-                name="Classic Leg Day", category="Legs",
-                description="Comprehensive lower body workout.", intensity="High", duration_est=60, equipment="Squat Rack, Leg Press, Dumbbells",
-                instructions="1. Barbell Squats (3x8-12)\n2. Romanian Deadlifts (3x10-12)\n3. Leg Press (3x10-15)\n4. Leg Extensions (3x12-15)\n5. Hamstring Curls (3x12-15)\n6. Calf Raises (4x15-20)",
-                reps_sets="See instructions", form_tips="Prioritize form, especially on squats and deadlifts. Control the weight.",
-                video_url="https://www.youtube.com/watch?v=Jpi-uQw84pA" # Standard URL
-            )
-            w_leg2 = Workout(
-                name="Bodyweight Leg Burner", category="Legs",
-                description="Lower body workout using only bodyweight.", intensity="Medium", duration_est=30, equipment="None",
-                instructions="Circuit: 45s work / 15s rest. Repeat 3-4 rounds.\n1. Squats\n2. Lunges (alternating)\n3. Glute Bridges\n4. Squat Jumps\n5. Calf Raises",
-                reps_sets="Circuit based", form_tips="Focus on depth in squats/lunges. Explode on jumps.",
-                video_url="https://www.youtube.com/watch?v=bOLzfEmk02k" # Standard URL
-            )
-
-            # Full Body Workouts
-            w_full1 = Workout(
-                name="Full Body Strength (3x Week)", category="Full Body",
-                description="Balanced workout targeting major muscle groups.", intensity="Medium", duration_est=45, equipment="Dumbbells, Barbell, Bench",
-                instructions="Perform 2-3 times per week with rest days.\n1. Squats (3x8-12)\n2. Bench Press (3x8-12)\n3. Barbell Rows (3x8-12)\n4. Overhead Press (3x10-15)\n5. Romanian Deadlifts (3x10-12)",
-                reps_sets="See instructions", form_tips="Focus on compound movements. Ensure adequate recovery.",
-                video_url="https://www.youtube.com/watch?v=U0bhE67HuDY" # Standard URL
-            )
-            w_full2 = Workout(
-                name="Bodyweight Full Body Circuit", category="Full Body",
-                description="Workout using only bodyweight exercises.", intensity="Medium", duration_est=30, equipment="None",
-                instructions="Circuit: 40s work / 20s rest. Repeat 3 rounds.\n1. Squats\n2. Push-ups\n3. Lunges\n4. Plank\n5. Glute Bridges\n6. Jumping Jacks",
-                reps_sets="Circuit based", form_tips="Maintain good form throughout. Modify exercises if needed.",
-                video_url="https://www.youtube.com/watch?v=gC_L9qAHVJ8" # Standard URL
-            )
-
-            # Cardio Workouts
-            w_cardio1 = Workout(
-                name="HIIT Cardio Blast", 
-                category="Cardio",
-                description="High-Intensity Interval Training.", 
-                intensity="High", 
-                duration_est=20, 
-                equipment="None",
-                instructions="Warm-up (3 min). Perform each exercise for 45 sec, rest 15 sec: Jumping Jacks, High Knees, Burpees, Mountain Climbers, Squat Jumps. Repeat circuit 3 times. Cool-down (3 min).",
-                reps_sets="3 rounds (45s work / 15s rest)", 
-                form_tips="Maintain high intensity during work periods. Modify as needed.",
-                video_url="https://www.youtube.com/watch?v=cZnsLVArIt8" # Standard URL
-            )
-            
-            w_cardio2 = Workout(
-                name="Steady State Cardio (Run/Cycle)", 
-                category="Cardio",
-                description="A moderate-intensity running workout that builds endurance and cardiovascular fitness over time.", 
-                intensity="Medium", 
-                duration_est=45, 
-                equipment="Running shoes, Optional: Treadmill or outdoor path",
-                instructions="1. Warm-up (5 min): Start with light jogging and dynamic stretches\n2. Main Session (30-35 min): Run at a steady, conversational pace (you should be able to talk but not sing)\n3. Cool down (5 min): Gradually slow to a walk\n4. Post-run stretches: Focus on calves, quads, hamstrings, and hip flexors\n\nBeginner Tip: Start with a run/walk pattern - 3 minutes running, 2 minutes walking.",
-                reps_sets="Continuous effort", 
-                form_tips="Keep your head up, shoulders relaxed. Land midfoot rather than heel-striking. Maintain a slight forward lean. Take shorter strides rather than overstriding. Swing arms at 90° angles without crossing the midline of your body.",
-                video_url="https://www.youtube.com/watch?v=5umbf4ps0GQ" # Running form video
-            )
-
-            # Yoga/Flexibility Workouts
-            w_yoga1 = Workout(
-                name="Morning Yoga Flow", 
-                category="Yoga/Flexibility",
-                description="Start your day with a gentle flow.", 
-                intensity="Low", 
-                duration_est=20, 
-                equipment="None (Yoga Mat optional)",
-                instructions="Follow the video for a guided flow including Child's Pose, Cat-Cow, Downward Dog, Sun Salutations, etc.",
-                reps_sets="Flow based", 
-                form_tips="Focus on breath. Move with intention.",
-                video_url="https://www.youtube.com/watch?v=v7AYKMP6rOE" # Standard URL
-            )
-
-            w_yoga2 = Workout(
-                name="Active Recovery / Stretching",
-                category="Yoga/Flexibility",
-                description="Low-intensity movement and targeted stretching to improve recovery, reduce soreness, and increase range of motion.",
-                intensity="Low",
-                duration_est=25,
-                equipment="Yoga mat, Optional: Foam roller",
-                instructions="1. Start with 5 minutes of gentle movement (walking, arm circles, etc.)\n2. Dynamic stretches (30 seconds each):\n   - Leg swings (forward/backward & side-to-side)\n   - Arm circles and shoulder rolls\n   - Torso rotations\n3. Static stretches (hold 30-60 seconds each):\n   - Standing hamstring stretch\n   - Quad stretch\n   - Chest opener\n   - Figure-4 hip stretch\n   - Child's pose\n   - Cat-cow stretch\n   - Downward dog\n4. Optional foam rolling for tight areas (1-2 minutes per muscle group)",
-                reps_sets="Hold each stretch for 30-60 seconds, breathing deeply",
-                form_tips="Never stretch to the point of pain. Focus on relaxed breathing. Stretches should feel like tension, not pain. For foam rolling, avoid rolling directly on joints or bones.",
-                video_url="https://www.youtube.com/watch?v=Ef6LwAaB3_E" # Standard URL
-            )
-
-            # Additional specialized workouts (Ensure these are defined correctly)
-            w_core = Workout(
-                name="Core Crusher",
-                category="Home", # Changed category to Home as per previous definition
-                description="A focused core workout targeting all areas of the abdominal muscles, obliques, and lower back for strength and stability.",
-                intensity="Medium",
-                duration_est=15,
-                equipment="Exercise mat, Optional: Light dumbbells",
-                instructions="Circuit format - perform each exercise for 45 seconds, rest 15 seconds between exercises, and complete 3 rounds:\n\n1. Plank (standard or on forearms)\n2. Russian Twists\n3. Bicycle Crunches\n4. Mountain Climbers\n5. Slow V-Ups\n6. Side Plank (30s each side)\n7. Dead Bugs\n8. Heel Taps\n\nRest 60 seconds between rounds. Focus on controlled movements rather than speed.",
-                reps_sets="45 seconds work / 15 seconds rest, 3 rounds",
-                form_tips="Engage your core before each movement. Breathe consistently throughout - exhale during exertion. Keep lower back pressed into the mat during floor exercises. Quality over quantity - proper form prevents injury.",
-                video_url="https://www.youtube.com/watch?v=7qA3WmqGAoo" # Standard URL
-            )
-
-            w_pilates = Workout( # Renamed from w12 to w_pilates for consistency
-                name="Pilates Mat",
-                category="Home", # Changed category to Home as per previous definition
-                description="A flowing sequence of precise movements focusing on core strength, spinal alignment, and whole-body coordination.",
-                intensity="Low",
-                duration_est=45,
-                equipment="Exercise mat",
-                instructions="1. Breathing Exercise (2 min): Focus on lateral thoracic breathing\n2. Warm-up (5 min): Gentle spinal articulation, shoulder rolls\n3. Main Sequence (30-35 min):\n   - The Hundred\n   - Roll Up\n   - Single Leg Circles\n   - Rolling Like a Ball\n   - Single Leg Stretch\n   - Double Leg Stretch\n   - Single Straight Leg Stretch\n   - Double Straight Leg Stretch\n   - Criss Cross\n   - Spine Stretch Forward\n   - Open Leg Rocker\n   - Corkscrew\n   - Saw\n4. Cool down (3 min): Child's pose, gentle twists",
-                reps_sets="8-10 repetitions of each exercise",
-                form_tips="Focus on precision rather than repetitions. Maintain the Pilates stance: navel drawn to spine, ribs connected, shoulders relaxed. Coordinate breathing with movement - typically inhale to prepare, exhale during exertion. Keep neck and shoulders relaxed.",
-                video_url="https://www.youtube.com/watch?v=9ATQ-5-1XrE" # Standard URL
-            )
-
-            # Add all workouts to the session
-            db.session.add_all([
-                w_push1, w_push2, w_pull1, w_pull2, w_leg1, w_leg2,
-                w_full1, w_full2, w_cardio1, w_cardio2, w_yoga1, w_yoga2,
-                w_core, w_pilates # Ensure w_core and w_pilates are included
-            ])
-
-            # Sample Meals (Remains the same)
-            m1 = Meal(name="Grilled Chicken Salad", description="A healthy and satisfying salad perfect for lunch.",
-                      meal_type="Lunch", diet_type="High-Protein, Low-Carb", calories_est=450,
-                      protein_est=40.0, carbs_est=15.0, fat_est=25.0, fiber_est=8.0, sugar_est=5.0)
-            m2 = Meal(name="Berry Oatmeal", description="A warm and filling start to the day.",
-                      meal_type="Breakfast", diet_type="Vegan Option", calories_est=350,
-                      protein_est=10.0, carbs_est=60.0, fat_est=8.0, fiber_est=10.0, sugar_est=15.0)
-            m3 = Meal(name="Salmon with Roasted Veggies", description="Nutrient-dense dinner.",
-                      meal_type="Dinner", diet_type="High-Protein", calories_est=550,
-                      protein_est=35.0, carbs_est=40.0, fat_est=28.0, fiber_est=12.0, sugar_est=8.0)
-            db.session.add_all([m1, m2, m3])
-
-            # Add an initial weight log for the admin user if weight is set
-            if admin_profile.weight:
-                 initial_weight_log = WeightLog(weight=admin_profile.weight, user_id=admin_user.id)
-                 db.session.add(initial_weight_log)
-
-            # Commit sample data
-            db.session.commit()
-            print("Database tables and sample data created.")
-    else:
-        print(f"Database file found at {db_path}.")
 
-    # Ensure you have run the 'flask init-db' command first. # Comment no longer accurate
+if __name__ == '__main__':
+    app = create_app()
     print("Starting Flask app...")
     port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=port, debug=True)
@@ -0,0 +1,345 @@
+"""
+Route-level performance benchmarks for SmartFit.
+
+    python benchmark.py run [--users 50] [--days 90] [--logs-per-day 4] [--requests 200]
+                            [--mode client|http|both] [--concurrency 8] [-o results.json]
+    python benchmark.py compare BASELINE.json RESULTS.json [--threshold 0.25]
+
+`run` seeds a throwaway SQLite database at the requested scale (users x days x meal logs
+per day, plus daily weight logs and regular workouts), then drives each route through the
+Flask test client and/or over HTTP against a local threaded server. Per route it reports
+p50/p95/p99 latency, throughput, SQL statements per request and the peak Python memory
+allocated while serving it. Everything runs offline.
+
+`compare` checks a results file against a baseline and exits with status 1 when a route's
+p95 latency grew by more than --threshold (and --min-ms) or it issues more SQL statements.
+"""
+import json
+import logging
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import tracemalloc
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta
+from http.cookiejar import CookieJar
+from time import perf_counter
+
+import click
+
+BENCH_PASSWORD = 'benchpass'
+BENCH_CLIENT_USERS = 20 # Distinct logged-in users the requests are spread over
+SEARCH_TERMS = ['apple', 'chiken', 'brocoli', 'rice', 'salmon', 'oat', 'egg', 'bread']
+SUGGEST_TERMS = ['pu', 'leg', 'cardio', 'yoga', 'full', 'core']
+MEAL_SUGGEST_TERMS = ['gr', 'sal', 'oat', 'berry', 'chicken']
+WORKOUT_NAMES = ['Classic Push Day', 'Classic Leg Day', 'HIIT Cardio Blast', 'Morning Yoga Flow', 'Core Crusher']
+WORKOUT_REPETITIONS = ['3x10', '5x5 @ 80kg', '3x8 @ 60kg', '100kg x 5, 110kg x 3', '30 min']
+
+def meal_form(rng):
+    return {'meal_name': rng.choice(['Toast', 'Chicken Salad', 'Oatmeal', 'Apple']), 'meal_type': 'Snack',
+            'calories': str(rng.randint(50, 800)), 'protein': str(rng.randint(0, 50)),
+            'carbs': str(rng.randint(0, 90)), 'fat': str(rng.randint(0, 40))}
+
+# name -> (method, path factory, form factory); factories take a random.Random
+ROUTES = {
+    'index': ('GET', lambda rng: '/', None),
+    'profile': ('GET', lambda rng: '/profile', None),
+    'meals': ('GET', lambda rng: '/meals', None),
+    'track_meal_ajax': ('POST', lambda rng: '/track/meal_ajax', meal_form),
+    'search_food': ('GET', lambda rng: '/search_food?q=' + rng.choice(SEARCH_TERMS), None),
+    'workout_suggest': ('GET', lambda rng: '/workouts/suggest?q=' + rng.choice(SUGGEST_TERMS), None),
+    'meal_suggest': ('GET', lambda rng: '/meals/suggest?q=' + rng.choice(MEAL_SUGGEST_TERMS), None),
+    'widget_weight_trend': ('GET', lambda rng: '/widgets/weight-trend', None),
+    'widget_todays_macros': ('GET', lambda rng: '/widgets/todays-macros', None),
+    'widget_nutrition_week': ('GET', lambda rng: '/widgets/nutrition-week', None),
+    'widget_workout_activity': ('GET', lambda rng: '/widgets/workout-activity', None),
+    'widget_calorie_goal': ('GET', lambda rng: '/widgets/calorie-goal', None),
+}
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(fraction * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+def summarize(latencies, wall_seconds, queries, errors):
+    latencies = sorted(latencies)
+    ms = [value * 1000 for value in latencies]
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': round(percentile(ms, 0.50), 3),
+        'p95_ms': round(percentile(ms, 0.95), 3),
+        'p99_ms': round(percentile(ms, 0.99), 3),
+        'mean_ms': round(sum(ms) / len(ms), 3) if ms else 0.0,
+        'throughput_rps': round(len(latencies) / wall_seconds, 1) if wall_seconds else 0.0,
+        'queries_per_request': round(queries / len(latencies), 2) if latencies else 0.0,
+    }
+
+# --- Database Setup ---
+
+def load_app(database_path):
+    """Imports the app module and builds an app on a fresh SQLite file (seeded with the sample catalog)."""
+    os.environ['DATABASE_URL'] = 'sqlite:///' + database_path
+    os.environ.setdefault('WRITE_BEHIND', 'off')
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app as smartfit
+    return smartfit, smartfit.create_app()
+
+def seed_benchmark_data(smartfit, users, days, logs_per_day, seed):
+    """Bulk-inserts `users` users with `days` days of meal, weight and workout history each."""
+    from werkzeug.security import generate_password_hash
+    db = smartfit.db
+    rng = random.Random(seed)
+    password_hash = generate_password_hash(BENCH_PASSWORD) # Hashing per user would dominate setup time
+    meal_names = [meal.name for meal in smartfit.get_catalog().meals] + [food['name'] for food in smartfit.FOOD_DATABASE]
+    first_day = date.today() - timedelta(days=days - 1)
+    user_rows = [{'username': f'bench{i}', 'email': f'bench{i}@example.com', 'password_hash': password_hash, 'role': 'user'}
+                 for i in range(users)]
+    db.session.execute(smartfit.User.__table__.insert(), user_rows)
+    user_ids = db.session.execute(db.select(smartfit.User.id).where(smartfit.User.username.like('bench%'))).scalars().all()
+    profiles, meals, workouts, weights = [], [], [], []
+    for user_id in user_ids:
+        weight = rng.uniform(55, 110)
+        profiles.append({'user_id': user_id, 'weight': round(weight, 1), 'height': rng.uniform(155, 195),
+                         'goal': 'Lose Weight', 'goal_weight': round(weight - 5, 1), 'fitness_level': 'Intermediate',
+                         'goal_calories': 2200, 'goal_protein': 140, 'goal_carbs': 220, 'goal_fat': 70})
+        for day_offset in range(days):
+            day_start = datetime.combine(first_day + timedelta(days=day_offset), time(7))
+            weight += rng.gauss(-0.02, 0.3)
+            weights.append({'user_id': user_id, 'weight': round(weight, 1), 'log_time': day_start})
+            for meal_number in range(logs_per_day):
+                meals.append({'user_id': user_id, 'meal_name': rng.choice(meal_names), 'meal_type': 'Snack',
+                              'calories': rng.randint(100, 900), 'protein': rng.uniform(0, 50), 'carbs': rng.uniform(0, 90),
+                              'fat': rng.uniform(0, 40), 'fiber': rng.uniform(0, 10), 'sugar': rng.uniform(0, 30), 'notes': None,
+                              'log_time': day_start + timedelta(hours=1 + meal_number * 12 / max(logs_per_day, 1))})
+            if rng.random() < 0.5:
+                workouts.append({'user_id': user_id, 'workout_name': rng.choice(WORKOUT_NAMES), 'intensity_level': 'Medium',
+                                 'repetitions': rng.choice(WORKOUT_REPETITIONS), 'notes': None,
+                                 'log_time': day_start + timedelta(hours=11)})
+    db.session.execute(smartfit.Profile.__table__.insert(), profiles)
+    # Through the app's own insert path, so the data matches what logging writes: workout ids, parsed
+    # sets and calorie estimates on workouts, daily rollups for meals. Weights go first (calories use them).
+    for kind, rows in (('weight', weights), ('meal', meals), ('workout', workouts)):
+        if rows:
+            smartfit.insert_log_rows(kind, rows)
+    db.session.commit()
+    return [f'bench{i}' for i in range(min(users, BENCH_CLIENT_USERS))], len(meals) + len(workouts) + len(weights)
+
+# --- Runners ---
+
+class QueryCounter:
+    """Counts SQL statements executed by the app's engine, per thread and in total."""
+
+    def __init__(self, engine):
+        self.local = threading.local()
+        self.total = 0
+        self.lock = threading.Lock()
+        from sqlalchemy import event
+        event.listen(engine, 'before_cursor_execute', self.on_execute)
+
+    def on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.local.count = getattr(self.local, 'count', 0) + 1
+        with self.lock:
+            self.total += 1
+
+    def thread_count(self):
+        return getattr(self.local, 'count', 0)
+
+def run_client_mode(smartfit, app, usernames, route_names, requests_per_route, seed):
+    """Drives each route through Flask test clients in this thread; queries are counted exactly."""
+    db = smartfit.db
+    with app.app_context():
+        counter = QueryCounter(db.engine)
+        user_ids = [db.session.execute(db.select(smartfit.User.id).filter_by(username=name)).scalar_one() for name in usernames]
+    clients = []
+    for user_id in user_ids:
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        clients.append(client)
+    rng = random.Random(seed)
+
+    def call(index):
+        method, path, form = ROUTES[name]
+        client = clients[index % len(clients)]
+        if method == 'POST':
+            return client.post(path(rng), data=form(rng))
+        return client.get(path(rng))
+
+    results = {}
+    for name in route_names:
+        for i in range(min(5, requests_per_route)): # Warm caches and lazily built indexes
+            call(i)
+        latencies, errors = [], 0
+        queries_before = counter.thread_count()
+        started = perf_counter()
+        for i in range(requests_per_route):
+            request_started = perf_counter()
+            response = call(i)
+            latencies.append(perf_counter() - request_started)
+            errors += response.status_code >= 400
+        wall = perf_counter() - started
+        summary = summarize(latencies, wall, counter.thread_count() - queries_before, errors)
+
+        # Measure memory in a separate pass so tracing doesn't distort the latencies
+        tracemalloc.start()
+        peak = 0
+        for i in range(min(20, requests_per_route)):
+            tracemalloc.reset_peak()
+            call(i)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        summary['peak_memory_kib'] = round(peak / 1024, 1)
+        results[name] = summary
+        print_route('client', name, summary)
+    return results
+
+def run_http_mode(smartfit, app, usernames, route_names, requests_per_route, concurrency, seed):
+    """Drives each route over HTTP against a threaded local server with `concurrency` clients."""
+    from werkzeug.serving import make_server
+    db = smartfit.db
+    with app.app_context():
+        counter = QueryCounter(db.engine)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR) # No per-request access log
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+    openers = []
+    for i in range(concurrency):
+        opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar()))
+        login = urllib.parse.urlencode({'username': usernames[i % len(usernames)], 'password': BENCH_PASSWORD}).encode()
+        opener.open(base_url + '/login', data=login).read()
+        openers.append(opener)
+    local = threading.local()
+    worker_ids = iter(range(concurrency))
+    worker_lock = threading.Lock()
+
+    def call(name, request_seed):
+        if not hasattr(local, 'opener'):
+            with worker_lock:
+                local.opener = openers[next(worker_ids)]
+        rng = random.Random(request_seed)
+        method, path, form = ROUTES[name]
+        data = urllib.parse.urlencode(form(rng)).encode() if method == 'POST' else None
+        request_started = perf_counter()
+        try:
+            with local.opener.open(base_url + path(rng), data=data) as response:
+                response.read()
+            error = False
+        except OSError:
+            error = True
+        return perf_counter() - request_started, error
+
+    results = {}
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for name in route_names:
+                list(pool.map(lambda i: call(name, seed + i), range(min(concurrency, requests_per_route))))
+                queries_before = counter.total
+                started = perf_counter()
+                outcomes = list(pool.map(lambda i: call(name, seed + i), range(requests_per_route)))
+                wall = perf_counter() - started
+                summary = summarize([latency for latency, _ in outcomes], wall, counter.total - queries_before,
+                                    sum(error for _, error in outcomes))
+                summary['concurrency'] = concurrency
+                results[name] = summary
+                print_route('http', name, summary)
+    finally:
+        server.shutdown()
+    return results
+
+def print_route(mode, name, summary):
+    memory = f"  peak {summary['peak_memory_kib']:>8} KiB" if 'peak_memory_kib' in summary else ''
+    print(f"{mode:<6} {name:<24} p50 {summary['p50_ms']:>8.2f}  p95 {summary['p95_ms']:>8.2f}  p99 {summary['p99_ms']:>8.2f} ms"
+          f"  {summary['throughput_rps']:>8.1f} req/s  {summary['queries_per_request']:>6.2f} q/req"
+          f"  {summary['errors']} err{memory}")
+
+# --- CLI ---
+
+@click.group()
+def cli():
+    """SmartFit route benchmarks."""
+
+@cli.command()
+@click.option('--users', default=50, show_default=True, help='Users to seed.')
+@click.option('--days', default=90, show_default=True, help='Days of history per user.')
+@click.option('--logs-per-day', default=4, show_default=True, help='Meal logs per user per day.')
+@click.option('--requests', 'requests_per_route', default=200, show_default=True, help='Timed requests per route.')
+@click.option('--mode', type=click.Choice(['client', 'http', 'both']), default='client', show_default=True)
+@click.option('--concurrency', default=8, show_default=True, help='Concurrent clients in http mode.')
+@click.option('--route', 'routes', multiple=True, type=click.Choice(list(ROUTES)), help='Only these routes (repeatable).')
+@click.option('--seed', default=1, show_default=True, help='Random seed for data and requests.')
+@click.option('-o', '--output', type=click.Path(dir_okay=False), help='Write JSON results here.')
+def run(users, days, logs_per_day, requests_per_route, mode, concurrency, routes, seed, output):
+    """Seed a throwaway database and benchmark each route."""
+    workdir = tempfile.mkdtemp(prefix='smartfit-bench-')
+    smartfit, app = load_app(os.path.join(workdir, 'bench.db'))
+    with app.app_context():
+        started = perf_counter()
+        usernames, log_rows = seed_benchmark_data(smartfit, users, days, logs_per_day, seed)
+        print(f'Seeded {users} users and {log_rows} log rows in {perf_counter() - started:.1f}s ({workdir})')
+    route_names = list(routes) or list(ROUTES)
+    results = {
+        'meta': {
+            'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+            'scale': {'users': users, 'days': days, 'logs_per_day': logs_per_day, 'log_rows': log_rows},
+            'requests_per_route': requests_per_route,
+            'seed': seed,
+            'python': platform.python_version(),
+            'sqlite': sqlite3.sqlite_version,
+            'platform': platform.platform(),
+        },
+    }
+    if mode in ('client', 'both'):
+        results['client'] = run_client_mode(smartfit, app, usernames, route_names, requests_per_route, seed)
+    if mode in ('http', 'both'):
+        results['http'] = run_http_mode(smartfit, app, usernames, route_names, requests_per_route, concurrency, seed)
+    smartfit.log_writer.stop()
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f'Results written to {output}')
+
+@cli.command()
+@click.argument('baseline', type=click.File('r'))
+@click.argument('current', type=click.File('r'))
+@click.option('--threshold', default=0.25, show_default=True, help='Allowed relative p95 increase.')
+@click.option('--min-ms', default=1.0, show_default=True, help='Ignore p95 increases smaller than this (noise).')
+def compare(baseline, current, threshold, min_ms):
+    """Compare RESULTS against BASELINE; exit 1 on regressions."""
+    baseline, current = json.load(baseline), json.load(current)
+    if baseline['meta']['scale'] != current['meta']['scale']:
+        click.echo(f"warning: different scales {baseline['meta']['scale']} vs {current['meta']['scale']}", err=True)
+    regressions = []
+    for mode in ('client', 'http'):
+        for name, now in sorted(current.get(mode, {}).items()):
+            before = baseline.get(mode, {}).get(name)
+            if before is None:
+                continue
+            change = (now['p95_ms'] - before['p95_ms']) / before['p95_ms'] if before['p95_ms'] else 0.0
+            flags = []
+            if change > threshold and now['p95_ms'] - before['p95_ms'] >= min_ms:
+                flags.append(f'p95 +{change:.0%}')
+            if now['queries_per_request'] > before['queries_per_request'] + 0.5:
+                flags.append(f"queries {before['queries_per_request']} -> {now['queries_per_request']}")
+            if now['errors'] > before['errors']:
+                flags.append(f"errors {before['errors']} -> {now['errors']}")
+            click.echo(f"{mode:<6} {name:<24} p95 {before['p95_ms']:>8.2f} -> {now['p95_ms']:>8.2f} ms ({change:+.0%})"
+                       + (f"  REGRESSION: {', '.join(flags)}" if flags else ''))
+            if flags:
+                regressions.append((mode, name))
+    if regressions:
+        raise click.ClickException(f'{len(regressions)} route(s) regressed.')
+    click.echo('No regressions.')
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,296 @@
+"""
+Synthetic population generator for load testing SmartFit.
+
+    python datagen.py --users 100000 --days 365 [--workers N] [--seed 42] [--end-date YYYY-MM-DD]
+
+Adds users with profiles and `days` days of meal, workout and weight history (plus the
+matching DailyNutrition rollups) to the database named by DATABASE_URL, like the app.
+Distributions are meant to look like real use:
+
+*   meals cluster around breakfast, lunch and dinner times, with occasional snacks and
+    skipped days, sized from each user's estimated calorie goal;
+*   weight drifts toward the user's goal_weight at a rate set by their adherence, with
+    day-to-day noise, and is logged on the user's weigh-in days only;
+*   workout frequency and intensity follow the user's fitness_level; calories burned are
+    estimated from the user's weight that day, as the app does when a workout is logged.
+    Per-set rows are not generated (log ids change when shards are merged); run
+    `flask backfill-workout-sets` afterwards to parse them.
+
+Users are generated in chunks by a process pool. Every user's data comes from its own
+RNG seeded from --seed and the user's position, so output does not depend on --workers.
+On SQLite each worker writes its chunk into a private shard file that is then merged with
+INSERT ... SELECT (SQLite allows a single writer); on PostgreSQL workers insert directly.
+All generated users share the password given by --password.
+"""
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+from datetime import date, timedelta
+from time import perf_counter
+
+import click
+from sqlalchemy import create_engine, func
+from sqlalchemy.schema import CreateTable
+from werkzeug.security import generate_password_hash
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import app as smartfit
+
+DEFAULT_CHUNK_USERS = 500
+FITNESS_LEVELS = (('Beginner', 0.45), ('Intermediate', 0.40), ('Advanced', 0.15))
+GOALS = (('Lose Weight', 0.5), ('Build Muscle', 0.25), ('Maintain Weight', 0.15), ('Improve Endurance', 0.10))
+WORKOUT_DAYS_PER_WEEK = {'Beginner': 2.0, 'Intermediate': 3.5, 'Advanced': 5.0}
+WORKOUT_INTENSITIES = {'Beginner': ('Low', 'Medium'), 'Intermediate': ('Medium', 'Medium', 'High'), 'Advanced': ('Medium', 'High', 'High')}
+REPETITIONS = ('3x8', '3x10', '3x12', '4x8', '5x5', '4x10 @ 40kg', '3x12 @ 20kg', '30 min', '45 min', '20 reps')
+# meal type -> (probability on a logged day, mean hour, hour std dev, share of daily calories)
+MEAL_PATTERN = {
+    'Breakfast': (0.80, 7.75, 0.75, 0.25),
+    'Lunch': (0.90, 12.75, 0.60, 0.35),
+    'Dinner': (0.95, 19.00, 0.90, 0.35),
+}
+SNACK_SHARE = 0.10
+WEIGHT_DRIFT_PER_DAY = 0.004 # Fraction of the gap to goal_weight closed per day at full adherence
+WEIGH_IN_DAYS_PER_WEEK = (1, 2, 3, 7)
+
+# Columns written per table, in the order generate_user builds its tuples
+TABLE_COLUMNS = {
+    'user': ('id', 'username', 'email', 'password_hash', 'role'),
+    'profile': ('user_id', 'weight', 'height', 'goal', 'goal_weight', 'fitness_level', 'dietary_preferences',
+                'goal_calories', 'goal_protein', 'goal_carbs', 'goal_fat'),
+    'meal_log': ('user_id', 'meal_name', 'meal_type', 'calories', 'protein', 'carbs', 'fat', 'fiber', 'sugar',
+                 'notes', 'log_time'),
+    'workout_log': ('user_id', 'workout_id', 'workout_name', 'intensity_level', 'repetitions', 'notes', 'log_time', 'calories_burned'),
+    'weight_log': ('user_id', 'weight', 'log_time'),
+    'daily_nutrition': ('user_id', 'day', 'calories', 'protein', 'carbs', 'fat', 'fiber', 'sugar', 'meal_count'),
+}
+
+def weighted_choice(rng, options):
+    threshold = rng.random()
+    for value, weight in options:
+        threshold -= weight
+        if threshold <= 0:
+            return value
+    return options[-1][0]
+
+def clock(day, hours):
+    """SQLite's DateTime storage format for a time `hours` after midnight on `day` ('YYYY-MM-DD')."""
+    seconds = min(max(int(hours * 3600), 0), 86399)
+    return f'{day} {seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}.000000'
+
+def generate_user(user_id, rng, context):
+    """Returns {table: [row tuples]} for one user and their whole history."""
+    level = weighted_choice(rng, FITNESS_LEVELS)
+    goal = weighted_choice(rng, GOALS)
+    height = round(min(max(rng.gauss(171, 9), 145), 205), 1)
+    weight = min(max(rng.gauss(26, 4), 17), 45) * (height / 100) ** 2
+    if goal == 'Lose Weight':
+        goal_weight = weight * rng.uniform(0.82, 0.95)
+    elif goal == 'Build Muscle':
+        goal_weight = weight * rng.uniform(1.02, 1.08)
+    else:
+        goal_weight = weight
+    goal_weight = round(goal_weight, 1)
+    goals = smartfit.estimate_nutrition_goals(weight, height, goal, level, goal_weight_kg=goal_weight) or {}
+    calorie_goal = goals.get('calories') or 2000
+    adherence = rng.betavariate(2, 2)
+    logging_rate = rng.uniform(0.5, 0.97) * (0.7 + 0.3 * adherence) # Share of days with any meals logged
+    weigh_in_rate = rng.choice(WEIGH_IN_DAYS_PER_WEEK) / 7
+    workout_rate = min(WORKOUT_DAYS_PER_WEEK[level] * rng.uniform(0.6, 1.2) * (0.6 + 0.4 * adherence) / 7, 1.0)
+    morning_person = rng.random() < 0.4
+    meals_by_type = context['meals_by_type']
+    workouts = context['workouts']
+    intensities = WORKOUT_INTENSITIES[level]
+
+    rows = {table: [] for table in TABLE_COLUMNS}
+    rows['user'].append((user_id, f'synth{user_id}', f'synth{user_id}@example.com', context['password_hash'], 'user'))
+    for day in context['days']:
+        if rng.random() < logging_rate:
+            totals = [0, 0.0, 0.0, 0.0, 0.0, 0.0, 0]
+            # Less adherent users overshoot their calorie goal more
+            day_calories = calorie_goal * rng.gauss(1.0 + 0.15 * (1 - adherence), 0.12)
+            meals = [(meal_type, rng.gauss(mean_hour, hour_sd), share)
+                     for meal_type, (probability, mean_hour, hour_sd, share) in MEAL_PATTERN.items()
+                     if rng.random() < probability]
+            meals.extend(('Snack', rng.uniform(10, 22), SNACK_SHARE) for _ in range(int(rng.random() * 2.4)))
+            for meal_type, hour, share in meals:
+                calories = max(int(day_calories * share * rng.lognormvariate(0, 0.2)), 10)
+                protein = round(calories * rng.uniform(0.15, 0.30) / 4, 1)
+                carbs = round(calories * rng.uniform(0.35, 0.55) / 4, 1)
+                fat = round(max(calories - protein * 4 - carbs * 4, 0) / 9, 1)
+                fiber = round(carbs * rng.uniform(0.05, 0.15), 1)
+                sugar = round(carbs * rng.uniform(0.1, 0.4), 1)
+                rows['meal_log'].append((user_id, rng.choice(meals_by_type[meal_type]), meal_type, calories,
+                                         protein, carbs, fat, fiber, sugar, None, clock(day, hour)))
+                for i, value in enumerate((calories, protein, carbs, fat, fiber, sugar, 1)):
+                    totals[i] += value
+            if meals:
+                rows['daily_nutrition'].append((user_id, day, totals[0], round(totals[1], 1), round(totals[2], 1),
+                                                round(totals[3], 1), round(totals[4], 1), round(totals[5], 1), totals[6]))
+
+        weight += (goal_weight - weight) * WEIGHT_DRIFT_PER_DAY * adherence + rng.gauss(0, 0.05)
+        if rng.random() < weigh_in_rate:
+            rows['weight_log'].append((user_id, round(weight + rng.gauss(0, 0.4), 1), clock(day, rng.gauss(7, 0.5))))
+
+        if rng.random() < workout_rate:
+            hour = rng.gauss(6.75, 0.6) if morning_person else rng.gauss(18.25, 1.0)
+            (workout_id, workout), intensity = rng.choice(workouts), rng.choice(intensities)
+            rows['workout_log'].append((user_id, workout_id, workout, intensity, rng.choice(REPETITIONS), None,
+                                        clock(day, hour), round(context['burn_factors'][workout, intensity] * weight)))
+
+    rows['profile'].append((user_id, round(weight, 1), height, goal, goal_weight, level, None, calorie_goal,
+                            goals.get('protein'), goals.get('carbs'), goals.get('fat')))
+    return rows
+
+# --- Workers ---
+
+_context = None
+
+def init_worker(context):
+    global _context
+    _context = context
+
+def generate_chunk(chunk):
+    """Generates one chunk of users and writes it; returns (shard path or None, row counts)."""
+    chunk_number, first_index, user_count = chunk
+    context = _context
+    rows = {table: [] for table in TABLE_COLUMNS}
+    for index in range(first_index, first_index + user_count):
+        rng = random.Random(context['seed'] * 1_000_003 + index)
+        for table, table_rows in generate_user(context['first_user_id'] + index, rng, context).items():
+            rows[table].extend(table_rows)
+    counts = {table: len(table_rows) for table, table_rows in rows.items()}
+    if context['shard_dir'] is None:
+        write_rows_to_database(context['database_url'], rows)
+        return None, counts
+    path = os.path.join(context['shard_dir'], f'shard-{chunk_number}.db')
+    write_shard(path, context['shard_ddl'], rows)
+    return path, counts
+
+def write_shard(path, ddl, rows):
+    """Writes rows into a private SQLite file with the app's table layout (no indexes)."""
+    connection = sqlite3.connect(path)
+    connection.execute('PRAGMA journal_mode = OFF')
+    connection.execute('PRAGMA synchronous = OFF')
+    for statement in ddl:
+        connection.execute(statement)
+    for table, table_rows in rows.items():
+        columns = TABLE_COLUMNS[table]
+        connection.executemany(f'INSERT INTO "{table}" ({", ".join(columns)}) VALUES ({", ".join("?" * len(columns))})',
+                               table_rows)
+    connection.commit()
+    connection.close()
+
+def write_rows_to_database(database_url, rows):
+    """Inserts one chunk straight into the target database (server backends take concurrent writers)."""
+    engine = create_engine(database_url)
+    with engine.begin() as connection:
+        for table, table_rows in rows.items():
+            if table_rows:
+                columns = TABLE_COLUMNS[table]
+                connection.execute(smartfit.db.metadata.tables[table].insert(),
+                                   [dict(zip(columns, row)) for row in table_rows])
+    engine.dispose()
+
+def merge_shard(connection, path):
+    """Copies a shard into the live SQLite database in one transaction (log ids are reassigned)."""
+    connection.execute('ATTACH DATABASE ? AS shard', (path,))
+    try:
+        connection.execute('BEGIN IMMEDIATE')
+        for table, columns in TABLE_COLUMNS.items():
+            column_list = ', '.join(columns)
+            connection.execute(f'INSERT INTO main."{table}" ({column_list}) SELECT {column_list} FROM shard."{table}"')
+        connection.execute('COMMIT')
+    except Exception:
+        if connection.in_transaction:
+            connection.execute('ROLLBACK')
+        raise
+    finally:
+        connection.execute('DETACH DATABASE shard')
+    os.remove(path)
+
+# --- Driver ---
+
+def generate_population(users, days, seed, workers=None, end_date=None, password='password',
+                        chunk_users=DEFAULT_CHUNK_USERS, progress=None):
+    """Generates `users` users with `days` days of history each. Must run inside an app context."""
+    db = smartfit.db
+    end_date = end_date or date.today()
+    catalog = smartfit.get_catalog()
+    meals_by_type = {meal_type: [meal.name for meal in catalog.meals if meal.meal_type == meal_type]
+                     for meal_type in (*MEAL_PATTERN, 'Snack')}
+    snack_foods = [food['name'] for food in smartfit.FOOD_DATABASE]
+    for meal_type, names in meals_by_type.items():
+        names.extend(snack_foods if meal_type == 'Snack' or not names else ())
+    # (id, name) pairs, with the id the app links each name to (the oldest workout with that name)
+    workouts = [(workout.id, name) for name, workout in sorted(catalog.workouts_by_name.items())] or [(None, 'General Workout')]
+    is_sqlite = db.engine.dialect.name == 'sqlite'
+    context = {
+        'seed': seed,
+        'first_user_id': (db.session.query(func.max(smartfit.User.id)).scalar() or 0) + 1,
+        'days': [(end_date - timedelta(days=offset)).isoformat() for offset in range(days - 1, -1, -1)],
+        'meals_by_type': meals_by_type,
+        'workouts': workouts,
+        'burn_factors': {(name, intensity): smartfit.calories_per_kg(catalog.workouts_by_id.get(workout_id), intensity)
+                         for workout_id, name in workouts for intensity in ('Low', 'Medium', 'High')}, # kcal per kg of body weight
+        'password_hash': generate_password_hash(password), # One hash for everyone; hashing per user would dominate
+        'database_url': db.engine.url.render_as_string(hide_password=False),
+        'shard_dir': tempfile.mkdtemp(prefix='smartfit-datagen-') if is_sqlite else None,
+        'shard_ddl': [str(CreateTable(db.metadata.tables[table]).compile(dialect=db.engine.dialect))
+                      for table in TABLE_COLUMNS],
+    }
+    db.session.commit() # Don't hold a read transaction open while merging
+    chunks = [(number, start, min(chunk_users, users - start))
+              for number, start in enumerate(range(0, users, chunk_users))]
+    totals = dict.fromkeys(TABLE_COLUMNS, 0)
+    raw = db.engine.raw_connection() if is_sqlite else None
+    try:
+        if raw is not None:
+            raw.driver_connection.isolation_level = None # merge_shard manages its own transactions
+        with multiprocessing.Pool(workers, initializer=init_worker, initargs=(context,)) as pool:
+            for done, (path, counts) in enumerate(pool.imap_unordered(generate_chunk, chunks), start=1):
+                if path is not None:
+                    merge_shard(raw.driver_connection, path)
+                for table, count in counts.items():
+                    totals[table] += count
+                if progress:
+                    progress(done, len(chunks), totals)
+    finally:
+        if raw is not None:
+            raw.close()
+        if context['shard_dir']:
+            shutil.rmtree(context['shard_dir'], ignore_errors=True)
+    return totals
+
+@click.command()
+@click.option('--users', default=1000, show_default=True, help='Users to add.')
+@click.option('--days', default=365, show_default=True, help='Days of history per user.')
+@click.option('--seed', default=42, show_default=True, help='Random seed; the same seed gives the same data.')
+@click.option('--workers', type=int, default=None, help='Generator processes (default: number of CPUs).')
+@click.option('--end-date', type=click.DateTime(formats=['%Y-%m-%d']), default=None, help='Last day of history (default: today).')
+@click.option('--chunk-users', default=DEFAULT_CHUNK_USERS, show_default=True, help='Users per work unit.')
+@click.option('--password', default='password', show_default=True, help='Password for every generated user.')
+def main(users, days, seed, workers, end_date, chunk_users, password):
+    """Add a synthetic user population with realistic history to the database."""
+    app = smartfit.create_app({'PRELOAD_CATALOG': False})
+    started = perf_counter()
+
+    def progress(done, total, totals):
+        rows = sum(totals.values())
+        print(f'{done}/{total} chunks, {rows:,} rows ({rows / (perf_counter() - started):,.0f} rows/s)', end='\r')
+
+    with app.app_context():
+        totals = generate_population(users, days, seed, workers=workers,
+                                     end_date=end_date.date() if end_date else None, password=password,
+                                     chunk_users=chunk_users, progress=progress)
+    elapsed = perf_counter() - started
+    rows = sum(totals.values())
+    print(f'\nAdded {totals["user"]:,} users, {totals["meal_log"]:,} meals, {totals["workout_log"]:,} workouts, '
+          f'{totals["weight_log"]:,} weights and {totals["daily_nutrition"]:,} daily rollups '
+          f'({rows:,} rows) in {elapsed:.1f}s ({rows / elapsed:,.0f} rows/s).')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+# Pre-fork production serving: gunicorn -c gunicorn.conf.py
+# The master imports wsgi.py once (preload), which creates/upgrades the database and builds the
+# in-memory catalogs; workers are then forked and share that memory copy-on-write. Each worker
+# drops the inherited connection pool and opens its own connections (see create_app in app.py).
+import gc
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+wsgi_app = 'wsgi:app'
+bind = os.environ.get('BIND', f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0)) # Recycle workers after N requests (0 = never)
+max_requests_jitter = max_requests // 10
+timeout = 30
+graceful_timeout = 30 # Lets workers drain the write-behind queue on shutdown
+accesslog = '-'
+
+# Workers publish their metrics here and /metrics adds them up (see Prometheus Metrics in app.py)
+_own_metrics_dir = 'METRICS_DIR' not in os.environ
+if _own_metrics_dir:
+    os.environ['METRICS_DIR'] = tempfile.mkdtemp(prefix='smartfit-metrics-')
+
+def when_ready(server):
+    # Objects created during preload are never collected in the workers, so keep the
+    # collector from touching (and un-sharing) their memory pages
+    gc.freeze()
+
+def on_starting(server):
+    # Counters start from zero with the server, so drop files left over from a previous run
+    directory = os.environ['METRICS_DIR']
+    for name in os.listdir(directory):
+        if name.endswith('.json'):
+            os.remove(os.path.join(directory, name))
+
+def child_exit(server, worker):
+    # Keep an exited worker's request counts in the totals, but not its gauges
+    from app import metrics
+    metrics.retire_worker(worker.pid)
+
+def on_exit(server):
+    if _own_metrics_dir:
+        shutil.rmtree(os.environ['METRICS_DIR'], ignore_errors=True)
@@ -0,0 +1,70 @@
+"""
+Shared fixtures. Every database test runs against a throwaway SQLite file and, when
+DATABASE_URL names a PostgreSQL database, against that database too (its tables are
+dropped before and after each test, so point it at a scratch database).
+"""
+import os
+
+import pytest
+
+POSTGRES_URL = os.environ.get('DATABASE_URL') if os.environ.get('DATABASE_URL', '').startswith('postgres') else None
+os.environ['WRITE_BEHIND'] = 'off'
+os.environ['PASSWORD_HASH_WORKERS'] = '0' # Hash in the calling thread
+os.environ.setdefault('MIGRATE_ON_START', 'all')
+
+import app as smartfit
+
+def reset_process_caches():
+    """Forgets the per-process read models; their versions start over in every test database."""
+    for callback in smartfit.catalog_change_callbacks:
+        callback({model.__name__ for model in smartfit.CATALOG_MODELS})
+    smartfit._catalog.update(snapshot=None, checked_at=float('-inf'))
+    smartfit._food_dataset.update(version=None, checked_at=0.0, vocabulary=None)
+    smartfit.user_cache.clear()
+    smartfit.dashboard_cache.clear()
+
+@pytest.fixture(params=['sqlite', 'postgresql'])
+def backend(request, tmp_path):
+    """An app context for an app on an empty database on each backend; yields the backend name."""
+    if request.param == 'sqlite':
+        url = f'sqlite:///{tmp_path / "smartfit.db"}'
+    elif POSTGRES_URL:
+        url = 'postgresql://' + POSTGRES_URL.split('://', 1)[1]
+    else:
+        pytest.skip('DATABASE_URL does not name a PostgreSQL database')
+    test_app = smartfit.create_app({'SQLALCHEMY_DATABASE_URI': url, 'TESTING': True, 'INIT_DATABASE': False})
+    reset_process_caches()
+    with test_app.app_context():
+        if request.param == 'postgresql':
+            smartfit.db.drop_all()
+        try:
+            yield request.param
+        finally:
+            smartfit.db.session.remove()
+            if request.param == 'postgresql':
+                smartfit.db.drop_all()
+            smartfit.db.engine.dispose()
+    reset_process_caches()
+
+@pytest.fixture
+def seeded(backend):
+    """A database created and seeded the way the app does on first run."""
+    smartfit.init_database()
+    return backend
+
+@pytest.fixture(scope='session')
+def web_app(tmp_path_factory):
+    """The real app, routes included, on its own SQLite database (created and seeded once per run)."""
+    url = f"sqlite:///{tmp_path_factory.mktemp('web') / 'smartfit.db'}"
+    return smartfit.create_app({'SQLALCHEMY_DATABASE_URI': url, 'TESTING': True, 'PRELOAD_CATALOG': False})
+
+@pytest.fixture
+def client(web_app):
+    reset_process_caches()
+    with web_app.test_client() as client:
+        yield client
+    reset_process_caches()
+
+def login(client, username='admin', password='adminpass'):
+    response = client.post('/login', data={'username': username, 'password': password})
+    assert response.status_code == 302, 'login failed'
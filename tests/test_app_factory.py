@@ -0,0 +1,53 @@
+"""create_app(): independent apps, and leaving the database alone for the flask maintenance commands."""
+from click.testing import CliRunner
+from flask.cli import FlaskGroup
+from sqlalchemy import create_engine, inspect
+
+import app as smartfit
+from app import db, User
+from conftest import reset_process_caches
+
+def tables(url):
+    engine = create_engine(url)
+    try:
+        return set(inspect(engine).get_table_names())
+    finally:
+        engine.dispose()
+
+def test_each_call_builds_a_separate_app(tmp_path):
+    first, second = (smartfit.create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / name}', 'TESTING': True,
+                                          'PRELOAD_CATALOG': False}) for name in ('first.db', 'second.db'))
+    reset_process_caches()
+    assert first is not second
+    with first.app_context():
+        db.session.add(User(username='only-in-first', email='first@example.com'))
+        db.session.commit()
+    with second.app_context():
+        assert User.query.filter_by(username='only-in-first').first() is None
+    for app in (first, second):
+        assert app.test_client().get('/login').status_code == 200
+
+def test_database_is_left_alone_without_init(tmp_path):
+    url = f'sqlite:///{tmp_path / "untouched.db"}'
+    smartfit.create_app({'SQLALCHEMY_DATABASE_URI': url, 'INIT_DATABASE': False})
+    assert tables(url) == set()
+
+def test_flask_commands_only_change_the_database_when_asked(tmp_path):
+    url = f'sqlite:///{tmp_path / "cli.db"}'
+    loaded = []
+    cli = FlaskGroup(create_app=lambda: loaded.append(smartfit.create_app({'SQLALCHEMY_DATABASE_URI': url})) or loaded[-1],
+                     load_dotenv=False)
+    runner = CliRunner()
+
+    result = runner.invoke(cli, ['migration-status'])
+    assert result.exit_code == 0, result.output
+    assert not loaded[-1].config['INIT_DATABASE']
+    assert 'pending' in result.output and 'applied' not in result.output
+    assert tables(url) == set() # Inspecting the status wrote nothing
+
+    result = runner.invoke(cli, ['migrate'])
+    assert result.exit_code == 0, result.output
+    assert 'Created a new database' in result.output
+    result = runner.invoke(cli, ['migration-status'])
+    assert 'pending' not in result.output
+    reset_process_caches()
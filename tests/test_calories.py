@@ -0,0 +1,53 @@
+"""Calorie burn estimates and their backfill."""
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as smartfit
+from app import db, User, WeightLog, WorkoutLog
+
+@pytest.mark.parametrize('text, band', [
+    ('High', 'High'), ('moderate', 'Medium'), ('light jog', 'Low'), ('7/10', 'High'), ('5 / 10', 'Medium'),
+    ('RPE 3/10, easy', 'Low'), ('', None), (None, None), ('whatever', None),
+])
+def test_intensity_band(text, band):
+    assert smartfit.intensity_band(text) == band
+
+def record(category='Cardio', intensity='Medium', duration_est=40):
+    return smartfit.WorkoutRecord((1, 'Rowing', category, intensity, duration_est, None, None, None))
+
+def test_calories_per_kg():
+    assert smartfit.calories_per_kg(record(), 'High') == pytest.approx(10.0 * 40 / 60) # Logged intensity wins
+    assert smartfit.calories_per_kg(record(), None) == pytest.approx(7.0 * 40 / 60) # Else the catalog's
+    assert smartfit.calories_per_kg(record(intensity=None), None) == pytest.approx(7.0 * 40 / 60) # Else Medium
+    assert smartfit.calories_per_kg(record(category='Unknown', duration_est=None), 'low') == pytest.approx(3.0 * 30 / 60)
+    assert smartfit.calories_per_kg(None, '8/10') == pytest.approx(6.0 * 30 / 60) # Not a catalog workout
+
+def test_backfill_fills_missing_estimates(seeded):
+    workout = next(w for w in smartfit.get_catalog().workouts if w.category in smartfit.MET_VALUES and w.duration_est)
+    user = User(username='burner', email='burner@example.com')
+    db.session.add(user)
+    db.session.flush()
+    start = datetime(2024, 1, 10)
+    db.session.add_all([WeightLog(user_id=user.id, weight=80, log_time=start),
+                        WeightLog(user_id=user.id, weight=90, log_time=start + timedelta(days=10))])
+    logs = [WorkoutLog(user_id=user.id, workout_id=workout.id, workout_name=workout.name, intensity_level='High',
+                       log_time=start - timedelta(days=1)), # Before the first weigh-in: uses it
+            WorkoutLog(user_id=user.id, workout_id=workout.id, workout_name=workout.name, intensity_level='High',
+                       log_time=start + timedelta(days=12)),
+            WorkoutLog(user_id=user.id, workout_name='Trail run', intensity_level='8/10', log_time=start),
+            WorkoutLog(user_id=user.id, workout_name='Trail run', log_time=start, calories_burned=123)]
+    db.session.add_all(logs)
+    db.session.commit()
+    ids = [log.id for log in logs]
+
+    reported = []
+    assert smartfit.backfill_calories_burned(chunk_size=2, pause=0, progress=lambda done, total: reported.append((done, total))) == 3
+    assert reported == [(2, 3), (3, 3)]
+    per_kg = smartfit.MET_VALUES[workout.category]['High'] * workout.duration_est / 60
+    burned = lambda: [db.session.get(WorkoutLog, log_id).calories_burned for log_id in ids]
+    assert burned() == [round(per_kg * 80), round(per_kg * 90), round(6.0 * 30 / 60 * 80), 123]
+
+    assert smartfit.backfill_calories_burned(pause=0) == 0 # Nothing left
+    assert smartfit.backfill_calories_burned(pause=0, recompute=True) == 4
+    assert burned()[3] == round(4.5 * 30 / 60 * 80)
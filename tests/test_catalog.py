@@ -0,0 +1,28 @@
+"""Catalog change tracking: only real catalog edits invalidate the in-memory read models."""
+import app as smartfit
+from app import db, User, Workout
+
+def test_saving_a_workout_keeps_catalog_version(seeded):
+    user = db.session.query(User).filter_by(username='admin').one()
+    workout = db.session.query(Workout).order_by(Workout.id).first()
+    version = smartfit.read_catalog_version()
+    snapshot = smartfit.get_catalog()
+    smartfit.cached_suggestions('workout', 'pu')
+    assert len(smartfit.suggest_cache) == 1
+
+    user.saved_workouts.append(workout)
+    db.session.commit()
+    user.saved_workouts.remove(workout)
+    db.session.commit()
+
+    assert smartfit.read_catalog_version() == version
+    assert smartfit.get_catalog() is snapshot
+    assert len(smartfit.suggest_cache) == 1
+
+def test_editing_a_workout_bumps_catalog_version(seeded):
+    workout = db.session.query(Workout).order_by(Workout.id).first()
+    version = smartfit.read_catalog_version()
+    workout.name = 'Renamed Workout'
+    db.session.commit()
+    assert smartfit.read_catalog_version() == version + 1
+    assert 'Renamed Workout' in smartfit.get_catalog().workouts_by_name
@@ -0,0 +1,41 @@
+"""The cached current_user snapshot when another process changes or deletes the user."""
+import app as smartfit
+from conftest import login
+
+def create_user(app, username, goal_calories=2000):
+    with app.app_context():
+        user = smartfit.User(username=username, email=f'{username}@example.com')
+        user.set_password('secret')
+        user.profile = smartfit.Profile(goal_calories=goal_calories)
+        smartfit.db.session.add(user)
+        smartfit.db.session.commit()
+        return user.id
+
+def change_elsewhere(app, user_id, change):
+    """Applies `change` and commits, then puts back the snapshot this process had cached,
+    as if the commit had happened in another worker."""
+    with app.app_context():
+        stale = smartfit.get_user_snapshot(user_id)
+        change(smartfit.db.session.get(smartfit.User, user_id))
+        smartfit.db.session.commit()
+        smartfit.user_cache.put(user_id, (float('inf'), stale))
+
+def test_calorie_goal_widget_follows_the_database(client):
+    user_id = create_user(client.application, 'goal-user')
+    login(client, 'goal-user', 'secret')
+    assert client.get('/widgets/calorie-goal').get_json()['goal'] == 2000
+
+    change_elsewhere(client.application, user_id, lambda user: setattr(user.profile, 'goal_calories', 2500))
+    assert smartfit.user_cache.get(user_id)[1].profile.goal_calories == 2000
+    assert client.get('/widgets/calorie-goal').get_json()['goal'] == 2500
+
+def test_user_deleted_elsewhere_is_logged_out(client):
+    user_id = create_user(client.application, 'deleted-user')
+    login(client, 'deleted-user', 'secret')
+    assert client.get('/my_workouts').status_code == 200
+
+    change_elsewhere(client.application, user_id, smartfit.db.session.delete)
+    response = client.get('/my_workouts') # Needs the User row, not just the snapshot
+    assert response.status_code == 302 and '/login' in response.location
+    assert smartfit.user_cache.get(user_id) is None
+    assert client.get('/widgets/calorie-goal').status_code == 302 # The session no longer names the user
@@ -0,0 +1,48 @@
+"""The per-user DailyNutrition rollup maintained at write time."""
+from datetime import date, datetime
+
+from app import db, DailyNutrition, User
+import app as smartfit
+
+def totals(calories, protein=0.0):
+    return {'calories': calories, 'protein': protein, 'carbs': 1.5, 'fat': 0.0, 'fiber': 0.0, 'sugar': 0.0}
+
+def rollup(user_id, day):
+    db.session.expire_all()
+    row = db.session.get(DailyNutrition, (user_id, day))
+    return row and (row.calories, row.protein, row.carbs, row.meal_count)
+
+def test_upsert_creates_then_increments(backend):
+    db.create_all()
+    user = User(username='eater', email='eater@example.com')
+    db.session.add(user)
+    db.session.commit()
+    day = date(2024, 5, 1)
+
+    smartfit.add_to_daily_nutrition(user.id, day, totals(500, 30.0)) # No row yet
+    db.session.commit()
+    assert rollup(user.id, day) == (500, 30.0, 1.5, 1)
+
+    smartfit.add_to_daily_nutrition(user.id, day, totals(250, 10.5), meal_count=2) # Existing row
+    db.session.commit()
+    assert rollup(user.id, day) == (750, 40.5, 3.0, 3)
+    assert rollup(user.id, date(2024, 5, 2)) is None
+
+def test_logged_meals_match_a_rebuild(backend):
+    db.create_all()
+    user = User(username='logger', email='logger@example.com')
+    db.session.add(user)
+    db.session.commit()
+    meals = [{'user_id': user.id, 'meal_name': name, 'meal_type': 'Snack', 'calories': calories, 'protein': 5.0,
+              'carbs': None, 'fat': 1.0, 'fiber': None, 'sugar': None, 'notes': None, 'log_time': log_time}
+             for name, calories, log_time in (('Oats', 300, datetime(2024, 5, 1, 7)), ('Apple', 80, datetime(2024, 5, 1, 23, 59, 59)),
+                                              ('Toast', 200, datetime(2024, 5, 2, 0, 0)))]
+    for meal in meals: # One at a time, like the log routes
+        smartfit.insert_log_rows('meal', [meal])
+        db.session.commit()
+    written = {day: rollup(user.id, day) for day in (date(2024, 5, 1), date(2024, 5, 2))}
+    assert written == {date(2024, 5, 1): (380, 10.0, 0.0, 2), date(2024, 5, 2): (200, 5.0, 0.0, 1)}
+
+    smartfit.rebuild_daily_nutrition([user.id])
+    db.session.commit()
+    assert {day: rollup(user.id, day) for day in written} == written
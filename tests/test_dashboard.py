@@ -0,0 +1,88 @@
+"""The single-statement dashboard summary and its per-process cache."""
+from datetime import date, datetime, time, timedelta
+
+import pytest
+
+import app as smartfit
+from app import db, DailyNutrition, MealLog, Profile, User, WorkoutLog
+
+def at(day_offset, hour, minute=0):
+    return datetime.combine(date.today() + timedelta(days=day_offset), time(hour, minute))
+
+@pytest.fixture
+def user_id(seeded):
+    user = User(username='dasher', email='dasher@example.com')
+    user.profile = Profile(weight=81.5, goal_weight=75, goal_calories=2100, goal_protein=150, goal_carbs=200, goal_fat=60)
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+def meal(user_id, name, calories, log_time):
+    return {'user_id': user_id, 'meal_name': name, 'meal_type': 'Snack', 'calories': calories, 'protein': 10.0,
+            'carbs': 20.0, 'fat': 5.0, 'fiber': 1.0, 'sugar': 2.0, 'notes': None, 'log_time': log_time}
+
+def workout(user_id, name, log_time):
+    return {'user_id': user_id, 'workout_name': name, 'intensity_level': 'High', 'repetitions': '3x10',
+            'notes': None, 'log_time': log_time}
+
+def per_field_values(user_id):
+    """What the dashboard read with separate queries before the summary statement."""
+    today = date.today()
+    start, end = smartfit.day_range(today)
+    rollup = db.session.get(DailyNutrition, (user_id, today))
+    profile = Profile.query.filter_by(user_id=user_id).first()
+    return {
+        'recent_meal': MealLog.query.filter_by(user_id=user_id).order_by(MealLog.log_time.desc(), MealLog.id.desc()).first(),
+        'recent_workout': WorkoutLog.query.filter_by(user_id=user_id).order_by(WorkoutLog.log_time.desc(), WorkoutLog.id.desc()).first(),
+        'totals': {field: (getattr(rollup, field) if rollup else 0) for field in smartfit.NUTRIENT_FIELDS},
+        'profile': {column: getattr(profile, column) if profile else None for column in smartfit.DASHBOARD_PROFILE_COLUMNS},
+        'calories_burned': sum(log.calories_burned or 0 for log in WorkoutLog.query.filter(
+            WorkoutLog.user_id == user_id, WorkoutLog.log_time >= start, WorkoutLog.log_time < end)),
+    }
+
+def assert_matches(summary, expected):
+    for kind, columns in (('recent_meal', smartfit.DASHBOARD_MEAL_COLUMNS), ('recent_workout', smartfit.DASHBOARD_WORKOUT_COLUMNS)):
+        log = expected[kind]
+        if log is None:
+            assert getattr(summary, kind) is None
+        else:
+            assert {c: getattr(getattr(summary, kind), c) for c in columns} == {c: getattr(log, c) for c in columns}
+    assert summary.totals == pytest.approx(expected['totals'])
+    assert {column: getattr(summary, column) for column in smartfit.DASHBOARD_PROFILE_COLUMNS} == expected['profile']
+    assert summary.calories_burned == expected['calories_burned']
+
+def test_summary_matches_the_per_field_queries(user_id):
+    assert_matches(smartfit.get_dashboard_summary(user_id), per_field_values(user_id)) # Nothing logged yet
+
+    smartfit.insert_log_rows('meal', [meal(user_id, 'Oats', 350, at(0, 7)), meal(user_id, 'Late snack', 200, at(-1, 23, 59)),
+                                      meal(user_id, 'Lunch', 650, at(0, 12)), meal(user_id, 'Old dinner', 900, at(-3, 19))])
+    smartfit.insert_log_rows('workout', [workout(user_id, 'Running', at(0, 6)), workout(user_id, 'Cycling', at(0, 18)),
+                                         workout(user_id, 'Rowing', at(-1, 18))])
+    db.session.commit()
+    summary = smartfit.get_dashboard_summary(user_id)
+    expected = per_field_values(user_id)
+    assert_matches(summary, expected)
+    assert summary.recent_meal.meal_name == 'Lunch' and summary.recent_workout.workout_name == 'Cycling'
+    assert summary.totals['calories'] == 1000 and summary.calories_burned > 0
+    assert summary.today()['net_calories'] == 1000 - summary.calories_burned
+
+def test_summary_without_profile_or_logs(seeded):
+    user = User(username='blank', email='blank@example.com')
+    db.session.add(user)
+    db.session.commit()
+    assert_matches(smartfit.get_dashboard_summary(user.id), per_field_values(user.id))
+
+def test_logging_invalidates_the_cached_summary(user_id):
+    summary = smartfit.get_dashboard_summary(user_id)
+    assert smartfit.get_dashboard_summary(user_id) is summary # Cached while nothing changes
+
+    for kind, values in (('meal', {'meal_name': 'Apple', 'calories': 95}),
+                         ('workout', {'workout_name': 'Running', 'intensity_level': 'Medium'}),
+                         ('weight', {'weight': 80.9})):
+        assert smartfit.save_log(kind, user_id, **values) # Committed (write-behind is off in the tests)
+        fresh = smartfit.get_dashboard_summary(user_id)
+        assert fresh is not summary and fresh.version > summary.version, kind
+        assert smartfit.get_dashboard_summary(user_id) is fresh
+        summary = fresh
+    assert summary.recent_meal.meal_name == 'Apple' and summary.totals['calories'] == 95
+    assert summary.recent_workout.workout_name == 'Running'
@@ -0,0 +1,55 @@
+"""Backend portability: first-run detection, column widths and the SQLite-only food database."""
+import csv
+
+import pytest
+
+import app as smartfit
+from app import db, User
+
+def test_first_run_creates_and_seeds_once(backend):
+    assert smartfit.init_database() is True
+    users = db.session.query(User).count()
+    assert users > 0
+    assert smartfit.init_database() is False # Tables exist: not seeded again
+    assert db.session.query(User).count() == users
+    assert smartfit.pending_migrations() == []
+
+def test_password_hash_fits_column(backend):
+    db.create_all()
+    user = User(username='width', email='width@example.com')
+    user.set_password('correct horse battery staple')
+    db.session.add(user)
+    db.session.commit() # PostgreSQL rejects a value longer than the column
+    db.session.expire_all()
+    user = db.session.query(User).filter_by(username='width').one()
+    assert len(user.password_hash) <= User.__table__.c.password_hash.type.length
+    assert user.check_password('correct horse battery staple')
+    assert not user.check_password('wrong')
+
+def write_food_csv(path):
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['fdc_id', 'description', 'energy_kcal', 'protein_g'])
+        writer.writerow(['1', 'Broccoli, raw', '34', '2.8'])
+        writer.writerow(['2', 'Brown rice, cooked', '123', '2.7'])
+        writer.writerow(['3', 'Apple, raw, with skin', '52', '0.3'])
+
+def test_food_database_on_sqlite(backend, tmp_path):
+    if backend != 'sqlite':
+        pytest.skip('FTS5 food database is SQLite-only')
+    db.create_all()
+    write_food_csv(tmp_path / 'foods.csv')
+    assert smartfit.ingest_food_database(str(tmp_path / 'foods.csv')) == 3
+    version, vocabulary = smartfit.get_food_dataset()
+    assert version is not None
+    assert [food['name'] for food in smartfit.search_food_table('brocoli', vocabulary)] == ['Broccoli, raw']
+
+def test_food_database_falls_back_elsewhere(backend, tmp_path):
+    if backend == 'sqlite':
+        pytest.skip('covered by test_food_database_on_sqlite')
+    db.create_all()
+    write_food_csv(tmp_path / 'foods.csv')
+    with pytest.raises(RuntimeError):
+        smartfit.ingest_food_database(str(tmp_path / 'foods.csv'))
+    assert smartfit.get_food_dataset() == (None, None)
+    assert smartfit.get_food_search_index().search('brocoli')[0]['name'].startswith('Broccoli')
@@ -0,0 +1,37 @@
+"""Synthetic population generator: the same seed gives the same data."""
+from datetime import date
+
+import datagen
+import app as smartfit
+from app import db
+from conftest import reset_process_caches
+
+def generate(tmp_path, name, seed, workers, chunk_users):
+    """Generates five users into a fresh database; returns every generated row, sorted per table."""
+    app = smartfit.create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / name}', 'TESTING': True,
+                               'PRELOAD_CATALOG': False})
+    reset_process_caches()
+    with app.app_context():
+        first_user_id = db.session.query(db.func.max(smartfit.User.id)).scalar() + 1
+        totals = datagen.generate_population(5, 30, seed, workers=workers, end_date=date(2024, 6, 30),
+                                             chunk_users=chunk_users)
+        rows = {}
+        for table, columns in datagen.TABLE_COLUMNS.items():
+            columns = [c for c in columns if c != 'password_hash'] # Salted, so different every run
+            key = db.metadata.tables[table].c['id' if table == 'user' else 'user_id']
+            rows[table] = sorted(db.session.execute(db.select(*(db.metadata.tables[table].c[c] for c in columns))
+                                                      .where(key >= first_user_id)).all(), key=repr)
+        db.session.remove()
+        db.engine.dispose()
+    reset_process_caches()
+    assert {table: len(table_rows) for table, table_rows in rows.items()} == totals
+    return rows
+
+def test_same_seed_gives_the_same_data(tmp_path):
+    first = generate(tmp_path, 'first.db', seed=7, workers=1, chunk_users=5)
+    second = generate(tmp_path, 'second.db', seed=7, workers=2, chunk_users=2) # Independent of the split
+    assert first['meal_log'] and first['workout_log'] and first['weight_log']
+    assert first == second
+
+    other = generate(tmp_path, 'other.db', seed=8, workers=1, chunk_users=5)
+    assert other['meal_log'] != first['meal_log']
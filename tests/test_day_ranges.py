@@ -0,0 +1,46 @@
+"""Half-open day ranges: logs just before and exactly at midnight land on their own day."""
+from datetime import date, datetime, time, timedelta
+
+import app as smartfit
+from app import db, MealLog, User, WorkoutLog
+
+TODAY = date.today()
+MIDNIGHT = datetime.combine(TODAY, time.min)
+JUST_BEFORE = MIDNIGHT - timedelta(microseconds=1) # Yesterday 23:59:59.999999
+
+def test_day_range_is_half_open():
+    assert smartfit.day_range(date(2024, 3, 9)) == (datetime(2024, 3, 9), datetime(2024, 3, 10))
+    assert smartfit.day_range(date(2024, 2, 28), days=2) == (datetime(2024, 2, 28), datetime(2024, 3, 1))
+
+def meal(user_id, name, calories, log_time):
+    return {'user_id': user_id, 'meal_name': name, 'meal_type': 'Snack', 'calories': calories, 'protein': 1.0,
+            'carbs': 1.0, 'fat': 1.0, 'fiber': 0.0, 'sugar': 0.0, 'notes': None, 'log_time': log_time}
+
+def workout(user_id, log_time):
+    return {'user_id': user_id, 'workout_name': 'Running', 'intensity_level': 'High', 'repetitions': None,
+            'notes': None, 'log_time': log_time}
+
+def test_logs_around_midnight(seeded):
+    user = User(username='owl', email='owl@example.com')
+    db.session.add(user)
+    db.session.commit()
+    smartfit.insert_log_rows('meal', [meal(user.id, 'Late cake', 400, JUST_BEFORE), meal(user.id, 'Midnight oats', 300, MIDNIGHT),
+                                      meal(user.id, 'Breakfast', 200, MIDNIGHT + timedelta(hours=8))])
+    smartfit.insert_log_rows('workout', [workout(user.id, JUST_BEFORE), workout(user.id, MIDNIGHT)])
+    db.session.commit()
+
+    start, end = smartfit.day_range(TODAY)
+    todays = MealLog.query.filter(MealLog.user_id == user.id, MealLog.log_time >= start, MealLog.log_time < end)
+    assert sorted(log.meal_name for log in todays) == ['Breakfast', 'Midnight oats']
+
+    rollups = smartfit.get_daily_nutrition(user.id, TODAY - timedelta(days=1), days=2)
+    assert {day: (row.calories, row.meal_count) for day, row in rollups.items()} == {
+        TODAY - timedelta(days=1): (400, 1), TODAY: (500, 2)}
+    assert smartfit.rebuild_daily_nutrition([user.id]) == 2 # Grouping by date(log_time) agrees with the insert path
+    db.session.commit()
+    rebuilt = smartfit.get_daily_nutrition(user.id, TODAY - timedelta(days=1), days=2)
+    assert {day: row.calories for day, row in rebuilt.items()} == {TODAY - timedelta(days=1): 400, TODAY: 500}
+
+    assert smartfit.workout_activity_series(user.id, days=2)['data'] == [1, 1]
+    burned = {log.log_time: log.calories_burned for log in WorkoutLog.query.filter_by(user_id=user.id)}
+    assert burned[MIDNIGHT] and smartfit.get_dashboard_summary(user.id).calories_burned == burned[MIDNIGHT]
@@ -0,0 +1,55 @@
+"""Chart downsampling: LTTB and min/max buckets."""
+import math
+from datetime import datetime, timedelta
+
+import app as smartfit
+from app import db, User, WeightLog, lttb, minmax_downsample
+
+def wave(n):
+    return [(float(i), math.sin(i / 7) * 10 + i / 50) for i in range(n)]
+
+def test_short_series_are_returned_unchanged():
+    points = wave(10)
+    assert lttb(points, 10) == points
+    assert lttb(points, 50) == points
+    assert lttb(points, 2) == points # Too few buckets to downsample
+    assert minmax_downsample(points, 20) == points
+
+def test_lttb_keeps_endpoints_and_order():
+    points = wave(1000)
+    sampled = lttb(points, 100)
+    assert len(sampled) == 100
+    assert sampled[0] == points[0] and sampled[-1] == points[-1]
+    assert all(a[0] < b[0] for a, b in zip(sampled, sampled[1:]))
+    assert set(sampled) <= set(points)
+
+def test_lttb_keeps_a_spike():
+    points = [(float(i), 70.0) for i in range(500)]
+    points[321] = (321.0, 95.0)
+    assert (321.0, 95.0) in lttb(points, 20)
+
+def test_minmax_keeps_each_buckets_extremes():
+    points = wave(1000)
+    sampled = minmax_downsample(points, 100)
+    assert len(sampled) <= 100
+    assert min(points, key=lambda p: p[1]) in sampled
+    assert max(points, key=lambda p: p[1]) in sampled
+    assert sampled == sorted(sampled) # Still in time order
+
+def test_weight_series_is_bounded(backend):
+    db.create_all()
+    user = User(username='scale', email='scale@example.com')
+    db.session.add(user)
+    db.session.flush()
+    start = datetime(2023, 1, 1)
+    db.session.add_all(WeightLog(user_id=user.id, weight=80 - i / 100, log_time=start + timedelta(days=i)) for i in range(400))
+    db.session.commit()
+
+    series = smartfit.weight_series(user.id, points=50)
+    assert series['total_points'] == 400
+    assert len(series['labels']) == len(series['data']) == 50
+    assert series['labels'][0] == '2023-01-01' and series['data'][-1] == 80 - 399 / 100
+
+    latest = smartfit.weight_series(user.id, points=50, mode='latest')
+    assert latest['total_points'] == 400
+    assert latest['labels'][0] == (start + timedelta(days=350)).strftime('%Y-%m-%d')
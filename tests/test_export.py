@@ -0,0 +1,72 @@
+"""Streaming history export, and re-importing it."""
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as smartfit
+from app import db, MealLog, Profile, User, WeightLog, Workout, WorkoutLog
+
+LOG_MODELS = {'meal': MealLog, 'workout': WorkoutLog, 'weight': WeightLog}
+
+def create_user(username):
+    user = User(username=username, email=f'{username}@example.com')
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+@pytest.fixture
+def exporter(seeded):
+    user_id = create_user('exporter')
+    user = db.session.get(User, user_id)
+    user.profile = Profile(weight=72.5, height=168, goal='Maintain Weight', fitness_level='Beginner')
+    user.saved_workouts.append(Workout.query.filter_by(name='Core Crusher').one())
+    db.session.commit()
+    start = datetime(2024, 3, 1, 7, 15, 30, 250000)
+    smartfit.insert_log_rows('meal', [
+        {'user_id': user_id, 'meal_name': f'Meal, "{i}"', 'meal_type': 'Lunch', 'calories': 300 + i, 'protein': 20.5,
+         'carbs': None, 'fat': 10.0, 'fiber': 3.0, 'sugar': None, 'notes': 'line one\nline two' if i == 1 else None,
+         'log_time': start + timedelta(hours=5 * i)} for i in range(7)])
+    smartfit.insert_log_rows('workout', [
+        {'user_id': user_id, 'workout_name': name, 'intensity_level': 'Medium', 'repetitions': '3x10 @ 40kg',
+         'notes': None, 'log_time': start + timedelta(days=i)} for i, name in enumerate(['Core Crusher', 'Kayaking'] * 2)])
+    smartfit.insert_log_rows('weight', [{'user_id': user_id, 'weight': 72.5 - i / 10, 'log_time': start + timedelta(days=i)}
+                                        for i in range(3)])
+    db.session.commit()
+    return user_id
+
+def log_rows(user_id):
+    """Each log table's rows as written by the user (keys and derived columns left out)."""
+    rows = {}
+    for kind, model in LOG_MODELS.items():
+        columns = [c for c in smartfit.import_columns(model) if c.name not in ('workout_id', 'calories_burned', 'set_count')]
+        rows[kind] = sorted(tuple(getattr(log, c.name) for c in columns) for log in model.query.filter_by(user_id=user_id))
+    return rows
+
+@pytest.mark.parametrize('fmt, filename', [('ndjson', 'export.ndjson'), ('csv', 'export.csv')])
+def test_export_round_trips_through_import(exporter, monkeypatch, fmt, filename):
+    monkeypatch.setattr(smartfit, 'EXPORT_CHUNK_SIZE', 2) # Several keyset chunks per table
+    text = ''.join(smartfit.iter_export_lines(exporter, fmt))
+    importer = create_user('importer')
+
+    summary = smartfit.import_history(importer, io.BytesIO(text.encode('utf-8')), filename)
+    assert summary['inserted'] == {'meal': 7, 'workout': 4, 'weight': 3}
+    assert summary['error_count'] == 0, summary['errors']
+    assert summary['skipped'] == 2 # The profile and the saved workout aren't logs
+    assert log_rows(importer) == log_rows(exporter)
+
+    imported = {log.workout_name: (log.workout_id, log.calories_burned)
+                for log in WorkoutLog.query.filter_by(user_id=importer)}
+    exported = {log.workout_name: (log.workout_id, log.calories_burned)
+                for log in WorkoutLog.query.filter_by(user_id=exporter)}
+    assert imported == exported
+    assert smartfit.get_daily_nutrition(importer, datetime(2024, 3, 1).date(), days=3).keys() == \
+           smartfit.get_daily_nutrition(exporter, datetime(2024, 3, 1).date(), days=3).keys()
+
+def test_ndjson_export_records(exporter):
+    records = [json.loads(line) for line in ''.join(smartfit.iter_export_lines(exporter)).splitlines()]
+    assert [record['type'] for record in records] == ['profile'] + ['weight'] * 3 + ['meal'] * 7 + ['workout'] * 4 + ['saved_workout']
+    assert records[0]['weight'] == 72.5 and 'user_id' not in records[0]
+    assert records[-1]['name'] == 'Core Crusher'
+    assert records[4]['log_time'] == '2024-03-01T07:15:30.250000'
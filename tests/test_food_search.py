@@ -0,0 +1,38 @@
+"""FoodSearchIndex: exact, prefix, infix and misspelled matches and their ranking."""
+from app import FoodSearchIndex, FOOD_DATABASE
+
+def names(results):
+    return [entry['name'] for entry in results]
+
+def index(*food_names):
+    return FoodSearchIndex([{'name': name} for name in food_names])
+
+def test_misspellings_match():
+    foods = FoodSearchIndex(FOOD_DATABASE)
+    assert names(foods.search('brocoli'))[0].startswith('Broccoli')
+    assert names(foods.search('chiken'))[0].startswith('Chicken')
+
+def test_prefix_prefers_closer_words_then_shorter_names():
+    foods = index('Chicken Breast, grilled', 'Chicken', 'Chickpeas, canned')
+    assert names(foods.search('chick')) == ['Chicken', 'Chicken Breast, grilled', 'Chickpeas, canned']
+
+def test_name_starting_with_query_ranks_first():
+    foods = index('Rice, white', 'Brown rice, cooked', 'Rice cakes')
+    assert names(foods.search('rice')) == ['Rice cakes', 'Rice, white', 'Brown rice, cooked']
+
+def test_every_query_word_must_match():
+    foods = index('Apple juice', 'Orange juice', 'Apple, raw')
+    assert names(foods.search('apple juice')) == ['Apple juice']
+
+def test_infix_match():
+    assert names(index('Blueberries', 'Strawberries').search('berr')) == ['Blueberries', 'Strawberries']
+
+def test_unplaceable_words_are_ignored():
+    foods = index('Banana', 'Oatmeal')
+    assert names(foods.search('banana zzzq')) == ['Banana']
+    assert foods.search('zzzq') == []
+    assert foods.search('') == []
+
+def test_limit():
+    foods = index(*[f'Soup {i}' for i in range(30)])
+    assert len(foods.search('soup', limit=5)) == 5
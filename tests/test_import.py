@@ -0,0 +1,74 @@
+"""Bulk history import from CSV and NDJSON, with rejected rows reported by line number."""
+import io
+import json
+from datetime import date, datetime
+
+import pytest
+
+import app as smartfit
+from app import db, MealLog, User, WeightLog, WorkoutLog
+
+@pytest.fixture
+def user_id(seeded):
+    user = User(username='importer', email='importer@example.com')
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+def run_import(user_id, text, filename, **kwargs):
+    return smartfit.import_history(user_id, io.BytesIO(text.encode('utf-8')), filename, **kwargs)
+
+def test_csv_import(user_id):
+    csv_text = ('type,meal_name,calories,protein,workout_name,intensity_level,weight,log_time\r\n'
+                'meal,Oats,350,12.5,,,,2024-03-01T08:00:00\r\n'
+                'meal,Soup,-20,,,,,2024-03-01T12:00:00\r\n'        # Line 3: negative
+                'workout,,,,Core Crusher,High,,2024-03-01T18:00:00\r\n'
+                'weight,,,,,,81.2,2024-03-02T07:00:00Z\r\n'
+                'meal,,400,,,,,2024-03-02T08:00:00\r\n'            # Line 6: no name
+                'meal,Toast,12.5,,,,,2024-03-02T09:00:00\r\n'      # Line 7: calories must be whole
+                'snack,Crisps,150,,,,,2024-03-02T10:00:00\r\n'     # Line 8: unknown type
+                'meal,Lunch,600,30,,,,2024-03-02T13:00:00\r\n')
+    summary = run_import(user_id, csv_text, 'history.CSV', batch_size=1)
+
+    assert summary['rows_read'] == 8
+    assert summary['inserted'] == {'meal': 2, 'workout': 1, 'weight': 1}
+    assert summary['total_inserted'] == 4
+    assert summary['error_count'] == 4
+    assert summary['errors'] == [(3, 'calories cannot be negative'), (6, 'meal_name is required'),
+                                 (7, 'invalid calories: calories must be a whole number'), (8, 'unknown record type "snack"')]
+
+    oats = MealLog.query.filter_by(user_id=user_id, meal_name='Oats').one()
+    assert (oats.calories, oats.protein, oats.carbs, oats.log_time) == (350, 12.5, None, datetime(2024, 3, 1, 8))
+    assert WeightLog.query.filter_by(user_id=user_id).one().log_time == datetime(2024, 3, 2, 7) # Stored as naive UTC
+    crusher = WorkoutLog.query.filter_by(user_id=user_id).one()
+    assert crusher.workout_id == smartfit.get_catalog().workouts_by_name['Core Crusher'].id
+    assert crusher.calories_burned is not None
+    rollups = smartfit.get_daily_nutrition(user_id, date(2024, 3, 1), days=2)
+    assert {day: (row.calories, row.meal_count) for day, row in rollups.items()} == {
+        date(2024, 3, 1): (350, 1), date(2024, 3, 2): (600, 1)}
+
+def test_ndjson_import(user_id):
+    lines = [json.dumps({'type': 'meal', 'meal_name': 'Eggs', 'calories': 210, 'log_time': '2024-03-01T07:30:00'}),
+             '',                                                                   # Blank lines are skipped
+             json.dumps({'meal_name': 'Apple', 'calories': 95, 'log_time': 1709280000}), # Falls back to default_kind
+             '{"type": "meal", "meal_name": ',                                     # Line 4: truncated
+             json.dumps(['meal', 'Pie', 300]),                                     # Line 5: not an object
+             json.dumps({'type': 'weight', 'weight': -80}),                        # Line 6: negative
+             json.dumps({'type': 'weight', 'weight': 'heavy'}),                    # Line 7: not a number
+             json.dumps({'type': 'Workout', 'workout_name': 'Unlisted drill', 'log_time': '2024-03-01T19:00:00'})]
+    summary = run_import(user_id, '\n'.join(lines) + '\n', 'history.ndjson', default_kind='meal')
+
+    assert summary['rows_read'] == 7
+    assert summary['inserted'] == {'meal': 2, 'workout': 1, 'weight': 0}
+    assert [line for line, _ in summary['errors']] == [4, 5, 6, 7]
+    assert summary['errors'][0][1].startswith('invalid JSON')
+    assert summary['errors'][1:] == [(5, 'record must be an object'), (6, 'weight cannot be negative'),
+                                     (7, "invalid weight: could not convert string to float: 'heavy'")]
+    assert MealLog.query.filter_by(user_id=user_id, meal_name='Apple').one().log_time == datetime(2024, 3, 1, 8)
+    assert WorkoutLog.query.filter_by(user_id=user_id).one().workout_id is None # Not in the catalog
+
+def test_reported_errors_are_bounded(user_id, monkeypatch):
+    monkeypatch.setattr(smartfit, 'IMPORT_MAX_REPORTED_ERRORS', 2)
+    summary = run_import(user_id, ''.join(json.dumps({'type': 'meal', 'calories': -1}) + '\n' for _ in range(5)), 'bad.jsonl')
+    assert summary['error_count'] == 5 and [line for line, _ in summary['errors']] == [1, 2]
+    assert summary['total_inserted'] == 0
@@ -0,0 +1,24 @@
+"""Logging meals over AJAX, and how failures are reported."""
+import logging
+
+import app as smartfit
+from conftest import login
+
+def test_track_meal_ajax_returns_todays_totals(client):
+    login(client)
+    before = client.get('/widgets/todays-macros').get_json()
+    response = client.post('/track/meal_ajax', data={'meal_name': 'Porridge', 'calories': '310', 'protein': '11'})
+    body = response.get_json()
+    assert body['success'] is True
+    assert body['calories_consumed'] == before['calories_consumed'] + 310
+
+def test_track_meal_ajax_failure_is_logged(client, monkeypatch, caplog):
+    login(client)
+    def broken_save_log(*args, **kwargs):
+        raise RuntimeError('disk full')
+    monkeypatch.setattr(smartfit, 'save_log', broken_save_log)
+    with caplog.at_level(logging.ERROR):
+        response = client.post('/track/meal_ajax', data={'meal_name': 'Porridge', 'calories': '310'})
+    assert response.get_json() == {'success': False, 'message': 'An internal error occurred.'}
+    record = next(record for record in caplog.records if 'track_meal_ajax' in record.getMessage())
+    assert record.exc_info and 'disk full' in str(record.exc_info[1])
@@ -0,0 +1,101 @@
+"""Prometheus metrics: text exposition, totals across worker files and retired workers."""
+import math
+import os
+import re
+import threading
+
+import pytest
+
+import app as smartfit
+
+SAMPLE_LINE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?:[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\\n]|\\[\\"n])*",?)*\})? (\S+)$')
+
+def parse_exposition(text):
+    """Checks Prometheus text format 0.0.4 and returns {sample line without value: value}."""
+    assert text.endswith('\n')
+    samples, types = {}, {}
+    for line in text.splitlines():
+        if line.startswith('# HELP '):
+            continue
+        if line.startswith('# TYPE '):
+            _, _, name, kind = line.split(' ')
+            assert kind in ('counter', 'gauge', 'histogram') and name not in types
+            types[name] = kind
+            continue
+        match = SAMPLE_LINE.match(line)
+        assert match, f'not a valid sample line: {line!r}'
+        name = match.group(1)
+        family = re.sub(r'_(bucket|sum|count)$', '', name) if name not in types else name
+        assert family in types, f'{name} has no TYPE line'
+        value = float(match.group(3))
+        assert not math.isnan(value)
+        samples[line.rsplit(' ', 1)[0]] = value
+    return samples
+
+@pytest.fixture
+def registry(monkeypatch, tmp_path):
+    """A registry with one metric of each type, sharing a temporary METRICS_DIR."""
+    monkeypatch.setattr(smartfit, 'METRICS_DIR', str(tmp_path))
+    metrics = smartfit.MetricsRegistry()
+    metrics.counter('test_requests_total', 'Requests.')
+    metrics.gauge('test_in_flight', 'Requests in flight.')
+    metrics.histogram('test_seconds', 'Latency.', (0.1, 1.0))
+    return metrics
+
+def worker_samples(requests, in_flight, latencies):
+    buckets = [sum(1 for l in latencies if l <= 0.1), sum(1 for l in latencies if 0.1 < l <= 1.0),
+               sum(1 for l in latencies if l > 1.0), sum(latencies)]
+    return {('test_requests_total', (('route', 'main.index'),)): requests,
+            ('test_in_flight', ()): in_flight,
+            ('test_seconds', ()): buckets}
+
+def test_worker_files_are_added_up(registry):
+    registry._write('101.json', worker_samples(3, 1, [0.05, 0.5]))
+    registry._write('102.json', worker_samples(4, 2, [2.0]))
+    registry.inc('test_requests_total', (('route', 'main.index'),)) # This process
+    registry.observe('test_seconds', 0.01)
+
+    samples = parse_exposition(registry.render())
+    assert samples['test_requests_total{route="main.index"}'] == 8
+    assert samples['test_in_flight'] == 3
+    assert samples['test_seconds_bucket{le="0.1"}'] == 2 # Cumulative
+    assert samples['test_seconds_bucket{le="1.0"}'] == 3
+    assert samples['test_seconds_bucket{le="+Inf"}'] == samples['test_seconds_count'] == 4
+    assert samples['test_seconds_sum'] == pytest.approx(2.56)
+
+def test_retired_worker_keeps_counters_but_drops_gauges(registry, tmp_path):
+    registry._write('101.json', worker_samples(3, 5, [0.05]))
+    registry._write('102.json', worker_samples(4, 2, [0.5]))
+    registry.retire_worker(101)
+    assert not os.path.exists(tmp_path / '101.json')
+
+    samples = parse_exposition(registry.render())
+    assert samples['test_requests_total{route="main.index"}'] == 7
+    assert samples['test_in_flight'] == 2 # Only the live worker's
+    assert samples['test_seconds_count'] == 2
+
+    registry.retire_worker(102)
+    samples = parse_exposition(registry.render())
+    assert samples['test_requests_total{route="main.index"}'] == 7 # Both folded into exited.json
+    assert 'test_in_flight' not in samples
+
+def test_values_from_finished_threads_are_kept(registry):
+    thread = threading.Thread(target=registry.inc, args=('test_requests_total', (('route', 'main.index'),), 2))
+    thread.start()
+    thread.join()
+    registry.snapshot() # Folds the finished thread's values into the retired totals
+    assert registry.snapshot()[('test_requests_total', (('route', 'main.index'),))] == 2
+
+def test_label_values_are_escaped(registry, monkeypatch):
+    monkeypatch.setattr(smartfit, 'METRICS_DIR', None)
+    registry.inc('test_requests_total', (('route', 'say "hi"\\\n'),))
+    samples = parse_exposition(registry.render())
+    assert samples['test_requests_total{route="say \\"hi\\"\\\\\\n"}'] == 1
+
+def test_metrics_endpoint(client):
+    client.get('/login')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type == 'text/plain; version=0.0.4; charset=utf-8'
+    samples = parse_exposition(response.get_data(as_text=True))
+    assert samples['smartfit_http_requests_total{route="main.login",method="GET",status="200"}'] >= 1
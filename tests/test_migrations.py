@@ -0,0 +1,74 @@
+"""Online migrations: resumable chunked backfills and the runner lease."""
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as smartfit
+from app import db, SchemaMigration, User, WorkoutLog
+
+TEST_VERSION = 10000 # Past every real migration
+
+def calorie_logs(count):
+    user = User(username='resumer', email='resumer@example.com')
+    db.session.add(user)
+    db.session.flush()
+    start = datetime(2024, 1, 1, 7)
+    logs = [WorkoutLog(user_id=user.id, workout_name='Trail run', intensity_level='Medium', log_time=start + timedelta(days=i))
+            for i in range(count)]
+    db.session.add_all(logs)
+    db.session.commit()
+    return [log.id for log in logs]
+
+def test_interrupted_backfill_resumes_from_its_cursor(seeded):
+    ids = calorie_logs(5)
+    calls = []
+
+    def step(cursor, size):
+        calls.append(cursor)
+        result = smartfit.calories_burned_chunk(cursor, size)
+        if len(calls) == 2 and failing:
+            raise RuntimeError('worker killed') # After the chunk's writes, before its commit
+        return result
+    migration = smartfit.Migration(TEST_VERSION, 'test calorie backfill', True, lambda run: run.backfill(step))
+
+    failing = True
+    with pytest.raises(RuntimeError):
+        smartfit.run_migration(migration, chunk_size=2, pause=0)
+    db.session.expire_all()
+    record = db.session.get(SchemaMigration, TEST_VERSION)
+    assert record.applied_at is None and record.owner is None # Lease handed back
+    assert record.rows_done == 2 and record.cursor == calls[1]
+    saved_cursor = record.cursor
+    filled = lambda: [db.session.get(WorkoutLog, log_id).calories_burned is not None for log_id in ids]
+    assert filled() == [True, True, False, False, False] # The interrupted chunk was rolled back
+
+    failing = False
+    calls.clear()
+    assert smartfit.run_migration(migration, chunk_size=2, pause=0)
+    assert calls[0] == saved_cursor # Resumed, not started over
+    db.session.expire_all()
+    record = db.session.get(SchemaMigration, TEST_VERSION)
+    assert record.applied_at is not None and record.cursor is None and record.rows_done == 5
+    assert filled() == [True] * 5
+    assert not smartfit.run_migration(migration) # Already applied
+
+def test_lease_is_taken_over_only_when_stale(seeded):
+    migration = smartfit.Migration(TEST_VERSION, 'test lease', False, lambda: None)
+    record = smartfit.claim_migration(migration)
+    assert record.owner == smartfit.migration_owner()
+    assert smartfit.claim_migration(migration) is not None # Our own lease
+
+    record.owner = 'elsewhere:1'
+    record.heartbeat_at = datetime.utcnow()
+    db.session.commit()
+    assert smartfit.claim_migration(migration) is None
+    with pytest.raises(smartfit.MigrationBusy):
+        smartfit.run_migration(migration)
+
+    record = db.session.get(SchemaMigration, TEST_VERSION)
+    record.heartbeat_at = datetime.utcnow() - timedelta(seconds=smartfit.MIGRATION_LEASE_SECONDS + 1)
+    db.session.commit()
+    assert smartfit.run_migration(migration)
+    record = db.session.get(SchemaMigration, TEST_VERSION)
+    assert record.applied_at is not None and record.owner is None
+    assert smartfit.claim_migration(migration) is None # Applied
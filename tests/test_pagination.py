@@ -0,0 +1,52 @@
+"""Keyset pagination and its opaque cursors."""
+from datetime import datetime, timedelta
+
+import app as smartfit
+from app import db, User, WorkoutLog, WORKOUT_LOG_ORDER, ADMIN_USER_ORDER
+
+def test_cursor_round_trip():
+    key = [datetime(2024, 3, 1, 7, 30, 15, 250000), 42]
+    cursor = smartfit.encode_cursor(key)
+    assert '=' not in cursor and '/' not in cursor and '+' not in cursor
+    assert smartfit.decode_cursor(cursor, WORKOUT_LOG_ORDER) == key
+
+def test_malformed_cursors_start_over():
+    for cursor in (None, '', 'not base64!', smartfit.encode_cursor([1]), smartfit.encode_cursor(['soon', 1]),
+                   'eyJhIjoxfQ'): # '{"a":1}'
+        assert smartfit.decode_cursor(cursor, WORKOUT_LOG_ORDER) is None
+
+def all_pages(query, order, key, page_size):
+    rows, cursor = smartfit.keyset_page(query, order, key, page_size=page_size)
+    pages = [rows]
+    while cursor:
+        rows, cursor = smartfit.keyset_page(query, order, key, cursor=cursor, page_size=page_size)
+        pages.append(rows)
+    return pages
+
+def test_pages_cover_every_row_once_despite_ties(backend):
+    db.create_all()
+    user = User(username='pager', email='pager@example.com')
+    db.session.add(user)
+    db.session.flush()
+    start = datetime(2024, 1, 1)
+    db.session.add_all(WorkoutLog(user_id=user.id, workout_name='Squat', log_time=start + timedelta(days=i // 3))
+                       for i in range(23)) # Three logs share each timestamp
+    db.session.commit()
+    query = WorkoutLog.query.filter_by(user_id=user.id)
+    expected = [log.id for log in query.order_by(WorkoutLog.log_time.desc(), WorkoutLog.id.desc())]
+
+    pages = all_pages(query, WORKOUT_LOG_ORDER, lambda log: (log.log_time, log.id), page_size=5)
+    assert [len(page) for page in pages] == [5, 5, 5, 5, 3]
+    assert [log.id for page in pages for log in page] == expected
+
+def test_new_rows_do_not_shift_later_pages(backend):
+    db.create_all()
+    db.session.add_all(User(username=f'user{i:02d}', email=f'user{i:02d}@example.com') for i in range(0, 20, 2))
+    db.session.commit()
+    key = lambda user: (user.username, user.id)
+    first, cursor = smartfit.keyset_page(User.query, ADMIN_USER_ORDER, key, page_size=4)
+    db.session.add_all([User(username='user00a', email='a@example.com'), User(username='user15', email='b@example.com')])
+    db.session.commit()
+    second, _ = smartfit.keyset_page(User.query, ADMIN_USER_ORDER, key, cursor=cursor, page_size=4)
+    assert [user.username for user in first] == ['user00', 'user02', 'user04', 'user06']
+    assert [user.username for user in second] == ['user08', 'user10', 'user12', 'user14'] # user00a sorts before the cursor
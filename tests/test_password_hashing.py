@@ -0,0 +1,90 @@
+"""Password hashing in the bounded process pool, its inline fallbacks and hash upgrades."""
+import threading
+import time
+
+import pytest
+from click.testing import CliRunner
+from flask.cli import FlaskGroup
+from werkzeug.security import generate_password_hash
+
+import app as smartfit
+from app import db, User
+from conftest import login
+
+FAST_METHOD = 'pbkdf2:sha256:1000' # Keeps the tests quick; the pool doesn't care how slow a hash is
+
+@pytest.fixture
+def pooled(monkeypatch):
+    """A one-process hash pool (queue of two) in place of the inline hasher the tests run with."""
+    hasher = smartfit.PasswordHasher(FAST_METHOD, workers=1, queue_limit=2)
+    monkeypatch.setattr(smartfit, 'password_hasher', hasher)
+    yield hasher
+    if hasher.pool is not None:
+        hasher.pool.shutdown()
+
+def stored_hash(app, username):
+    with app.app_context():
+        return User.query.filter_by(username=username).one().password_hash
+
+def test_register_and_login_hash_in_the_pool(client, pooled):
+    response = client.post('/register', data={'username': 'pooled', 'email': 'pooled@example.com', 'password': 'secret',
+                                              'weight': '70', 'height': '175', 'goal': 'Maintain Weight',
+                                              'fitness_level': 'Beginner'})
+    assert response.status_code == 302
+    assert pooled.pool is not None # Hashed by a worker process, not the request thread
+    assert stored_hash(client.application, 'pooled').startswith(FAST_METHOD + '$')
+    login(client, 'pooled', 'secret')
+
+def test_hash_from_the_old_method_verifies_and_is_upgraded(client, pooled):
+    with client.application.app_context():
+        user = User(username='veteran', email='veteran@example.com',
+                    password_hash=generate_password_hash('secret')) # Werkzeug's default, as before the pool
+        db.session.add(user)
+        db.session.commit()
+    assert client.post('/login', data={'username': 'veteran', 'password': 'wrong'}).status_code == 200
+    assert not stored_hash(client.application, 'veteran').startswith(FAST_METHOD)
+    login(client, 'veteran', 'secret')
+    assert stored_hash(client.application, 'veteran').startswith(FAST_METHOD + '$') # Rehashed at login
+
+def test_submissions_beyond_the_workers_wait_and_beyond_the_queue_are_rejected(pooled):
+    results, started = [], time.monotonic()
+    threads = [threading.Thread(target=lambda: results.append(pooled._run_in_pool(time.sleep, 0.3))) for _ in range(3)]
+    for thread in threads: # One runs, two wait in the queue
+        thread.start()
+    while pooled.slots._value and time.monotonic() - started < 30:
+        time.sleep(0.01)
+    with pytest.raises(smartfit.PasswordHashBusy): # Worker and queue are full
+        pooled._run_in_pool(time.sleep, 0)
+    for thread in threads:
+        thread.join()
+    assert results == [None] * 3 # None of the queued ones failed
+    assert pooled._run_in_pool(generate_password_hash, 'secret', FAST_METHOD).startswith(FAST_METHOD) # Slots released
+
+def test_hashing_runs_inline_without_workers_or_outside_requests(web_app):
+    inline = smartfit.PasswordHasher(FAST_METHOD, workers=0, queue_limit=2)
+    with web_app.test_request_context():
+        assert inline.verify(inline.hash('secret'), 'secret')
+    assert inline.pool is None
+
+    pooled = smartfit.PasswordHasher(FAST_METHOD, workers=1, queue_limit=2)
+    assert pooled.verify(pooled.hash('secret'), 'secret') # A CLI command or seeding: no request
+    assert pooled.pool is None
+
+def test_reset_forgets_the_pool(pooled):
+    pooled._run_in_pool(time.sleep, 0)
+    parent_pool = pooled.pool
+    pooled.reset() # As in a forked worker
+    assert pooled.pool is None and pooled.slots._value == 3
+    pooled._run_in_pool(time.sleep, 0)
+    assert pooled.pool is not parent_pool
+    parent_pool.shutdown()
+
+@pytest.mark.parametrize('algorithm, prefix', [('scrypt', 'scrypt:16384:8:1'), ('pbkdf2', 'pbkdf2:sha256:')])
+def test_calibrate_password_hash(tmp_path, algorithm, prefix):
+    cli = FlaskGroup(create_app=lambda: smartfit.create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp_path / "cli.db"}'}),
+                     load_dotenv=False)
+    result = CliRunner().invoke(cli, ['calibrate-password-hash', '--target-ms', '1', '--algorithm', algorithm])
+    assert result.exit_code == 0, result.output
+    method = result.output.split()[0].split('=', 1)[1]
+    assert method.startswith(prefix) # The cheapest setting for a 1 ms target
+    assert generate_password_hash('x', method).startswith(method + '$')
@@ -0,0 +1,43 @@
+"""Profile edits and the weight log they write."""
+import pytest
+
+import app as smartfit
+from app import db, Profile, User, WeightLog
+from conftest import login
+
+FORM = {'weight': '82.5', 'height': '180', 'goal': 'Lose Weight', 'fitness_level': 'Beginner', 'dietary_preferences': ''}
+
+def create_user(app, username, weight=80.0):
+    with app.app_context():
+        user = User(username=username, email=f'{username}@example.com')
+        user.set_password('secret')
+        user.profile = Profile(weight=weight, height=180, goal='Lose Weight', fitness_level='Beginner')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+def saved(app, user_id):
+    with app.app_context():
+        return (db.session.get(User, user_id).profile.weight,
+                [log.weight for log in WeightLog.query.filter_by(user_id=user_id)])
+
+def test_weight_change_is_logged_with_the_profile(client, monkeypatch):
+    user_id = create_user(client.application, 'weigher')
+    login(client, 'weigher', 'secret')
+    monkeypatch.setattr(smartfit, 'WRITE_BEHIND_MODE', 'async') # Must not be queued even so
+    assert client.post('/profile', data=FORM).status_code == 302
+    assert saved(client.application, user_id) == (82.5, [82.5])
+
+    assert client.post('/profile', data=FORM).status_code == 302 # Unchanged weight: nothing new to log
+    assert saved(client.application, user_id) == (82.5, [82.5])
+
+def test_failed_weight_log_keeps_the_old_profile(client, monkeypatch):
+    user_id = create_user(client.application, 'unlucky')
+    login(client, 'unlucky', 'secret')
+
+    def fail(kind, rows):
+        raise RuntimeError('database went away')
+    monkeypatch.setattr(smartfit, 'insert_log_rows', fail)
+    with pytest.raises(RuntimeError):
+        client.post('/profile', data=FORM)
+    assert saved(client.application, user_id) == (80.0, [])
@@ -0,0 +1,73 @@
+"""Set/rep parsing and the strength progression series built from it."""
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as smartfit
+from app import db, User
+
+def summary(text):
+    return [(s['reps'], s['load'], s['unit'], s['load_kg'], s['est_1rm']) for s in smartfit.parse_sets(text)]
+
+def test_sets_with_a_load():
+    sets = smartfit.parse_sets('5x5 @ 100kg')
+    assert [s['set_number'] for s in sets] == [1, 2, 3, 4, 5]
+    assert summary('5x5 @ 100kg') == [(5, 100.0, 'kg', 100.0, 116.7)] * 5
+    assert summary('5x5, @ 100kg') == summary('5x5 @ 100kg') # Load in its own part
+
+def test_load_first_and_mixed_loads():
+    assert summary('100kg x 5, 110kg x 3') == [(5, 100.0, 'kg', 100.0, 116.7), (3, 110.0, 'kg', 110.0, 121.0)]
+    assert summary('100kg x 5 x 2') == [(5, 100.0, 'kg', 100.0, 116.7)] * 2
+
+def test_load_given_once_applies_to_every_set():
+    assert summary('10, 8, 6 @ 60kg') == [(10, 60.0, 'kg', 60.0, 80.0), (8, 60.0, 'kg', 60.0, 76.0),
+                                          (6, 60.0, 'kg', 60.0, 72.0)]
+
+def test_unloaded_sets():
+    assert summary('3 sets of 8-12 reps') == [(8, None, None, None, None)] * 3
+    assert summary('3x10 bodyweight') == [(10, None, None, None, None)] * 3
+    assert summary('15 reps') == [(15, None, None, None, None)]
+
+def test_pounds_are_converted():
+    assert summary('3×10 @ 135 lbs') == [(10, 135.0, 'lb', 61.23, 81.6)] * 3
+
+@pytest.mark.parametrize('text', ['', None, '30 min', 'To Failure', '25x2', '3x0', '3x10, then some'])
+def test_unparseable_text(text):
+    assert smartfit.parse_sets(text) == []
+
+def test_estimated_1rm():
+    assert smartfit.estimated_1rm(1, 140) == 140
+    assert smartfit.estimated_1rm(5, 100) == 116.7
+    assert smartfit.estimated_1rm(15, 60) is None # Too many reps to estimate from
+    assert smartfit.estimated_1rm(5, None) is None
+
+def log_workouts(user_id, entries, name='Zercher Squat'):
+    smartfit.insert_log_rows('workout', [{'user_id': user_id, 'workout_name': name, 'intensity_level': None,
+                                          'repetitions': repetitions, 'notes': None, 'log_time': log_time}
+                                         for log_time, repetitions in entries])
+    db.session.commit()
+
+def test_strength_series(seeded):
+    lifter, other = User(username='lifter', email='lifter@example.com'), User(username='other', email='other@example.com')
+    db.session.add_all([lifter, other])
+    db.session.commit()
+    start = datetime(2024, 2, 1, 18)
+    log_workouts(lifter.id, [(start, '5x5 @ 100kg'), (start + timedelta(days=2), '100kg x 5, 110kg x 3'),
+                             (start + timedelta(days=4), '30 min')]) # No sets: not a session in the series
+    log_workouts(other.id, [(start, '1x1 @ 200kg')])
+
+    series = smartfit.strength_series(lifter.id, 'Zercher Squat')
+    assert series == {'labels': ['2024-02-01', '2024-02-03'], 'est_1rm': [116.7, 121.0], 'top_set': [100.0, 110.0],
+                      'volume': [2500.0, 830.0], 'reps': [25, 8], 'loaded': True, 'total_points': 2}
+
+def test_strength_series_is_downsampled(seeded):
+    user = User(username='regular', email='regular@example.com')
+    db.session.add(user)
+    db.session.commit()
+    start = datetime(2024, 1, 1, 7)
+    log_workouts(user.id, [(start + timedelta(days=day), f'3x{8 + day % 5}') for day in range(40)], name='Pull-ups')
+
+    series = smartfit.strength_series(user.id, 'Pull-ups', points=1) # Raised to MIN_CHART_POINTS
+    assert len(series['labels']) == smartfit.MIN_CHART_POINTS and series['total_points'] == 40
+    assert series['labels'][0] == '2024-01-01' and series['labels'][-1] == '2024-02-09'
+    assert not series['loaded'] and series['est_1rm'] == [None] * smartfit.MIN_CHART_POINTS
@@ -0,0 +1,30 @@
+"""SQL instrumentation headers are only sent to admins (or in debug mode)."""
+import app as smartfit
+from conftest import login
+
+SQL_HEADERS = ('X-SQL-Queries', 'X-SQL-Time-Ms', 'Server-Timing', 'X-SQL-N-Plus-One')
+
+def sql_headers(response):
+    return [name for name in SQL_HEADERS if name in response.headers]
+
+def test_anonymous_and_regular_users_get_no_sql_headers(client):
+    assert sql_headers(client.get('/login')) == []
+    with client.application.app_context():
+        if not smartfit.User.query.filter_by(username='regular').first():
+            user = smartfit.User(username='regular', email='regular@example.com')
+            user.set_password('regularpass')
+            smartfit.db.session.add(user)
+            smartfit.db.session.commit()
+    login(client, 'regular', 'regularpass')
+    assert sql_headers(client.get('/widgets/todays-macros')) == []
+
+def test_admins_get_sql_headers(client):
+    login(client)
+    response = client.get('/widgets/todays-macros')
+    assert int(response.headers['X-SQL-Queries']) > 0
+    assert response.headers['Server-Timing'].startswith('db;dur=')
+
+def test_anonymous_requests_are_still_aggregated(client):
+    before = len(smartfit.sql_window.requests['main.search_food'])
+    client.get('/search_food?q=apple') # Redirected to login, but still instrumented
+    assert len(smartfit.sql_window.requests['main.search_food']) == before + 1
@@ -0,0 +1,53 @@
+"""Autocomplete: the LRU cache in front of the name indexes, and dropping it when the catalog changes."""
+import app as smartfit
+from app import db, Meal, Workout
+
+def test_lru_cache_evicts_the_least_recently_used():
+    cache = smartfit.LRUCache(max_size=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    assert cache.get('a') == 1 # 'b' is now the least recently used
+    cache.put('c', 3)
+    assert len(cache) == 2
+    assert cache.get('b') is None and cache.get('b', 'gone') == 'gone'
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    cache.put('a', 10) # Replacing a value refreshes it too
+    cache.put('d', 4)
+    assert (cache.get('a'), cache.get('c'), cache.get('d')) == (10, None, 4)
+    assert (cache.hits, cache.misses) == (5, 3)
+
+    cache.pop('a')
+    cache.pop('missing')
+    assert len(cache) == 1
+    cache.clear()
+    assert len(cache) == 0 and cache.get('d') is None
+
+def test_suggestions_are_cached_per_query(seeded):
+    first = smartfit.cached_suggestions('workout', 'Core')
+    assert first == ['Core Crusher']
+    hits = smartfit.suggest_cache.hits
+    assert smartfit.cached_suggestions('workout', 'CORE') is first # Case-insensitive key
+    assert smartfit.suggest_cache.hits == hits + 1
+
+def test_catalog_changes_drop_cached_suggestions(seeded):
+    assert smartfit.cached_suggestions('workout', 'crusher') == ['Core Crusher']
+    meal_suggestions = smartfit.cached_suggestions('meal', 'zz')
+    assert meal_suggestions == []
+
+    workout = Workout.query.filter_by(name='Core Crusher').one()
+    workout.name = 'Core Smasher'
+    db.session.commit()
+    assert len(smartfit.suggest_cache) == 0
+    assert smartfit.cached_suggestions('workout', 'crusher') == []
+    assert smartfit.cached_suggestions('workout', 'smasher') == ['Core Smasher']
+
+    db.session.add(Meal(name='Zzzesty Lentil Bowl', calories_est=480))
+    db.session.commit()
+    assert [meal['name'] for meal in smartfit.cached_suggestions('meal', 'zz')] == ['Zzzesty Lentil Bowl']
+    assert smartfit.cached_suggestions('workout', 'smasher') == ['Core Smasher'] # Workout index still current
+
+def test_a_rebuilt_index_drops_cached_suggestions(seeded, monkeypatch):
+    smartfit.cached_suggestions('workout', 'core')
+    monkeypatch.setattr(smartfit, 'SUGGEST_INDEX_MAX_AGE', -1) # Every index is too old
+    smartfit.get_suggest_index('meal')
+    assert len(smartfit.suggest_cache) == 0
@@ -0,0 +1,53 @@
+"""Dashboard widget responses and their validators."""
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as smartfit
+from app import db, User
+from conftest import login
+
+@pytest.fixture
+def new_york(monkeypatch):
+    monkeypatch.setenv('TZ', 'America/New_York')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+def test_day_start_is_local_midnight_in_utc(new_york):
+    start = smartfit.day_start_utc()
+    assert (start.hour, start.minute) in ((4, 0), (5, 0)) # EDT / EST
+    assert start <= datetime.utcnow() < start + timedelta(days=1)
+
+def test_widget_validators(client, new_york):
+    login(client)
+    response = client.get('/widgets/weight-trend')
+    assert response.status_code == 200
+    with client.application.app_context():
+        _, updated_at = smartfit.get_user_data_version(1)
+        expected = max(updated_at, smartfit.day_start_utc()).replace(microsecond=0)
+    assert response.last_modified.replace(tzinfo=None) == expected
+
+    etag = response.headers['ETag']
+    assert client.get('/widgets/weight-trend', headers={'If-None-Match': etag}).status_code == 304
+    since = response.headers['Last-Modified']
+    assert client.get('/widgets/weight-trend', headers={'If-Modified-Since': since}).status_code == 304
+
+    with client.application.app_context():
+        smartfit.db.session.add(smartfit.WeightLog(user_id=1, weight=79.5))
+        smartfit.db.session.commit()
+    assert client.get('/widgets/weight-trend', headers={'If-None-Match': etag}).status_code == 200
+
+def test_touch_user_data_creates_then_bumps(backend):
+    db.create_all()
+    user = User(username='toucher', email='toucher@example.com')
+    db.session.add(user)
+    db.session.commit()
+    assert smartfit.get_user_data_version(user.id) == (0, None)
+    smartfit.touch_user_data([user.id]) # No row yet
+    assert smartfit.get_user_data_version(user.id)[0] == 1
+    smartfit.touch_user_data([user.id])
+    smartfit.touch_user_data()
+    assert smartfit.get_user_data_version(user.id)[0] == 3
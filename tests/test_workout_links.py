@@ -0,0 +1,84 @@
+"""Workout logs linked to catalog workouts by id: the backfill, renames and deletions."""
+from datetime import datetime, timedelta
+
+import pytest
+from flask import current_app
+
+import app as smartfit
+from app import db, User, Workout, WorkoutLog, WorkoutSet
+
+@pytest.fixture
+def user_id(seeded):
+    user = User(username='linker', email='linker@example.com')
+    db.session.add(user)
+    db.session.commit()
+    return user.id
+
+def log_workouts(user_id, names):
+    start = datetime(2024, 5, 1, 18)
+    smartfit.insert_log_rows('workout', [{'user_id': user_id, 'workout_name': name, 'intensity_level': 'Medium',
+                                          'repetitions': '3x10 @ 40kg', 'notes': None, 'log_time': start + timedelta(days=i)}
+                                         for i, name in enumerate(names)])
+    db.session.commit()
+
+def forget_links():
+    """Back to logs and sets written before the workout_id column existed."""
+    db.session.execute(WorkoutLog.__table__.update().values(workout_id=None))
+    db.session.execute(WorkoutSet.__table__.update().values(workout_id=None))
+    db.session.commit()
+
+def links(user_id):
+    logs = sorted((log.id, log.workout_name, log.workout_id) for log in WorkoutLog.query.filter_by(user_id=user_id))
+    sets = {(s.log_id, s.workout_id) for s in WorkoutSet.query.filter_by(user_id=user_id)}
+    assert sets == {(log_id, workout_id) for log_id, _, workout_id in logs} # Every log has sets, linked like the log
+    return [(name, workout_id) for _, name, workout_id in logs]
+
+def backfill():
+    result = current_app.test_cli_runner().invoke(args=['backfill-workout-ids', '--chunk-size', '2', '--pause-ms', '0'])
+    assert result.exit_code == 0, result.output
+    return result.output
+
+def test_backfill_links_unlinked_logs_by_name(user_id):
+    crusher, leg_day = (Workout.query.filter_by(name=name).one().id for name in ('Core Crusher', 'Classic Leg Day'))
+    log_workouts(user_id, ['Core Crusher', 'Backyard sprints', 'Classic Leg Day', 'Core Crusher', 'Classic Leg Day'])
+    forget_links()
+    assert all(workout_id is None for _, workout_id in links(user_id))
+
+    assert '5 log ids' in backfill().replace(',', '') # Three chunks of two ids
+    expected = [('Core Crusher', crusher), ('Backyard sprints', None), ('Classic Leg Day', leg_day),
+                ('Core Crusher', crusher), ('Classic Leg Day', leg_day)]
+    assert links(user_id) == expected
+    backfill() # Safe to re-run
+    assert links(user_id) == expected
+
+def test_renamed_workouts_keep_their_logs(user_id):
+    workout = Workout.query.filter_by(name='Core Crusher').one()
+    log_workouts(user_id, ['Core Crusher'])
+    workout.name = 'Core Blaster'
+    db.session.commit()
+    log_workouts(user_id, ['Core Blaster'])
+    assert links(user_id) == [('Core Crusher', workout.id), ('Core Blaster', workout.id)]
+
+    history = WorkoutLog.query.filter(smartfit.workout_history_filter(WorkoutLog, user_id, 'Core Blaster')).order_by(WorkoutLog.log_time)
+    assert [log.workout_name for log in history] == ['Core Crusher', 'Core Blaster'] # Listed under the new name
+    assert WorkoutSet.query.filter(smartfit.workout_history_filter(WorkoutSet, user_id, 'Core Blaster')).count() == 6
+
+    forget_links() # Logs from before the column: only the current name can be linked
+    backfill()
+    assert links(user_id) == [('Core Crusher', None), ('Core Blaster', workout.id)]
+
+def test_deleted_workouts_leave_logs_matched_by_name(user_id):
+    workout = Workout(name='Garage Circuit', category='Home')
+    db.session.add(workout)
+    db.session.commit()
+    log_workouts(user_id, ['Garage Circuit', 'Core Crusher'])
+
+    smartfit.unlink_workout_logs(workout.id)
+    db.session.delete(workout)
+    db.session.commit()
+    crusher = Workout.query.filter_by(name='Core Crusher').one().id
+    assert links(user_id) == [('Garage Circuit', None), ('Core Crusher', crusher)]
+    backfill()
+    assert links(user_id)[0] == ('Garage Circuit', None)
+    history = WorkoutLog.query.filter(smartfit.workout_history_filter(WorkoutLog, user_id, 'Garage Circuit')).order_by(WorkoutLog.log_time)
+    assert [log.workout_name for log in history] == ['Garage Circuit']
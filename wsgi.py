@@ -0,0 +1,6 @@
+# WSGI entry point: `gunicorn wsgi:app` (see gunicorn.conf.py) or `flask --app wsgi <command>`
+# Serving creates or upgrades the database here; the flask maintenance commands leave that to
+# themselves (`flask --app wsgi migrate`), so loading the app for them doesn't touch it.
+from app import create_app
+
+app = create_app()